@@ -47,6 +47,7 @@ __all__ = [
     'ancestor',
     'can_access',
     'change_sed_delimiter',
+    'clone_tree',
     'copy_mode',
     'filter_file',
     'find',
@@ -61,6 +62,7 @@ __all__ = [
     'install_tree',
     'is_exe',
     'join_path',
+    'link_or_copy',
     'mkdirp',
     'remove_dead_links',
     'remove_if_dead_link',
@@ -211,6 +213,107 @@ def copy_mode(src, dest):
     os.chmod(dest, dest_mode)
 
 
+#: ioctl that makes a file share the data of another one, on Linux
+_FICLONE = 0x40049409
+
+
+def link_or_copy(src, dest, hardlink=True):
+    """Makes ``dest`` a copy of the file ``src``, as cheaply as the
+    filesystem allows.
+
+    In order, this tries a hard link, a reflink (a copy that shares its
+    data with ``src`` until either file is modified), a copy within the
+    kernel, and a plain copy.  ``dest`` must not exist.  Pass
+    ``hardlink=False`` if ``dest`` may be modified in place.
+
+    Returns:
+        str: the method that worked, ``hardlink``, ``reflink``,
+            ``kernel`` or ``copy``
+    """
+    # Python 2 would link a symbolic link itself, not its target
+    src = os.path.realpath(src)
+    if hardlink:
+        try:
+            os.link(src, dest)
+            return 'hardlink'
+        except OSError:
+            pass
+
+    with open(src, 'rb') as s:
+        with open(dest, 'wb') as d:
+            if sys.platform.startswith('linux'):
+                try:
+                    import fcntl
+                    fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+                    return 'reflink'
+                except (IOError, OSError):
+                    pass
+
+            try:
+                if _kernel_copy(s.fileno(), d.fileno()):
+                    return 'kernel'
+            except OSError:
+                pass
+            s.seek(0)
+            d.seek(0)
+            d.truncate()
+
+            shutil.copyfileobj(s, d, 2 ** 20)
+            return 'copy'
+
+
+def _kernel_copy(src_fd, dest_fd):
+    """Copies a file without moving its data through user space, with
+    copy_file_range() or sendfile().  Returns False if neither exists,
+    or if the file was not copied whole (e.g. it shrank meanwhile).
+    """
+    if hasattr(os, 'copy_file_range'):
+        def copy(count):
+            return os.copy_file_range(src_fd, dest_fd, count)  # nopyqver
+    elif hasattr(os, 'sendfile') and sys.platform.startswith('linux'):
+        def copy(count):
+            return os.sendfile(dest_fd, src_fd, None, count)  # nopyqver
+    else:
+        return False
+
+    remaining = os.fstat(src_fd).st_size
+    while remaining > 0:
+        copied = copy(min(remaining, 2 ** 30))
+        if not copied:
+            return False
+        remaining -= copied
+    return True
+
+
+def clone_tree(src, dest):
+    """Copies the directory tree ``src`` to ``dest``, which must not
+    exist, with :func:`link_or_copy` but without hard links.
+
+    Symbolic links are copied as links, and the modes and times of files
+    and directories are preserved, so that build systems don't see the
+    copy as newer than what was generated from it.
+    """
+    for dirpath, dirnames, filenames in os.walk(src):
+        target = os.path.normpath(
+            os.path.join(dest, os.path.relpath(dirpath, src)))
+        os.mkdir(target)
+
+        for name in dirnames + filenames:
+            s = os.path.join(dirpath, name)
+            d = os.path.join(target, name)
+            if os.path.islink(s):
+                os.symlink(os.readlink(s), d)
+            elif name in filenames:
+                link_or_copy(s, d, hardlink=False)
+                shutil.copystat(s, d)
+
+    # Directory times change as their contents are created
+    for dirpath, dirnames, filenames in os.walk(src, False):
+        target = os.path.normpath(
+            os.path.join(dest, os.path.relpath(dirpath, src)))
+        shutil.copystat(dirpath, target)
+
+
 def unset_executable_mode(path):
     mode = os.stat(path).st_mode
     mode &= ~stat.S_IXUSR
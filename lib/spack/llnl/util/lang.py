@@ -416,3 +416,61 @@ class ObjectWrapper(object):
         wrapped_name = wrapped_cls.__name__
         self.__class__ = type(wrapped_name, (type(self), wrapped_cls), {})
         self.__dict__ = wrapped_object.__dict__
+
+
+class Singleton(object):
+    """Wrapper for an object that is created the first time it is used.
+
+    Attribute and item access, iteration, membership tests and calls
+    are forwarded to the object, so a Singleton can stand in for a
+    global that is expensive to create.
+    """
+
+    def __init__(self, factory):
+        """Create a new singleton to be initialized with a factory.
+
+        Args:
+            factory (function): function taking no arguments that
+                creates the singleton instance.
+        """
+        object.__setattr__(self, 'factory', factory)
+        object.__setattr__(self, '_instance', None)
+
+    @property
+    def instance(self):
+        if self._instance is None:
+            object.__setattr__(self, '_instance', self.factory())
+        return self._instance
+
+    @property
+    def initialized(self):
+        """Whether the instance has been created yet."""
+        return self._instance is not None
+
+    def __getattr__(self, name):
+        # Only called for names that are not set on the wrapper itself.
+        # When unpickling, these may be requested before __init__ ran.
+        if name in ('factory', '_instance'):
+            raise AttributeError(name)
+        return getattr(self.instance, name)
+
+    def __setattr__(self, name, value):
+        setattr(self.instance, name, value)
+
+    def __getitem__(self, name):
+        return self.instance[name]
+
+    def __contains__(self, element):
+        return element in self.instance
+
+    def __call__(self, *args, **kwargs):
+        return self.instance(*args, **kwargs)
+
+    def __iter__(self):
+        return iter(self.instance)
+
+    def __str__(self):
+        return str(self.instance)
+
+    def __repr__(self):
+        return repr(self.instance)
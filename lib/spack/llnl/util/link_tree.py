@@ -51,15 +51,32 @@ class LinkTree(object):
 
         self._root = source_root
 
-    def find_conflict(self, dest_root, **kwargs):
-        """Returns the first file in dest that conflicts with src"""
-        kwargs['follow_nonexisting'] = False
+    def find_conflict(self, dest_root, index=None, **kwargs):
+        """Returns the first file in dest that conflicts with src
+
+        ``index`` is a dict of the files other trees are about to merge
+        in dest, mapped to whether they are directories.  Files of this
+        tree that conflict with them are returned as well, and when
+        there is no conflict the files of this tree are added to it.
+        This checks several trees for conflicts before merging any.
+        """
+        kwargs['follow_nonexisting'] = index is not None
+        files = {}
         for src, dest in traverse_tree(self._root, dest_root, **kwargs):
-            if os.path.isdir(src):
+            isdir = os.path.isdir(src)
+            if isdir:
                 if os.path.exists(dest) and not os.path.isdir(dest):
                     return dest
             elif os.path.exists(dest):
                 return dest
+
+            if index is not None:
+                if dest in index and not (isdir and index[dest]):
+                    return dest
+                files[dest] = isdir
+
+        if index is not None:
+            index.update(files)
         return None
 
     def merge(self, dest_root, **kwargs):
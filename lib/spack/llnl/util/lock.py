@@ -41,6 +41,45 @@ _default_timeout = 60
 # Sleep time per iteration in spin loop (in seconds)
 _sleep_time = 1e-5
 
+# Files opened by the locks of this process, by path, with the number of
+# locks using each of them.  POSIX locks belong to a process, and closing
+# *any* descriptor of a file releases all the locks the process holds on
+# that file, so all the locks on the same file must share one descriptor.
+_open_files = {}
+
+
+def _open_lock_file(path):
+    """Get the file object shared by the locks of this process on path,
+    opening it if needed.
+    """
+    if path in _open_files:
+        lock_file, count = _open_files[path]
+        _open_files[path] = (lock_file, count + 1)
+        return lock_file
+
+    # Prefer to open 'r+' to allow upgrading to write lock later if
+    # possible.  Open read-only if we can't write the lock file at all.
+    os_mode, fd_mode = (os.O_RDWR | os.O_CREAT), 'r+'
+    if os.path.exists(path) and not os.access(path, os.W_OK):
+        os_mode, fd_mode = os.O_RDONLY, 'r'
+
+    fd = os.open(path, os_mode)
+    lock_file = os.fdopen(fd, fd_mode)
+    _open_files[path] = (lock_file, 1)
+    return lock_file
+
+
+def _close_lock_file(path):
+    """Release a file obtained with ``_open_lock_file``.  The file is
+    closed only when no lock of this process is using it anymore.
+    """
+    lock_file, count = _open_files[path]
+    if count > 1:
+        _open_files[path] = (lock_file, count - 1)
+    else:
+        del _open_files[path]
+        lock_file.close()
+
 
 class Lock(object):
     """This is an implementation of a filesystem lock using Python's lockf.
@@ -63,7 +102,7 @@ class Lock(object):
         always ``os.SEEK_SET`` and ``start`` is always evaluated from the
         beginning of the file.
         """
-        self.path = path
+        self.path = os.path.abspath(path)
         self._file = None
         self._reads = 0
         self._writes = 0
@@ -86,10 +125,11 @@ class Lock(object):
         pid and host to the lock file, in case the holding process needs
         to be killed later.
 
-        If the lock times out, it raises a ``LockError``.
+        If the lock times out, it raises a ``LockError``.  A timeout of 0
+        tries to take the lock only once, without waiting.
         """
         start_time = time.time()
-        while (time.time() - start_time) < timeout:
+        while True:
             try:
                 # If we could write the file, we'd have opened it 'r+'.
                 # Raise an error when we attempt to upgrade to a write lock.
@@ -102,17 +142,7 @@ class Lock(object):
                 # Create file and parent directories if they don't exist.
                 if self._file is None:
                     self._ensure_parent_directory()
-
-                    # Prefer to open 'r+' to allow upgrading to write
-                    # lock later if possible.  Open read-only if we can't
-                    # write the lock file at all.
-                    os_mode, fd_mode = (os.O_RDWR | os.O_CREAT), 'r+'
-                    if os.path.exists(self.path) and not os.access(
-                            self.path, os.W_OK):
-                        os_mode, fd_mode = os.O_RDONLY, 'r'
-
-                    fd = os.open(self.path, os_mode)
-                    self._file = os.fdopen(fd, fd_mode)
+                    self._file = _open_lock_file(self.path)
 
                 # Try to get the lock (will raise if not available.)
                 fcntl.lockf(self._file, op | fcntl.LOCK_NB,
@@ -132,6 +162,9 @@ class Lock(object):
                     pass
                 else:
                     raise
+
+            if (time.time() - start_time) >= timeout:
+                break
             time.sleep(_sleep_time)
 
         raise LockError("Timed out waiting for lock.")
@@ -149,6 +182,7 @@ class Lock(object):
 
     def _read_lock_data(self):
         """Read PID and host data out of the file if it is there."""
+        self._file.seek(0)
         line = self._file.read()
         if line:
             pid, host = line.strip().split(',')
@@ -179,7 +213,7 @@ class Lock(object):
         """
         fcntl.lockf(self._file, fcntl.LOCK_UN,
                     self._length, self._start, os.SEEK_SET)
-        self._file.close()
+        _close_lock_file(self.path)
         self._file = None
 
     def acquire_read(self, timeout=_default_timeout):
@@ -84,6 +84,26 @@ def process_stacktrace(countback):
     return st_text
 
 
+def silence_worker():
+    """Redirects the standard streams of a worker process to /dev/null,
+    so that the messages and progress bars of concurrent workers don't
+    garble the output.  In debug mode, stderr is kept, so that the
+    workers can report errors with :func:`debug_traceback`.
+    """
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in ((0, 1) if _debug else (0, 1, 2)):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+
+def debug_traceback():
+    """In debug mode, prints the traceback of the exception being
+    handled on stderr.
+    """
+    if _debug:
+        traceback.print_exc()
+
+
 def msg(message, *args, **kwargs):
     newline = kwargs.get('newline', True)
     st_text = ""
@@ -28,7 +28,8 @@ import os
 import sys
 import tempfile
 import getpass
-from llnl.util.filesystem import *
+from llnl.util.filesystem import ancestor, join_path
+from llnl.util.lang import Singleton
 import llnl.util.tty as tty
 
 #-----------------------------------------------------------------------------
@@ -77,37 +78,48 @@ etc_path       = join_path(prefix, "etc")
 import spack.repository
 import spack.error
 import spack.config
-import spack.fetch_strategy
-from spack.file_cache import FileCache
 from spack.abi import ABI
-from spack.concretize import DefaultConcretizer
 from spack.version import Version
 from spack.util.path import canonicalize_path
 
 
 #-----------------------------------------------------------------------------
 # Initialize various data structures & objects at the core of Spack.
+#
+# The expensive ones are Singletons, created the first time they are
+# used, so that commands which don't need them start quickly.
 #-----------------------------------------------------------------------------
 # Version information
 spack_version = Version("0.10.0")
 
 
-# Set up the default packages database.
-try:
-    repo = spack.repository.RepoPath()
-    sys.meta_path.append(repo)
-except spack.error.SpackError as e:
-    tty.die('while initializing Spack RepoPath:', e.message)
+def _repo():
+    """Set up the default packages database."""
+    try:
+        return spack.repository.RepoPath()
+    except spack.error.SpackError as e:
+        tty.die('while initializing Spack RepoPath:', e.message)
+
+
+repo = Singleton(_repo)
+
+# Only creates the RepoPath when a package module is imported.
+sys.meta_path.append(spack.repository.RepoPathImporter(lambda: repo))
 
 
 # Tests ABI compatibility between packages
-abi = ABI()
+abi = Singleton(ABI)
 
 
-# This controls how things are concretized in spack.
-# Replace it with a subclass if you want different
-# policies.
-concretizer = DefaultConcretizer()
+def _concretizer():
+    """This controls how things are concretized in spack.
+    Replace it with a subclass if you want different
+    policies."""
+    from spack.concretize import DefaultConcretizer
+    return DefaultConcretizer()
+
+
+concretizer = Singleton(_concretizer)
 
 #-----------------------------------------------------------------------------
 # config.yaml options
@@ -118,13 +130,54 @@ _config = spack.config.get_config('config')
 # Path where downloaded source code is cached
 cache_path = canonicalize_path(
     _config.get('source_cache', join_path(var_path, "cache")))
-fetch_cache = spack.fetch_strategy.FsCache(cache_path)
+
+
+# Size the source cache is kept under, in bytes or with a suffix like
+# 10G; 0 means no limit.  Least recently used archives are removed first.
+source_cache_limit = _config.get('source_cache_limit', 0)
+
+
+# Whether identical archives in the source cache are stored only once.
+source_cache_dedup = _config.get('source_cache_dedup', False)
+
+
+def _fetch_cache():
+    import spack.fetch_strategy
+    from spack.util.string import parse_size
+    return spack.fetch_strategy.FsCache(
+        cache_path, limit=parse_size(source_cache_limit),
+        dedup=source_cache_dedup)
+
+
+fetch_cache = Singleton(_fetch_cache)
+
+
+# Path where expanded and patched sources are cached.  Not set by
+# default, which disables this cache.
+source_tree_cache_path = _config.get('source_tree_cache')
+if source_tree_cache_path:
+    source_tree_cache_path = canonicalize_path(source_tree_cache_path)
+
+
+def _source_tree_cache():
+    from spack.tree_cache import SourceTreeCache
+    return SourceTreeCache(source_tree_cache_path)
+
+
+source_tree_cache = Singleton(_source_tree_cache)
 
 
 # cache for miscellaneous stuff.
 misc_cache_path = canonicalize_path(
     _config.get('misc_cache', join_path(user_config_path, 'cache')))
-misc_cache = FileCache(misc_cache_path)
+
+
+def _misc_cache():
+    from spack.file_cache import FileCache
+    return FileCache(misc_cache_path)
+
+
+misc_cache = Singleton(_misc_cache)
 
 
 #: Directories where to search for templates
@@ -151,6 +204,26 @@ dirty = _config.get('dirty', False)
 build_jobs = _config.get('build_jobs', multiprocessing.cpu_count())
 
 
+# The number of packages that `spack install` builds at the same time.
+# The build_jobs above are split among the concurrent builds.
+concurrent_builds = _config.get('concurrent_builds', 1)
+
+
+# If this is True, `spack install` locks packages before building them,
+# so that Spack processes sharing the install tree don't build them twice.
+coordinate_installs = _config.get('coordinate_installs', False)
+
+
+# The number of packages whose sources are fetched at the same time,
+# ahead of their builds.  0 disables prefetching.
+fetch_jobs = _config.get('fetch_jobs', 4)
+
+
+# How archives are downloaded: 'curl' runs curl for each archive, and
+# 'urllib' downloads them in the Spack process, reusing connections.
+url_fetch_method = _config.get('url_fetch_method', 'curl')
+
+
 #-----------------------------------------------------------------------------
 # When packages call 'from spack import *', this extra stuff is brought in.
 #
@@ -51,6 +51,7 @@ There are two parts to the build environment:
 Skimming this module is a nice way to get acquainted with the types of
 calls you can make from within the install() function.
 """
+import copy
 import inspect
 import multiprocessing
 import os
@@ -506,6 +507,64 @@ def load_external_modules(pkg):
             load_module(dep.external_module)
 
 
+#: Environment modifications made by packages, keyed by the hashes of the
+#: dependent spec and of the dependency spec, and a context.  See
+#: ``cached_environment``.
+_environment_cache = {}
+
+
+def cached_environment(dependent, dependency, context, setup):
+    """Returns the modifications to the build and run environments of
+    ``dependent`` that ``setup(spack_env, run_env)`` makes.
+
+    They are computed only once per process for each ``dependent``,
+    ``dependency`` and ``context`` (the name of the package method that
+    makes them, e.g. ``setup_dependent_environment``), and shared by
+    builds, ``spack env`` and module files.  ``setup`` is not called if
+    they are already known, so preparation that has other effects, like
+    setting module variables, must be done by the caller.
+
+    Returns:
+        tuple: a new EnvironmentModifications for the build environment,
+            and one for the run environment
+    """
+    key = (dependent.dag_hash(), dependency.dag_hash(), context)
+    if key not in _environment_cache:
+        spack_env = EnvironmentModifications()
+        run_env = EnvironmentModifications()
+        setup(spack_env, run_env)
+        _environment_cache[key] = (spack_env, run_env)
+
+    # Callers may change the modifications they get
+    result = []
+    for env in _environment_cache[key]:
+        env_copy = EnvironmentModifications()
+        for item in env:
+            item = copy.copy(item)
+            item.args = dict(item.args)
+            env_copy.env_modifications.append(item)
+        result.append(env_copy)
+    return tuple(result)
+
+
+def invalidate_environment_cache(spec=None):
+    """Forgets the environment modifications made by the package of
+    ``spec``, for itself and for its dependents, or all of them if
+    ``spec`` is None.
+
+    This must be called when what they depend on changes, e.g. when
+    ``spec`` is installed or uninstalled.
+    """
+    if spec is None:
+        _environment_cache.clear()
+        return
+
+    dag_hash = spec.dag_hash()
+    for key in list(_environment_cache):
+        if key[1] == dag_hash:
+            del _environment_cache[key]
+
+
 def setup_package(pkg, dirty=False):
     """Execute all environment setup routines."""
     spack_env = EnvironmentModifications()
@@ -549,10 +608,17 @@ def setup_package(pkg, dirty=False):
         # Allow dependencies to modify the module
         dpkg = dspec.package
         dpkg.setup_dependent_package(pkg.module, spec)
-        dpkg.setup_dependent_environment(spack_env, run_env, spec)
+        build_changes, run_changes = cached_environment(
+            spec, dspec, 'setup_dependent_environment',
+            lambda s, r: dpkg.setup_dependent_environment(s, r, spec))
+        spack_env.extend(build_changes)
+        run_env.extend(run_changes)
 
     set_module_variables_for_package(pkg, pkg.module)
-    pkg.setup_environment(spack_env, run_env)
+    build_changes, run_changes = cached_environment(
+        spec, spec, 'setup_environment', pkg.setup_environment)
+    spack_env.extend(build_changes)
+    run_env.extend(run_changes)
 
     # Make sure nothing's strange about the Spack environment.
     validate(spack_env, tty.warn)
@@ -586,6 +652,30 @@ def fork(pkg, function, dirty=False):
     error and the parent process will exit with error as well. If things
     go well, the child exits and the parent carries on.
     """
+    start_build_process(pkg, function, dirty=dirty).wait()
+
+
+def start_build_process(pkg, function, dirty=False, input_stream=None):
+    """Fork a child process to do part of a spack build, without waiting
+    for it to complete.
+
+    This is the non-blocking counterpart of :func:`fork`, used to run
+    several builds at the same time.
+
+    Args:
+
+        pkg (PackageBase): package whose environemnt we should set up the
+            forked process for.
+        function (callable): function to run in the child process. It
+            receives the input stream of the child as its only argument.
+        dirty (bool): If True, do NOT clean the environment before
+            building.
+        input_stream (file): stream forwarded to the child as its standard
+            input. If None, a duplicate of ``sys.stdin`` is used.
+
+    Returns:
+        BuildProcess: handle to the running child process
+    """
 
     def child_execution(child_connection, input_stream):
         try:
@@ -626,7 +716,8 @@ def fork(pkg, function, dirty=False):
     try:
         # Forward sys.stdin to be able to activate / deactivate
         # verbosity pressing a key at run-time
-        input_stream = lang.duplicate_stream(sys.stdin)
+        if input_stream is None:
+            input_stream = lang.duplicate_stream(sys.stdin)
         p = multiprocessing.Process(
             target=child_execution,
             args=(child_connection, input_stream)
@@ -635,11 +726,40 @@ def fork(pkg, function, dirty=False):
     finally:
         # Close the input stream in the parent process
         input_stream.close()
-    child_exc = parent_connection.recv()
-    p.join()
+    return BuildProcess(pkg, p, parent_connection)
+
+
+class BuildProcess(object):
+    """Handle to a build running in a child process, as returned by
+    :func:`start_build_process`.
+    """
+
+    def __init__(self, pkg, process, connection):
+        self.pkg = pkg
+        self.process = process
+        self.connection = connection
+
+    def fileno(self):
+        """File descriptor that becomes readable when the child is done.
+
+        This makes it possible to wait on many builds with ``select``.
+        """
+        return self.connection.fileno()
+
+    def done(self):
+        """True if the child has reported its result, False otherwise."""
+        return self.connection.poll()
+
+    def wait(self):
+        """Wait for the child to complete, and re-raise in the parent any
+        error that occurred in the child.
+        """
+        child_exc = self.connection.recv()
+        self.process.join()
+        self.connection.close()
 
-    if child_exc is not None:
-        raise child_exc
+        if child_exc is not None:
+            raise child_exc
 
 
 def get_package_context(traceback):
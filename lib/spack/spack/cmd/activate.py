@@ -24,10 +24,11 @@
 ##############################################################################
 import argparse
 import llnl.util.tty as tty
+from ordereddict_backport import OrderedDict
 import spack
 import spack.cmd
 
-description = "activate a package extension"
+description = "activate package extensions"
 section = "extensions"
 level = "long"
 
@@ -38,19 +39,28 @@ def setup_parser(subparser):
         help="activate without first activating dependencies")
     subparser.add_argument(
         'spec', nargs=argparse.REMAINDER,
-        help="spec of package extension to activate")
+        help="specs of package extensions to activate")
 
 
 def activate(parser, args):
     specs = spack.cmd.parse_specs(args.spec)
-    if len(specs) != 1:
-        tty.die("activate requires one spec.  %d given." % len(specs))
+    if not specs:
+        tty.die("activate requires at least one spec.")
 
-    spec = spack.cmd.disambiguate_spec(specs[0])
-    if not spec.package.is_extension:
-        tty.die("%s is not an extension." % spec.name)
+    # Extensions of the same package are activated all at once
+    extensions = OrderedDict()
+    for spec in specs:
+        spec = spack.cmd.disambiguate_spec(spec)
+        if not spec.package.is_extension:
+            tty.die("%s is not an extension." % spec.name)
 
-    if spec.package.activated:
-        tty.die("Package %s is already activated." % specs[0].short_spec)
+        if spec.package.activated:
+            tty.die("Package %s is already activated." % spec.short_spec)
 
-    spec.package.do_activate()
+        extendee = spec.package.extendee_spec
+        extensions.setdefault(extendee.dag_hash(), (extendee, []))
+        extensions[extendee.dag_hash()][1].append(spec)
+
+    for extendee, extension_specs in extensions.values():
+        extendee.package.do_activate_extensions(
+            extension_specs, force=args.force)
@@ -25,12 +25,14 @@
 from __future__ import print_function
 
 import argparse
-import hashlib
+import multiprocessing
+import os
+import time
 
 import llnl.util.tty as tty
 import spack
 import spack.cmd
-import spack.util.crypto
+import spack.fetch_strategy as fs
 from spack.stage import Stage, FailedDownloadError
 from spack.util.naming import *
 from spack.version import *
@@ -47,11 +49,54 @@ def setup_parser(subparser):
     subparser.add_argument(
         '--keep-stage', action='store_true',
         help="don't clean up staging area when command completes")
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of versions to download at the same time. "
+        "default is the fetch_jobs setting in config.yaml")
     subparser.add_argument(
         'versions', nargs=argparse.REMAINDER,
         help='versions to generate checksums for')
 
 
+def _stage_name(name, version):
+    """Name of the stage a version of a package is checksummed in."""
+    return 'spack-checksum-{0}-{1}'.format(name, version)
+
+
+def _fetch_and_checksum(args):
+    """Downloads an archive into a named stage and returns its md5.
+
+    Fetch strategies change the working directory, so this runs in
+    worker processes rather than threads.
+
+    Returns:
+        tuple: the index of the archive in the arguments of
+            ``get_checksums``, its md5 (None if the download failed),
+            its size in bytes, the time its download took, and the
+            reason of the failure if any
+    """
+    i, url, stage_name = args
+    start = time.time()
+    try:
+        fetcher = fs.URLFetchStrategy(url, hash_algorithm='md5')
+        stage = Stage(fetcher, name=stage_name, keep=True)
+
+        # Don't checksum what an earlier run left in the stage
+        stage.destroy()
+        with stage:
+            # Use the fetcher directly: the stage would hide why it failed
+            fetcher.fetch()
+            digest = fetcher.archive_checksum('md5')
+            size = os.path.getsize(stage.archive_file)
+        return i, digest, size, time.time() - start, None
+
+    except FailedDownloadError:
+        return i, None, 0, time.time() - start, None
+    except Exception as e:
+        tty.debug_traceback()
+        return i, None, 0, time.time() - start, str(e) or type(e).__name__
+
+
 def get_checksums(url_dict, name, **kwargs):
     """Fetches and checksums archives from URLs.
 
@@ -59,17 +104,25 @@ def get_checksums(url_dict, name, **kwargs):
     The ``first_stage_function`` kwarg allows ``spack create`` to determine
     things like the build system of the archive.
 
+    Archives are downloaded and hashed by ``jobs`` worker processes at
+    the same time, and the progress is reported as each one finishes.
+
     Args:
         url_dict (dict): A dictionary of the form: version -> URL
         name (str): The name of the package
         first_stage_function (callable): Function to run on first staging area
         keep_stage (bool): Don't clean up staging area when command completes
+        jobs (int): Number of archives to download at the same time.
+            Defaults to the ``fetch_jobs`` setting in ``config.yaml``
 
     Returns:
         str: A multi-line string containing versions and corresponding hashes
     """
     first_stage_function = kwargs.get('first_stage_function', None)
     keep_stage = kwargs.get('keep_stage', False)
+    jobs = kwargs.get('jobs', None)
+    if jobs is None:
+        jobs = spack.fetch_jobs
 
     sorted_versions = sorted(url_dict.keys(), reverse=True)
 
@@ -93,29 +146,49 @@ def get_checksums(url_dict, name, **kwargs):
 
     versions = sorted_versions[:archives_to_fetch]
     urls = [url_dict[v] for v in versions]
-
-    tty.msg("Downloading...")
-    version_hashes = []
-    i = 0
-    for url, version in zip(urls, versions):
-        try:
-            with Stage(url, keep=keep_stage) as stage:
-                # Fetch the archive
+    stage_names = [_stage_name(name, v) for v in versions]
+
+    jobs = max(1, min(jobs, len(versions)))
+    tty.msg("Downloading with {0} worker{1}...".format(
+        jobs, '' if jobs == 1 else 's'))
+
+    digests = [None] * len(versions)
+    pool = multiprocessing.Pool(jobs, initializer=tty.silence_worker)
+    try:
+        args = [(i, url, stage_name) for i, (url, stage_name)
+                in enumerate(zip(urls, stage_names))]
+        results = pool.imap_unordered(_fetch_and_checksum, args)
+        for done, result in enumerate(results, 1):
+            i, digest, size, seconds, error = result
+            progress = "[{0}/{1}]".format(done, len(versions))
+            if error:
+                tty.msg("{0} Something failed on {1}, skipping.".format(
+                    progress, urls[i]), "  ({0})".format(error))
+            elif not digest:
+                tty.msg("{0} Failed to fetch {1}".format(progress, urls[i]))
+            else:
+                digests[i] = digest
+                tty.msg("{0} {1:{2}}  {3}  ({4:.1f} MB in {5:.1f}s)".format(
+                    progress, str(versions[i]), max_len, digest,
+                    size / 2.0 ** 20, seconds))
+    finally:
+        pool.terminate()
+        pool.join()
+
+    version_hashes = [(v, h) for v, h in zip(versions, digests) if h]
+
+    for i, (url, stage_name) in enumerate(zip(urls, stage_names)):
+        stage = Stage(url, name=stage_name, keep=keep_stage)
+        if digests[i] and first_stage_function:
+            # Only run first_stage_function on the newest version,
+            # no need to run it every time.  The archive is already
+            # in the stage.
+            with stage:
                 stage.fetch()
-                if i == 0 and first_stage_function:
-                    # Only run first_stage_function the first time,
-                    # no need to run it every time
-                    first_stage_function(stage, url)
-
-                # Checksum the archive and add it to the list
-                version_hashes.append((version, spack.util.crypto.checksum(
-                    hashlib.md5, stage.archive_file)))
-                i += 1
-        except FailedDownloadError:
-            tty.msg("Failed to fetch {0}".format(url))
-        except Exception as e:
-            tty.msg("Something failed on {0}, skipping.".format(url),
-                    "  ({0})".format(e))
+                first_stage_function(stage, url)
+            first_stage_function = None
+        elif not keep_stage:
+            stage.destroy()
 
     if not version_hashes:
         tty.die("Could not fetch any versions for {0}".format(name))
@@ -161,7 +234,7 @@ def checksum(parser, args):
             tty.die("Could not find any versions for {0}".format(pkg.name))
 
     version_lines = get_checksums(
-        url_dict, pkg.name, keep_stage=args.keep_stage)
+        url_dict, pkg.name, keep_stage=args.keep_stage, jobs=args.jobs)
 
     print()
     print(version_lines)
@@ -28,6 +28,7 @@ import llnl.util.tty as tty
 
 import spack
 import spack.cmd
+from spack.util.string import parse_size, format_size
 
 description = "remove build stage and source tarball for packages"
 section = "build"
@@ -35,11 +36,40 @@ level = "long"
 
 
 def setup_parser(subparser):
+    subparser.add_argument(
+        '-c', '--source-cache', action='store_true',
+        help="remove the least recently used archives from the source "
+        "cache until it fits in source_cache_limit")
+    subparser.add_argument(
+        '--max-size', action='store',
+        help="size to shrink the source cache to, e.g. 10G. implies "
+        "--source-cache. default is the source_cache_limit setting")
     subparser.add_argument('packages', nargs=argparse.REMAINDER,
                            help="specs of packages to clean")
 
 
+def clean_source_cache(max_size):
+    try:
+        limit = parse_size(max_size)
+    except ValueError as e:
+        tty.die(str(e))
+
+    cache = spack.fetch_cache
+    removed, reclaimed = cache.evict(limit)
+    tty.msg("Removed %d archive%s from the source cache, reclaimed %s" % (
+        removed, '' if removed == 1 else 's', format_size(reclaimed)),
+        "The source cache in %s now uses %s" % (
+            cache.root, format_size(cache.size())))
+
+
 def clean(parser, args):
+    if args.source_cache or args.max_size is not None:
+        if args.max_size is None:
+            args.max_size = spack.source_cache_limit
+        clean_source_cache(args.max_size)
+        if not args.packages:
+            return
+
     if not args.packages:
         tty.die("spack clean requires at least one package spec.")
 
@@ -86,6 +86,8 @@ def create_db_tarball(args):
     wd = os.path.dirname(spack.store.root)
     with working_dir(wd):
         files = [spack.store.db._index_path]
+        if os.path.exists(spack.store.db._journal_path):
+            files.append(spack.store.db._journal_path)
         files += glob('%s/*/*/*/.spack/spec.yaml' % base)
         files = [os.path.relpath(f) for f in files]
 
@@ -26,6 +26,7 @@ import argparse
 
 import spack
 import spack.cmd
+import spack.prefetch
 
 description = "fetch archives for packages"
 section = "build"
@@ -42,6 +43,10 @@ def setup_parser(subparser):
     subparser.add_argument(
         '-D', '--dependencies', action='store_true',
         help="also fetch all dependencies")
+    subparser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of packages to fetch at the same time. "
+        "default is the fetch_jobs setting in config.yaml")
     subparser.add_argument(
         'packages', nargs=argparse.REMAINDER,
         help="specs of packages to fetch")
@@ -55,13 +60,21 @@ def fetch(parser, args):
         spack.do_checksum = False
 
     specs = spack.cmd.parse_specs(args.packages, concretize=True)
+    to_fetch = []
     for spec in specs:
         if args.missing or args.dependencies:
             for s in spec.traverse(deptype_query=spack.alldeps):
                 package = spack.repo.get(s)
                 if args.missing and package.installed:
                     continue
-                package.do_fetch()
+                to_fetch.append(s)
+
+        to_fetch.append(spec)
 
-        package = spack.repo.get(spec)
-        package.do_fetch()
+    # Workers fetch the packages ahead of this loop, which then waits for
+    # them and reports errors.
+    with spack.prefetch.Prefetcher(to_fetch, jobs=args.jobs, expand=False):
+        for spec in to_fetch:
+            spack.prefetch.wait(spec)
+            package = spack.repo.get(spec)
+            package.do_fetch()
@@ -28,7 +28,6 @@ import textwrap
 import itertools
 from llnl.util.tty.colify import *
 import spack
-import spack.fetch_strategy as fs
 
 description = "get detailed information on a particular package"
 section = "basic"
@@ -127,7 +126,11 @@ class VariantFormatter(object):
 
 
 def print_text_info(pkg):
-    """Print out a plain text description of a package."""
+    """Print out a plain text description of a package.
+
+    Args:
+        pkg (PackageMetadata): metadata of the package
+    """
     header = "{0}:   ".format(pkg.build_system_class)
 
     print(header, pkg.name)
@@ -141,9 +144,8 @@ def print_text_info(pkg):
         print("    None")
     else:
         pad = padder(pkg.versions, 4)
-        for v in reversed(sorted(pkg.versions)):
-            f = fs.for_package_version(pkg, v)
-            print("    %s%s" % (pad(v), str(f)))
+        for v, f in reversed(sorted(pkg.versions.items())):
+            print("    %s%s" % (pad(v), f))
 
     print()
     print("Variants:")
@@ -185,12 +187,12 @@ def print_text_info(pkg):
 
     print()
     print("Description:")
-    if pkg.__doc__:
+    if pkg.doc:
         print(pkg.format_doc(indent=4))
     else:
         print("    None")
 
 
 def info(parser, args):
-    pkg = spack.repo.get(args.name)
+    pkg = spack.repo.package_metadata(args.name)
     print_text_info(pkg)
@@ -58,7 +58,21 @@ the dependencies"""
     )
     subparser.add_argument(
         '-j', '--jobs', action='store', type=int,
-        help="explicitly set number of make jobs. default is #cpus")
+        help="explicitly set number of make jobs. default is #cpus. "
+        "the jobs are split among concurrent builds")
+    subparser.add_argument(
+        '-p', '--concurrent-builds', action='store', type=int,
+        help="number of packages to build at the same time. "
+        "default is the concurrent_builds setting in config.yaml")
+    subparser.add_argument(
+        '--coordinate', action='store_true', default=None,
+        help="lock packages before building them, so that other spack "
+        "processes sharing the install tree wait instead of building them")
+    subparser.add_argument(
+        '--fetch-jobs', action='store', type=int,
+        help="number of packages whose sources are fetched at the same time, "
+        "ahead of their builds. default is the fetch_jobs setting in "
+        "config.yaml")
     subparser.add_argument(
         '--keep-prefix', action='store_true', dest='keep_prefix',
         help="don't remove the install prefix if installation fails")
@@ -299,6 +313,14 @@ def install(parser, args, **kwargs):
         if args.jobs <= 0:
             tty.die("The -j option must be a positive integer!")
 
+    if args.concurrent_builds is not None:
+        if args.concurrent_builds <= 0:
+            tty.die("The -p option must be a positive integer!")
+
+    if args.fetch_jobs is not None:
+        if args.fetch_jobs < 0:
+            tty.die("The --fetch-jobs option must be a non-negative integer!")
+
     if args.no_checksum:
         spack.do_checksum = False        # TODO: remove this global.
 
@@ -309,6 +331,9 @@ def install(parser, args, **kwargs):
         'keep_stage': args.keep_stage,
         'install_deps': 'dependencies' in args.things_to_install,
         'make_jobs': args.jobs,
+        'concurrent_builds': args.concurrent_builds,
+        'coordinate': args.coordinate,
+        'fetch_jobs': args.fetch_jobs,
         'run_tests': args.run_tests,
         'verbose': args.verbose,
         'fake': args.fake,
@@ -327,6 +352,9 @@ def install(parser, args, **kwargs):
             log_filename = args.log_file
             if not log_filename:
                 log_filename = default_log_file(spec)
+            # Results are recorded by wrapping do_install, which is
+            # bypassed for dependencies built concurrently
+            kwargs['concurrent_builds'] = 1
             # Create the test suite in which to log results
             test_suite = TestSuite(spec)
             # Decorate PackageBase.do_install to get installation status
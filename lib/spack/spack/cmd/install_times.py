@@ -0,0 +1,134 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+from __future__ import print_function
+
+import os
+import sys
+
+import llnl.util.tty as tty
+
+import spack.store
+import spack.util.spack_json as sjson
+from spack.cmd.common import arguments
+from spack.util.timer import Timer
+
+description = "show how long the phases of installed packages took"
+section = "build"
+level = "long"
+
+
+def setup_parser(subparser):
+    subparser.add_argument(
+        '-p', '--packages', action='store_true',
+        help='list the slowest packages instead of the phases')
+    subparser.add_argument(
+        '-n', '--number', type=int, default=10,
+        help='number of packages to list with --packages (default 10)')
+    subparser.add_argument(
+        '--json', action='store_true',
+        help='print the aggregated phase timings as JSON')
+    arguments.add_common_arguments(subparser, ['constraint'])
+
+
+def read_timers(specs):
+    """Yields (spec, timer) for the installed specs with timing data.
+
+    Specs installed before Spack recorded timings, and externals, are
+    skipped.
+    """
+    for spec in specs:
+        if spec.external:
+            continue
+        path = spack.store.layout.build_times_path(spec)
+        if os.path.exists(path):
+            yield spec, Timer.read_json(path)
+
+
+def aggregate(timers):
+    """Aggregates the timings of many installs by phase.  A phase that
+    was measured several times in an install, e.g. in the prefetcher and
+    in the build, counts once with the sum of its times.
+
+    Returns:
+        list: one ``(name, count, total, max)`` tuple per phase, sorted
+            by decreasing total time.
+    """
+    phases = {}
+    for timer in timers:
+        for name in set(name for name, _ in timer.phases):
+            seconds = timer.seconds(name)
+            count, total, longest = phases.get(name, (0, 0.0, 0.0))
+            phases[name] = (count + 1, total + seconds, max(longest, seconds))
+
+    rows = [(name,) + stats for name, stats in phases.items()]
+    return sorted(rows, key=lambda row: (-row[2], row[0]))
+
+
+def print_phases(rows, timers):
+    print('%-36s %6s %10s %10s %10s' % (
+        'phase', 'count', 'total (s)', 'mean (s)', 'max (s)'))
+    for name, count, total, longest in rows:
+        print('%-36s %6d %10.2f %10.2f %10.2f' % (
+            name, count, total, total / count, longest))
+    print('%-36s %6d %10.2f' % (
+        'total', len(timers), sum(t.total for t in timers)))
+
+
+def print_packages(spec_timers, number):
+    spec_timers = sorted(spec_timers, key=lambda st: -st[1].total)
+    print('%10s  %-24s %s' % ('total (s)', 'slowest phase', 'package'))
+    for spec, timer in spec_timers[:number]:
+        slowest = ''
+        if timer.phases:
+            name, seconds = max(timer.phases, key=lambda p: p[1])
+            slowest = '%s (%.2f)' % (name, seconds)
+        print('%10.2f  %-24s %s' % (
+            timer.total, slowest, spec.format('$_$@$%@$/')))
+
+
+def install_times(parser, args):
+    spec_timers = list(read_timers(args.specs()))
+    if not spec_timers:
+        tty.die('No timing data for the installed packages%s.' % (
+            ' matching the query' if args.constraint else ''))
+
+    timers = [timer for _, timer in spec_timers]
+    rows = aggregate(timers)
+
+    if args.json:
+        sjson.dump({
+            'installs': len(timers),
+            'total': sum(t.total for t in timers),
+            'phases': [
+                {'name': name, 'count': count, 'total': total,
+                 'mean': total / count, 'max': longest}
+                for name, count, total, longest in rows
+            ]
+        }, sys.stdout)
+        print()
+    elif args.packages:
+        print_packages(spec_timers, args.number)
+    else:
+        print_phases(rows, timers)
@@ -88,9 +88,9 @@ def filter_by_name(pkgs, args):
                 if f.match(p):
                     return True
 
-                pkg = spack.repo.get(p)
-                if pkg.__doc__:
-                    return f.match(pkg.__doc__)
+                pkg = spack.repo.package_metadata(p)
+                if pkg.doc:
+                    return f.match(pkg.doc)
                 return False
         else:
             def match(p, f):
@@ -125,7 +125,7 @@ def rst(pkgs):
         return '%s\n%s%s' % (header, cols.getvalue(), header)
 
     pkg_names = pkgs
-    pkgs = [spack.repo.get(name) for name in pkg_names]
+    pkgs = [spack.repo.package_metadata(name) for name in pkg_names]
 
     print('.. _package-list:')
     print()
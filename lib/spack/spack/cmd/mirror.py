@@ -66,6 +66,10 @@ def setup_parser(subparser):
         '-o', '--one-version-per-spec', action='store_const',
         const=1, default=0,
         help="only fetch one 'preferred' version per spec, not all known")
+    create_parser.add_argument(
+        '-j', '--jobs', action='store', type=int,
+        help="number of specs to fetch at the same time. "
+        "default is the fetch_jobs setting in config.yaml")
 
     scopes = spack.config.config_scopes
 
@@ -201,7 +205,8 @@ def mirror_create(args):
 
     # Actually do the work to create the mirror
     present, mirrored, error = spack.mirror.create(
-        directory, specs, num_versions=args.one_version_per_spec)
+        directory, specs, num_versions=args.one_version_per_spec,
+        no_checksum=args.no_checksum, jobs=args.jobs)
     p, m, e = len(present), len(mirrored), len(error)
 
     verb = "updated" if existed else "created"
@@ -25,12 +25,16 @@
 from __future__ import print_function
 
 import collections
+import multiprocessing
 import os
 import shutil
 import spack.modules
+import spack.modules.common
+import spack.tengine
 
 import spack.cmd
 from llnl.util import filesystem, tty
+from ordereddict_backport import OrderedDict
 from spack.cmd.common import arguments
 
 description = "manipulate module files"
@@ -65,6 +69,11 @@ def setup_parser(subparser):
         help='delete the module file tree before refresh',
         action='store_true'
     )
+    refresh_parser.add_argument(
+        '-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+        help='number of module files to write at the same time '
+        '(default: number of cores)'
+    )
     arguments.add_common_arguments(
         refresh_parser, ['constraint', 'module_type', 'yes_to_all']
     )
@@ -265,7 +274,9 @@ def refresh(module_types, specs, args):
         if not answer:
             tty.die('Module file regeneration aborted.')
 
-    # Cycle over the module types and regenerate module files
+    # Cycle over the module types and find the module files to regenerate
+    templates_mtime = spack.tengine.templates_mtime()
+    manifests, outdated = {}, []
     for module_type in module_types:
 
         cls = spack.modules.module_types[module_type]
@@ -307,12 +318,107 @@ def refresh(module_types, specs, args):
         if os.path.isdir(module_type_root) and args.delete_tree:
             shutil.rmtree(module_type_root, ignore_errors=False)
         filesystem.mkdirp(module_type_root)
+
+        # Skip the module files that were generated from the same inputs
+        manifest = spack.modules.common.read_manifest(module_type_root)
+        manifests[module_type_root] = manifest
+        up_to_date = 0
         for x in writers:
-            try:
-                x.write(overwrite=True)
-            except Exception as e:
+            filename = os.path.relpath(x.layout.filename, module_type_root)
+            fingerprint = x.fingerprint(templates_mtime)
+            if (manifest.get(filename) == fingerprint and
+                    os.path.exists(x.layout.filename)):
+                up_to_date += 1
+            else:
+                outdated.append((x, module_type_root, filename, fingerprint))
+
+        if up_to_date:
+            msg = '{0} {1} module files are up to date'
+            tty.msg(msg.format(up_to_date, module_type))
+
+    try:
+        for (x, root, filename, fingerprint), error in _write(
+                outdated, args.jobs):
+            if error is None:
+                manifests[root][filename] = fingerprint
+            else:
+                manifests[root].pop(filename, None)
                 msg = 'Could not write module file because of {0}: [{1}]'
-                tty.warn(msg.format(str(e), x.layout.filename))
+                tty.warn(msg.format(error, x.layout.filename))
+    finally:
+        for root, manifest in manifests.items():
+            spack.modules.common.write_manifest(root, manifest)
+
+
+def _write(outdated, jobs):
+    """Writes module files, ``jobs`` at a time.
+
+    The module files of a spec, of all types, are written by the same
+    process, so that they share the environment modifications computed
+    for the spec (see ``spack.build_environment.cached_environment``).
+
+    Args:
+        outdated (list): tuples whose first item is the writer of a
+            module file
+
+    Yields:
+        tuple: each item of ``outdated``, and the error that prevented
+            its module file from being written or None
+    """
+    # Make the directories first, so that writers don't race to do it
+    groups = OrderedDict()
+    for item in outdated:
+        filesystem.mkdirp(os.path.dirname(item[0].layout.filename))
+        groups.setdefault(item[0].spec.dag_hash(), []).append(item)
+    groups = list(groups.values())
+
+    if jobs <= 1 or len(groups) <= 1:
+        for group in groups:
+            for item, error in zip(group, _write_group(group)):
+                yield item, error
+        return
+
+    pool = multiprocessing.Pool(
+        jobs, initializer=_init_worker, initargs=(groups,))
+    try:
+        for i, errors in pool.imap_unordered(
+                _write_in_worker, range(len(groups))):
+            for item, error in zip(groups[i], errors):
+                yield item, error
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _init_worker(groups):
+    """Initializer of the processes that write module files."""
+    global _groups
+    _groups = groups
+    tty.silence_worker()
+
+
+def _write_in_worker(i):
+    """Writes the module files of the i-th spec of the pool.
+
+    Returns:
+        tuple: ``i``, and the errors of its writers
+    """
+    return i, _write_group(_groups[i])
+
+
+def _write_group(group):
+    """Writes module files, and returns the errors that prevented it
+    (None for the module files that were written).
+    """
+    errors = []
+    for item in group:
+        try:
+            item[0].write(overwrite=True)
+            errors.append(None)
+        except Exception as e:
+            tty.debug_traceback()
+            errors.append(str(e))
+    return errors
 
 
 def module(parser, args):
@@ -36,7 +36,7 @@ def setup_parser(subparser):
         help="remove all temporary build stages (default)")
     subparser.add_argument(
         '-d', '--downloads', action='store_true',
-        help="remove cached downloads")
+        help="remove cached downloads and source trees")
     subparser.add_argument(
         '-m', '--misc-cache', action='store_true',
         help="remove long-lived caches, like the virtual package index")
@@ -56,5 +56,7 @@ def purge(parser, args):
         stage.purge()
     if args.downloads or args.all:
         spack.fetch_cache.destroy()
+        if spack.source_tree_cache_path:
+            spack.source_tree_cache.destroy()
     if args.misc_cache or args.all:
         spack.misc_cache.destroy()
@@ -28,7 +28,6 @@ import sys
 import os
 import re
 import argparse
-import pytest
 from six import StringIO
 
 from llnl.util.filesystem import *
@@ -60,6 +59,8 @@ def setup_parser(subparser):
 
 def do_list(args, unknown_args):
     """Print a lists of tests than what pytest offers."""
+    import pytest
+
     # Run test collection and get the tree out.
     old_output = sys.stdout
     try:
@@ -90,6 +91,9 @@ def do_list(args, unknown_args):
 
 
 def test(parser, args, unknown_args):
+    # pytest is slow to import, so only commands that run it do.
+    import pytest
+
     if args.pytest_help:
         # make the pytest.main help output more accurate
         sys.argv[0] = 'spack test'
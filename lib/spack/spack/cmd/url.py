@@ -137,10 +137,9 @@ def url_parse(args):
 
 
 def url_list(args):
-    urls = set()
+    def package_urls(pkg):
+        urls = set()
 
-    # Gather set of URLs from all packages
-    for pkg in spack.repo.all_packages():
         url = getattr(pkg.__class__, 'url', None)
         urls = url_list_parsing(args, urls, url, pkg)
 
@@ -148,6 +147,13 @@ def url_list(args):
             url = params.get('url', None)
             urls = url_list_parsing(args, urls, url, pkg)
 
+        return urls
+
+    # Gather set of URLs from all packages, loading them in parallel
+    urls = set()
+    for pkg_urls in spack.repo.map_packages(package_urls).values():
+        urls.update(pkg_urls)
+
     # Print URLs
     for url in sorted(urls):
         if args.color or args.extrapolation:
@@ -173,8 +179,8 @@ def url_summary(args):
 
     tty.msg('Generating a summary of URL parsing in Spack...')
 
-    # Loop through all packages
-    for pkg in spack.repo.all_packages():
+    def parse_urls(pkg):
+        """Parse the URLs of a package, in a worker process."""
         urls = set()
 
         url = getattr(pkg.__class__, 'url', None)
@@ -186,30 +192,46 @@ def url_summary(args):
             if url:
                 urls.add(url)
 
-        # Calculate statistics
+        results = []
         for url in urls:
-            total_urls += 1
+            version, vi, vregex, version_correct = None, None, None, False
+            ni, nregex, name_correct = None, None, False
 
             # Parse versions
-            version = None
             try:
                 version, vs, vl, vi, vregex = parse_version_offset(url)
-                version_regex_dict[vi] = vregex
-                version_count_dict[vi] += 1
-                if version_parsed_correctly(pkg, version):
-                    correct_versions += 1
+                version_correct = version_parsed_correctly(pkg, version)
             except UndetectableVersionError:
                 pass
 
             # Parse names
             try:
                 name, ns, nl, ni, nregex = parse_name_offset(url, version)
+                name_correct = name_parsed_correctly(pkg, name)
+            except UndetectableNameError:
+                pass
+
+            results.append(
+                (vi, vregex, version_correct, ni, nregex, name_correct))
+        return results
+
+    # Loop through all packages, loading them in parallel
+    for results in spack.repo.map_packages(parse_urls).values():
+        # Calculate statistics
+        for vi, vregex, version_correct, ni, nregex, name_correct in results:
+            total_urls += 1
+
+            if vi is not None:
+                version_regex_dict[vi] = vregex
+                version_count_dict[vi] += 1
+                if version_correct:
+                    correct_versions += 1
+
+            if ni is not None:
                 name_regex_dict[ni] = nregex
                 name_count_dict[ni] += 1
-                if name_parsed_correctly(pkg, name):
+                if name_correct:
                     correct_names += 1
-            except UndetectableNameError:
-                pass
 
     print()
     print('    Total URLs found:          {0}'.format(total_urls))
@@ -45,6 +45,10 @@ The `view` can be built and tore down via a number of methods (the "actions"):
 - statlink :: a view producing a status report of a symlink or
   hardlink view.
 
+The links created for each package are recorded in a manifest in the
+`.spack` directory of the view, so that packages already in the view are
+skipped without reading their prefix, and removed without walking it.
+
 The file system view concept is imspired by Nix, implemented by
 brett.viren@gmail.com ca 2016.
 
@@ -63,12 +67,22 @@ brett.viren@gmail.com ca 2016.
 # 3. add a visitor_MYACTION() function
 # 4. add any visitor_MYALIAS assignments to match any command line aliases
 
+import errno
+import multiprocessing
 import os
 import re
+from multiprocessing.pool import ThreadPool
+
 import spack
 import spack.cmd
+import spack.util.spack_json as sjson
 import llnl.util.tty as tty
 
+try:
+    from os import scandir
+except ImportError:
+    scandir = None
+
 description = "produce a single-rooted directory view of packages"
 section = "environment"
 level = "short"
@@ -87,6 +101,10 @@ def setup_parser(sp):
         '-d', '--dependencies', choices=['true', 'false', 'yes', 'no'],
         default='true',
         help="follow dependencies")
+    sp.add_argument(
+        '-j', '--jobs', type=int, default=multiprocessing.cpu_count(),
+        help="number of package prefixes to read at the same time "
+        "(default: number of cores)")
 
     ssp = sp.add_subparsers(metavar='ACTION', dest='action')
 
@@ -158,6 +176,76 @@ def purge_empty_directories(path):
                 pass
 
 
+def manifest_path(path):
+    'Return the path of the manifest of the view in `path`'
+    return os.path.join(path, '.spack', 'manifest.json')
+
+
+def read_manifest(path):
+    '''Return the manifest of the view in `path`, or an empty one.
+
+    The manifest maps the DAG hash of each package in the view to its
+    name and to the files linked for it, relative to the view.'''
+    return sjson.load_file(manifest_path(path))
+
+
+def write_manifest(path, manifest):
+    '''Write the manifest of the view in `path` (see `read_manifest`).
+
+    An empty manifest is removed instead, along with the `.spack`
+    directory of the view if that leaves it empty.'''
+    manifest_file = manifest_path(path)
+    if not manifest:
+        if os.path.exists(manifest_file):
+            os.remove(manifest_file)
+        try:
+            os.rmdir(os.path.dirname(manifest_file))
+        except OSError:
+            pass
+        return
+
+    assuredir(os.path.dirname(manifest_file))
+    sjson.dump_file(manifest, manifest_file)
+
+
+def list_files(prefix):
+    '''Return the paths of the files in `prefix`, relative to it.
+
+    Like `os.walk`, directories that are symbolic links are not
+    descended into, nor listed.'''
+    if scandir is None:
+        files = []
+        for dirpath, dirnames, filenames in os.walk(prefix):
+            reldir = relative_to(prefix, dirpath)
+            files.extend(os.path.join(reldir, f) for f in filenames)
+        return files
+
+    files = []
+    reldirs = ['']
+    while reldirs:
+        reldir = reldirs.pop()
+        for entry in scandir(os.path.join(prefix, reldir)):
+            relpath = os.path.join(reldir, entry.name)
+            if not entry.is_dir():
+                files.append(relpath)
+            elif not entry.is_symlink():
+                reldirs.append(relpath)
+    return files
+
+
+def list_all_files(specs, jobs):
+    'Return the files of each spec, reading `jobs` prefixes at a time'
+    if jobs <= 1 or len(specs) <= 1:
+        return [list_files(spec.prefix) for spec in specs]
+
+    pool = ThreadPool(min(jobs, len(specs)))
+    try:
+        return pool.map(list_files, [spec.prefix for spec in specs])
+    finally:
+        pool.close()
+        pool.join()
+
+
 def filter_exclude(specs, exclude):
     'Filter specs given sequence of exclude regex'
     to_exclude = [re.compile(e) for e in exclude]
@@ -216,6 +304,32 @@ def remove_one(spec, path, verbose=False):
             os.unlink(dst)
 
 
+def link_files(spec, files, path, link=os.symlink, verbose=False):
+    '''Link `files` of `spec`, relative to its prefix, into directory
+    `path`, and return the ones that were linked.'''
+    if verbose:
+        tty.info('Linking package: "%s"' % spec.name)
+
+    linked = []
+    made = set()
+    for relpath in files:
+        dst = transform_path(spec, relpath, path)
+        targdir = os.path.dirname(dst)
+        if targdir not in made:
+            assuredir(targdir)
+            made.add(targdir)
+        try:
+            link(os.path.join(spec.prefix, relpath), dst)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            if '.spack' not in dst.split(os.path.sep):
+                tty.warn("Skipping existing file: %s" % dst)
+            continue
+        linked.append(relative_to(path, dst))
+    return linked
+
+
 def link_one(spec, path, link=os.symlink, verbose=False):
     'Link all files in `spec` into directory `path`.'
 
@@ -224,32 +338,42 @@ def link_one(spec, path, link=os.symlink, verbose=False):
         tty.warn('Skipping existing package: "%s"' % spec.name)
         return
 
-    if verbose:
-        tty.info('Linking package: "%s"' % spec.name)
-    for dirpath, dirnames, filenames in os.walk(spec.prefix):
-        if not filenames:
-            continue        # avoid explicitly making empty dirs
+    return link_files(spec, list_files(spec.prefix), path, link, verbose)
 
-        targdir = transform_path(spec, dirpath, path)
-        assuredir(targdir)
 
-        for fname in filenames:
-            src = os.path.join(dirpath, fname)
-            dst = os.path.join(targdir, fname)
-            if os.path.exists(dst):
-                if '.spack' in dst.split(os.path.sep):
-                    continue    # silence these
-                tty.warn("Skipping existing file: %s" % dst)
-                continue
-            link(src, dst)
+def link_all(specs, args, link=os.symlink):
+    '''Link all files found in the specs that are not in the view yet,
+    reading their prefixes in parallel.'''
+    path = args.path[0]
+    assuredir(path)
+    manifest = read_manifest(path)
+
+    new_specs = []
+    for spec in specs:
+        if spec.dag_hash() in manifest:
+            if args.verbose:
+                tty.info('Skipping package in view: "%s"' % spec.name)
+        elif os.path.exists(transform_path(spec, '.spack', path)):
+            # Linked before the view had a manifest
+            tty.warn('Skipping existing package: "%s"' % spec.name)
+        else:
+            new_specs.append(spec)
+
+    try:
+        all_files = list_all_files(new_specs, args.jobs)
+        for spec, files in zip(new_specs, all_files):
+            manifest[spec.dag_hash()] = {
+                'name': spec.name,
+                'files': link_files(spec, files, path, link, args.verbose)
+            }
+    finally:
+        if new_specs:
+            write_manifest(path, manifest)
 
 
 def visitor_symlink(specs, args):
     'Symlink all files found in specs'
-    path = args.path[0]
-    assuredir(path)
-    for spec in specs:
-        link_one(spec, path, verbose=args.verbose)
+    link_all(specs, args)
 
 
 visitor_add = visitor_symlink
@@ -258,21 +382,61 @@ visitor_soft = visitor_symlink
 
 def visitor_hardlink(specs, args):
     'Hardlink all files found in specs'
-    path = args.path[0]
-    assuredir(path)
-    for spec in specs:
-        link_one(spec, path, os.link, verbose=args.verbose)
+    link_all(specs, args, os.link)
 
 
 visitor_hard = visitor_hardlink
 
 
+def unlink_files(files, path):
+    '''Remove `files`, relative to `path`, and the directories they
+    leave empty.'''
+    dirs = set()
+    for relpath in files:
+        dst = os.path.join(path, relpath)
+        try:
+            os.unlink(dst)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+        dirs.add(os.path.dirname(dst))
+
+    # Deepest directories first, so that their parents can be emptied
+    for dirpath in sorted(dirs, key=len, reverse=True):
+        while dirpath != path and dirpath.startswith(path):
+            try:
+                os.rmdir(dirpath)
+            except OSError:
+                break
+            dirpath = os.path.dirname(dirpath)
+
+
 def visitor_remove(specs, args):
     'Remove all files and directories found in specs from args.path'
     path = args.path[0]
-    for spec in specs:
+    if not os.path.exists(path):
+        return
+
+    manifest = read_manifest(path)
+    in_manifest = [s for s in specs if s.dag_hash() in manifest]
+    legacy = [s for s in specs if s.dag_hash() not in manifest]
+
+    try:
+        for spec in in_manifest:
+            if args.verbose:
+                tty.info('Removing package: "%s"' % spec.name)
+            entry = manifest.pop(spec.dag_hash())
+            unlink_files(entry['files'], os.path.normpath(path))
+    finally:
+        if in_manifest:
+            write_manifest(path, manifest)
+
+    # Packages linked before the view had a manifest
+    for spec in legacy:
         remove_one(spec, path, verbose=args.verbose)
-    purge_empty_directories(path)
+
+    if legacy:
+        purge_empty_directories(path)
 
 
 visitor_rm = visitor_remove
@@ -281,8 +445,12 @@ visitor_rm = visitor_remove
 def visitor_statlink(specs, args):
     'Give status of view in args.path relative to specs'
     path = args.path[0]
+    manifest = read_manifest(path)
     for spec in specs:
-        check_one(spec, path, verbose=args.verbose)
+        if spec.dag_hash() in manifest:
+            tty.info('Package in view: "%s"' % spec.name)
+        else:
+            check_one(spec, path, verbose=args.verbose)
 
 
 visitor_status = visitor_statlink
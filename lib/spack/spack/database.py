@@ -38,11 +38,20 @@ as the authoritative database of packages in Spack.  This module
 provides a cache and a sanity checking mechanism for what is in the
 filesystem.
 
+The database is stored in two files.  ``index.json`` is a snapshot of
+all the install records, and ``index.journal`` lists the changes made
+since the snapshot was written, one line per write transaction.  Write
+transactions only append to the journal, and processes that already
+read the database only read the journal entries they haven't seen.
+When the journal gets large, it is folded back into a new snapshot.
+
 """
 import os
 import sys
 import socket
 import contextlib
+import uuid
+from collections import defaultdict
 from six import string_types
 from six import iteritems
 
@@ -60,14 +69,21 @@ import spack.util.spack_json as sjson
 from spack.util.crypto import bit_length
 from spack.directory_layout import DirectoryLayoutError
 from spack.error import SpackError
-from spack.version import Version
+from spack.variant import MultiValuedVariant
+from spack.version import Version, VersionList
 
 
 # DB goes in this directory underneath the root
 _db_dirname = '.spack-db'
 
 # DB version.  This is stuck in the DB file to track changes in format.
-_db_version = Version('0.9.3')
+# Version 0.9.4 added the journal, which older versions of Spack don't
+# read, so they must refuse this database instead of rewriting it.
+_db_version = Version('0.9.4')
+
+# Oldest DB version whose records are read as they are, without
+# reindexing.  Snapshots of 0.9.3 are simply snapshots without a journal.
+_db_records_version = Version('0.9.3')
 
 # Timeout for spack database locks in seconds
 _db_lock_timeout = 60
@@ -75,6 +91,13 @@ _db_lock_timeout = 60
 # Types of dependencies tracked by the database
 _tracked_deps = ('link', 'run')
 
+# The journal is folded back into index.json when it grows larger than
+# this fraction of index.json
+_journal_compaction_ratio = 0.5
+
+# Version constraint of specs that don't constrain versions
+_any_version = VersionList([':'])
+
 
 def _autospec(function):
     """Decorator that automatically converts the argument of a single-arg
@@ -103,18 +126,83 @@ class InstallRecord(object):
     actually remove from the database until a spec has no installed
     dependents left.
 
+    Records read from the database files only keep the node dict of
+    their spec, and build the ``Spec`` the first time it is accessed.
+    Their name is available without building the spec.
+
     """
 
     def __init__(self, spec, path, installed, ref_count=0, explicit=False):
-        self.spec = spec
+        self._spec = spec
         self.path = str(path)
         self.installed = bool(installed)
         self.ref_count = ref_count
         self.explicit = explicit
 
+        # Node dict of a spec that wasn't built yet, and the records
+        # to get its dependencies from
+        self._spec_dict = None
+        self._records = None
+
+    @property
+    def spec(self):
+        if self._spec is None:
+            self._spec = self._build_spec()
+        return self._spec
+
+    @property
+    def name(self):
+        if self._spec is None:
+            return next(iter(self._spec_dict))
+        return self._spec.name
+
+    @property
+    def node(self):
+        """Node dict of a spec that wasn't built yet, or None."""
+        if self._spec is None:
+            return self._spec_dict[self.name]
+        return None
+
+    def _build_spec(self):
+        """Build the spec from its node dict, with the specs of the
+        records it depends on as dependencies.
+
+        The dependencies are built first if needed, so that all the
+        specs of a database share their nodes.
+        """
+        try:
+            spec = spack.spec.Spec.from_node_dict(self._spec_dict)
+        except Exception as e:
+            raise CorruptDatabaseError(
+                "Invalid record in Spack database: %s: %s" % (
+                    type(e).__name__, str(e)))
+
+        yaml_deps = self._spec_dict[spec.name].get('dependencies', {})
+        for dname, dhash, dtypes in spack.spec.Spec.read_yaml_dep_specs(
+                yaml_deps):
+            if dhash not in self._records:
+                tty.warn("Missing dependency not in database: ",
+                         "%s needs %s-%s" % (
+                             spec.format('$_$/'), dname, dhash[:7]))
+                continue
+            spec._add_dependency(self._records[dhash].spec, dtypes)
+
+        spec._mark_concrete()
+        self._spec_dict = None
+        self._records = None
+        return spec
+
     def to_dict(self):
+        if self._spec is None:
+            name = self.name
+            node = dict((k, v) for k, v in self._spec_dict[name].items()
+                        if k != 'hash')
+            spec_dict = {name: node}
+        else:
+            spec_dict = self._spec.to_node_dict()
+
         return {
-            'spec': self.spec.to_node_dict(),
+            'spec': spec_dict,
             'path': self.path,
             'installed': self.installed,
             'ref_count': self.ref_count,
@@ -127,6 +215,226 @@ class InstallRecord(object):
         return InstallRecord(spec, d['path'], d['installed'], d['ref_count'],
                              d.get('explicit', False))
 
+    @classmethod
+    def from_lazy_dict(cls, hash_key, dictionary, records):
+        """Make a record whose spec is built from its node dict when it
+        is first accessed.
+
+        Args:
+            hash_key (str): DAG hash of the spec
+            dictionary (dict): record, as output by ``to_dict()``
+            records (dict): maps hashes to the records of the
+                dependencies of the spec
+        """
+        rec = cls.from_dict(None, dictionary)
+        rec._spec_dict = dictionary['spec']
+        rec._records = records
+
+        # Install records don't include hash with spec, so we add it in
+        # here to ensure it is read properly.
+        rec._spec_dict[rec.name]['hash'] = hash_key
+        return rec
+
+    def state(self):
+        """Everything in the record that can change, as a dict."""
+        return {
+            'path': self.path,
+            'installed': self.installed,
+            'ref_count': self.ref_count,
+            'explicit': self.explicit
+        }
+
+    def update(self, state):
+        """Update the record from the output of ``state()``."""
+        self.path = state['path']
+        self.installed = state['installed']
+        self.ref_count = state['ref_count']
+        self.explicit = state.get('explicit', False)
+
+
+def _file_stat(path):
+    """Identifies a version of the file at path, or None if missing."""
+    try:
+        st = os.stat(path)
+        return (st.st_ino, st.st_size, st.st_mtime)
+    except OSError:
+        return None
+
+
+def _variant_values(variant):
+    """Normalized values of a variant, used as keys of the variant index.
+
+    Values are compared as lowercase strings so that the values of
+    concrete variants and the ones parsed from queries (e.g. ``True``,
+    ``'true'`` and ``+debug``) map to the same key.
+    """
+    values = variant.value
+    if not isinstance(values, tuple):
+        values = (values,)
+    return [str(v).lower() for v in values]
+
+
+class QueryIndex(object):
+    """Secondary indexes on the records of a database.
+
+    The indexes select the records that might satisfy a query, so that
+    ``Database.query()`` only calls ``Spec.satisfies()`` on those, instead
+    of on every record.  They never exclude a record that satisfies the
+    query, but may include records that don't.
+
+    Records are indexed by name, version, compiler and variant values.
+    The index of dependents maps each record to the records that depend
+    on it directly.
+    """
+
+    def __init__(self, data):
+        self.by_name = defaultdict(set)
+        self.by_compiler = defaultdict(set)
+        self.by_variant = defaultdict(set)
+        self.dependents = defaultdict(set)
+
+        #: Maps version strings to a version list and a set of keys
+        self.by_version = {}
+
+        #: Records with no version or no compiler, as they satisfy any
+        #: version or compiler constraint
+        self.unversioned = set()
+        self.no_compiler = set()
+
+        for key, rec in data.items():
+            node = rec.node
+            if node is None:
+                self._add_spec(key, rec.spec)
+            else:
+                self._add_node(key, rec.name, node)
+
+    def _add_spec(self, key, spec):
+        self._add(key, spec.name, spec.versions,
+                  spec.compiler.name if spec.compiler else None,
+                  spec.variants.values(),
+                  [d.dag_hash() for d in spec.dependencies(_tracked_deps)])
+
+    def _add_node(self, key, name, node):
+        """Index a record from the node dict of its spec, so that specs
+        aren't built just to be indexed.
+        """
+        versions = VersionList()
+        if 'version' in node or 'versions' in node:
+            versions = VersionList.from_dict(node)
+
+        compiler = None
+        if node.get('compiler'):
+            compiler = node['compiler']['name']
+
+        parameters = node.get('parameters') or node.get('variants') or {}
+        flags = spack.spec.FlagMap.valid_compiler_flags()
+        variants = [MultiValuedVariant.from_node_dict(n, v)
+                    for n, v in parameters.items() if n not in flags]
+
+        yaml_deps = node.get('dependencies', {})
+        dependencies = [
+            dhash for _, dhash, dtypes
+            in spack.spec.Spec.read_yaml_dep_specs(yaml_deps)
+            if any(t in _tracked_deps for t in dtypes)]
+
+        self._add(key, name, versions, compiler, variants, dependencies)
+
+    def _add(self, key, name, versions, compiler, variants, dependencies):
+        self.by_name[name].add(key)
+
+        if versions:
+            versions = self.by_version.setdefault(
+                str(versions), (versions, set()))
+            versions[1].add(key)
+        else:
+            self.unversioned.add(key)
+
+        if compiler:
+            self.by_compiler[compiler].add(key)
+        else:
+            self.no_compiler.add(key)
+
+        for variant in variants:
+            for value in _variant_values(variant):
+                self.by_variant[(variant.name, value)].add(key)
+
+        for dep_hash in dependencies:
+            self.dependents[dep_hash].add(key)
+
+    def candidates(self, query_spec):
+        """Get the keys of the records that might satisfy an abstract spec.
+
+        Returns:
+            set of keys, or None if the indexes can't rule out any record
+        """
+        # Constraints on a virtual spec apply to what the records provide,
+        # not to the records themselves, so only their names are checked.
+        if query_spec.virtual:
+            providers = spack.repo.provider_index.providers_for(
+                query_spec.name)
+            return set().union(
+                *[self.by_name.get(p.name, ()) for p in providers])
+
+        constraints = []
+
+        if query_spec.name:
+            constraints.append(self.by_name.get(query_spec.name, set()))
+
+        if query_spec.versions and query_spec.versions != _any_version:
+            constraints.append(self._matching_versions(query_spec.versions))
+
+        if query_spec.compiler:
+            constraints.append(
+                self.by_compiler.get(query_spec.compiler.name, set()) |
+                self.no_compiler)
+
+        for name, variant in query_spec.variants.items():
+            for value in _variant_values(variant):
+                constraints.append(self.by_variant.get((name, value), set()))
+
+        # Only anonymous queries require every dependency to be in the
+        # DAG of the records, see Spec.satisfies().
+        if not query_spec.name:
+            for dep in query_spec.traverse(root=False):
+                if not dep.virtual:
+                    constraints.append(self._depending_on(dep.name))
+
+        if not constraints:
+            return None
+
+        constraints.sort(key=len)
+        keys = set(constraints[0])
+        for other in constraints[1:]:
+            if not keys:
+                break
+            keys &= other
+        return keys
+
+    def _matching_versions(self, versions):
+        keys = set(self.unversioned)
+        for spec_versions, version_keys in self.by_version.values():
+            if spec_versions.satisfies(versions):
+                keys |= version_keys
+        return keys
+
+    def _depending_on(self, name):
+        """Keys of the records with a dependency called name in their DAG.
+        """
+        return self.all_dependents(self.by_name.get(name, ()))
+
+    def all_dependents(self, keys):
+        """Keys of the records that depend, directly or not, on any of
+        the records with the given keys.
+        """
+        result = set()
+        stack = list(keys)
+        while stack:
+            for dependent in self.dependents.get(stack.pop(), ()):
+                if dependent not in result:
+                    result.add(dependent)
+                    stack.append(dependent)
+        return result
+
 
 class Database(object):
 
@@ -167,6 +475,7 @@ class Database(object):
         # Set up layout of database files within the db dir
         self._old_yaml_index_path = join_path(self._db_dir, 'index.yaml')
         self._index_path = join_path(self._db_dir, 'index.json')
+        self._journal_path = join_path(self._db_dir, 'index.journal')
         self._lock_path = join_path(self._db_dir, 'lock')
 
         # This is for other classes to use to lock prefix directories.
@@ -180,9 +489,26 @@ class Database(object):
         self.lock = Lock(self._lock_path)
         self._data = {}
 
+        # Query index on self._data, built when a query needs it and
+        # discarded when records are added or removed
+        self._index = None
+
         # whether there was an error at the start of a read transaction
         self._error = None
 
+        # Identifies the version of index.json that self._data was read
+        # from, and the generation of the journal that goes with it.
+        self._snapshot_stat = None
+        self._generation = None
+
+        # Offset in the journal up to which entries were read, or None
+        # if the journal doesn't apply to the snapshot in memory.
+        self._journal_offset = None
+
+        # Record states as of the last read or write of the files, to
+        # find the changes to write to the journal.
+        self._journaled = {}
+
     def write_transaction(self, timeout=_db_lock_timeout):
         """Get a write lock context manager for use in a `with` block."""
         return WriteTransaction(self.lock, self._read, self._write, timeout)
@@ -249,7 +575,8 @@ class Database(object):
         database = {
             'database': {
                 'installs': installs,
-                'version': str(_db_version)
+                'version': str(_db_version),
+                'generation': self._generation
             }
         }
 
@@ -259,41 +586,6 @@ class Database(object):
             raise syaml.SpackYAMLError(
                 "error writing YAML database:", str(e))
 
-    def _read_spec_from_dict(self, hash_key, installs):
-        """Recursively construct a spec from a hash in a YAML database.
-
-        Does not do any locking.
-        """
-        spec_dict = installs[hash_key]['spec']
-
-        # Install records don't include hash with spec, so we add it in here
-        # to ensure it is read properly.
-        for name in spec_dict:
-            spec_dict[name]['hash'] = hash_key
-
-        # Build spec from dict first.
-        spec = spack.spec.Spec.from_node_dict(spec_dict)
-        return spec
-
-    def _assign_dependencies(self, hash_key, installs, data):
-        # Add dependencies from other records in the install DB to
-        # form a full spec.
-        spec = data[hash_key].spec
-        spec_dict = installs[hash_key]['spec']
-
-        if 'dependencies' in spec_dict[spec.name]:
-            yaml_deps = spec_dict[spec.name]['dependencies']
-            for dname, dhash, dtypes in spack.spec.Spec.read_yaml_dep_specs(
-                    yaml_deps):
-                if dhash not in data:
-                    tty.warn("Missing dependency not in database: ",
-                             "%s needs %s-%s" % (
-                                 spec.format('$_$/'), dname, dhash[:7]))
-                    continue
-
-                child = data[dhash].spec
-                spec._add_dependency(child, dtypes)
-
     def _read_from_file(self, stream, format='json'):
         """
         Fill database from file, do not maintain old data
@@ -340,7 +632,7 @@ class Database(object):
         version = Version(db['version'])
         if version > _db_version:
             raise InvalidDatabaseVersionError(_db_version, version)
-        elif version < _db_version:
+        elif version < _db_records_version:
             self.reindex(spack.store.layout)
             installs = dict((k, v.to_dict()) for k, v in self._data.items())
 
@@ -350,47 +642,127 @@ class Database(object):
             msg %= (hash_key, type(e).__name__, str(e))
             raise CorruptDatabaseError(msg, self._index_path)
 
-        # Build up the database in three passes:
-        #
-        #   1. Read in all specs without dependencies.
-        #   2. Hook dependencies up among specs.
-        #   3. Mark all specs concrete.
-        #
-        # The database is built up so that ALL specs in it share nodes
-        # (i.e., its specs are a true Merkle DAG, unlike most specs.)
-
-        # Pass 1: Iterate through database and build specs w/o dependencies
+        # Specs are built lazily, when they are first accessed, so that
+        # commands that need a few of them don't build all of them.  They
+        # are built along with their dependencies, so that ALL specs in
+        # the database share nodes (i.e., its specs are a true Merkle DAG,
+        # unlike most specs.)
         data = {}
         for hash_key, rec in installs.items():
             try:
-                # This constructs a spec DAG from the list of all installs
-                spec = self._read_spec_from_dict(hash_key, installs)
+                data[hash_key] = InstallRecord.from_lazy_dict(
+                    hash_key, rec, data)
+            except Exception as e:
+                invalid_record(hash_key, e)
+
+        self._data = data
+        self._index = None
 
-                # Insert the brand new spec in the database.  Each
-                # spec has its own copies of its dependency specs.
-                # TODO: would a more immmutable spec implementation simplify
-                #       this?
-                data[hash_key] = InstallRecord.from_dict(spec, rec)
+        # The journal applies to this snapshot only if it has the same
+        # generation.  Snapshots written before there was a journal
+        # don't have any.
+        self._generation = db.get('generation')
+        self._journal_offset = None
+        self._journaled = dict(
+            (k, rec.state()) for k, rec in data.items())
 
+    def _read_journal(self):
+        """Apply the journal entries that were not read yet to the
+        records in memory.
+
+        Does not do any locking.
+        """
+        try:
+            with open(self._journal_path, 'rb') as f:
+                header = f.readline()
+                try:
+                    generation = sjson.load(header.decode('utf-8'))
+                except ValueError:
+                    generation = None
+
+                # A journal from another generation has been folded into
+                # the snapshot already, or was written for an older one.
+                if (self._generation is None or generation is None or
+                        generation.get('generation') != self._generation or
+                        not header.endswith(b'\n')):
+                    self._journal_offset = None
+                    return
+
+                if self._journal_offset is None:
+                    self._journal_offset = len(header)
+                f.seek(self._journal_offset)
+                lines = f.read().split(b'\n')
+
+        except IOError:
+            self._journal_offset = None
+            return
+
+        # The last line is incomplete if a writer died while appending
+        # it.  It's ignored, and overwritten by the next writer.
+        changes = []
+        for line in lines[:-1]:
+            try:
+                changes.extend(sjson.load(line.decode('utf-8')))
             except Exception as e:
-                invalid_record(hash_key, e)
+                raise CorruptDatabaseError(
+                    "error parsing database journal:", str(e))
+            self._journal_offset += len(line) + 1
+
+        if changes:
+            self._apply_changes(changes)
+
+    def _apply_changes(self, changes):
+        """Apply changes read from the journal to the records in memory.
+
+        As in ``_read_from_file()``, new specs are built when they are
+        first accessed.
+
+        Does not do any locking.
+        """
+        def invalid_change(hash_key, error):
+            msg = ("Invalid change in Spack database journal: "
+                   "hash: %s, cause: %s: %s")
+            msg %= (hash_key, type(error).__name__, str(error))
+            raise CorruptDatabaseError(msg, self._journal_path)
 
-        # Pass 2: Assign dependencies once all specs are created.
-        for hash_key in data:
+        data = self._data
+        for change in changes:
+            hash_key, rec = change['hash'], change['record']
             try:
-                self._assign_dependencies(hash_key, installs, data)
+                if rec is None:
+                    del data[hash_key]
+                    self._journaled.pop(hash_key, None)
+                    continue
+                elif 'spec' in rec:
+                    data[hash_key] = InstallRecord.from_lazy_dict(
+                        hash_key, rec, data)
+                else:
+                    data[hash_key].update(rec)
             except Exception as e:
-                invalid_record(hash_key, e)
+                invalid_change(hash_key, e)
+            self._journaled[hash_key] = data[hash_key].state()
 
-        # Pass 3: Mark all specs concrete.  Specs representing real
-        # installations must be explicitly marked.
-        # We do this *after* all dependencies are connected because if we
-        # do it *while* we're constructing specs,it causes hashes to be
-        # cached prematurely.
-        for hash_key, rec in data.items():
-            rec.spec._mark_concrete()
+        self._index = None
 
-        self._data = data
+    def _journal_changes(self):
+        """Changes to the records since they were last read or written.
+
+        New records are written in full, other changed records without
+        their spec, and removed records as None.
+        """
+        changes = []
+        for hash_key, rec in self._data.items():
+            old_state = self._journaled.get(hash_key)
+            if old_state is None:
+                changes.append({'hash': hash_key, 'record': rec.to_dict()})
+            elif old_state != rec.state():
+                changes.append({'hash': hash_key, 'record': rec.state()})
+
+        for hash_key in self._journaled:
+            if hash_key not in self._data:
+                changes.append({'hash': hash_key, 'record': None})
+
+        return changes
 
     def reindex(self, directory_layout):
         """Build database index from scratch based on a directory layout.
@@ -403,13 +775,17 @@ class Database(object):
         def _read_suppress_error():
             try:
                 if os.path.isfile(self._index_path):
-                    self._read_from_file(self._index_path)
+                    self._read_index()
             except CorruptDatabaseError as e:
                 self._error = e
                 self._data = {}
 
+        # The reindexed database is written to a new snapshot.
+        def _write_compact(type, value, traceback):
+            self._write(type, value, traceback, compact=True)
+
         transaction = WriteTransaction(
-            self.lock, _read_suppress_error, self._write, _db_lock_timeout
+            self.lock, _read_suppress_error, _write_compact, _db_lock_timeout
         )
 
         with transaction:
@@ -430,6 +806,7 @@ class Database(object):
             try:
                 # Initialize data in the reconstructed DB
                 self._data = {}
+                self._index = None
 
                 # Start inspecting the installed prefixes
                 processed_specs = set()
@@ -496,6 +873,7 @@ class Database(object):
             except:
                 # If anything explodes, restore old data, skip write.
                 self._data = old_data
+                self._index = None
                 raise
 
     def _check_ref_counts(self):
@@ -522,34 +900,111 @@ class Database(object):
                     "Invalid ref_count: %s: %d (expected %d), in DB %s" %
                     (key, found, expected, self._index_path))
 
-    def _write(self, type, value, traceback):
-        """Write the in-memory database index to its file path.
+    def _write(self, type, value, traceback, compact=False):
+        """Write the changes to the in-memory database to its files.
 
         This is a helper function called by the WriteTransaction context
         manager. If there is an exception while the write lock is active,
-        nothing will be written to the database file, but the in-memory
+        nothing will be written to the database files, but the in-memory
         database *may* be left in an inconsistent state.  It will be consistent
         after the start of the next transaction, when it read from disk again.
 
+        Changes are appended to the journal as a single line.  A new
+        snapshot is written instead if ``compact`` is True, if there is
+        no journal for the snapshot read, or if the journal grew larger
+        than ``_journal_compaction_ratio`` times the snapshot.
+
         This routine does no locking.
 
         """
         # Do not write if exceptions were raised
         if type is not None:
+            # Make the next transaction read everything from disk again.
+            self._snapshot_stat = None
             return
 
-        temp_file = self._index_path + (
-            '.%s.%s.temp' % (socket.getfqdn(), os.getpid()))
+        if (compact or self._snapshot_stat is None or
+                self._journal_offset is None):
+            self._write_snapshot()
+            return
 
-        # Write a temporary database file them move it into place
+        changes = self._journal_changes()
+        if not changes:
+            return
+
+        line = sjson.dump(changes, compact=True).encode('utf-8') + b'\n'
         try:
+            with open(self._journal_path, 'r+b') as f:
+                # Overwrite the incomplete line a dead writer may have left
+                f.seek(self._journal_offset)
+                f.truncate()
+                f.write(line)
+        except:
+            self._snapshot_stat = None
+            raise
+
+        self._journal_offset += len(line)
+        self._journaled = dict(
+            (k, rec.state()) for k, rec in self._data.items())
+
+        snapshot_size = self._snapshot_stat[1]
+        if self._journal_offset > _journal_compaction_ratio * snapshot_size:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        """Write all the records to a new snapshot and start a new journal.
+
+        This routine does no locking.
+        """
+        self._generation = uuid.uuid4().hex
+        suffix = '.%s.%s.temp' % (socket.getfqdn(), os.getpid())
+        header = sjson.dump({'generation': self._generation}, compact=True)
+
+        # Write temporary database files then move them into place.  If
+        # this fails after the snapshot is in place, the old journal is
+        # ignored, as it belongs to another generation.
+        temp_files = []
+        try:
+            temp_file = self._index_path + suffix
+            temp_files.append(temp_file)
             with open(temp_file, 'w') as f:
                 self._write_to_file(f)
             os.rename(temp_file, self._index_path)
+
+            temp_file = self._journal_path + suffix
+            temp_files.append(temp_file)
+            with open(temp_file, 'wb') as f:
+                f.write(header.encode('utf-8') + b'\n')
+            os.rename(temp_file, self._journal_path)
         except:
-            # Clean up temp file if something goes wrong.
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+            # Clean up temp files if something goes wrong.
+            for temp_file in temp_files:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+            self._snapshot_stat = None
+            raise
+
+        self._snapshot_stat = _file_stat(self._index_path)
+        self._journal_offset = len(header) + 1
+        self._journaled = dict(
+            (k, rec.state()) for k, rec in self._data.items())
+
+    def _read_index(self):
+        """Read the snapshot if it changed since it was last read, then
+        the journal entries that were not read yet.
+
+        Does not do any locking.
+        """
+        stat = _file_stat(self._index_path)
+        try:
+            if stat is None or stat != self._snapshot_stat:
+                self._snapshot_stat = None
+                self._read_from_file(self._index_path, format='json')
+                self._snapshot_stat = stat
+            self._read_journal()
+        except:
+            # Read everything again next time
+            self._snapshot_stat = None
             raise
 
     def _read(self):
@@ -562,14 +1017,14 @@ class Database(object):
         """
         if os.path.isfile(self._index_path):
             # Read from JSON file if a JSON database exists
-            self._read_from_file(self._index_path, format='json')
+            self._read_index()
 
         elif os.path.isfile(self._old_yaml_index_path):
             if os.access(self._db_dir, os.R_OK | os.W_OK):
                 # if we can write, then read AND write a JSON file.
                 self._read_from_file(self._old_yaml_index_path, format='yaml')
                 with WriteTransaction(self.lock, timeout=_db_lock_timeout):
-                    self._write(None, None, None)
+                    self._write_snapshot()
             else:
                 # Read chck for a YAML file if we can't find JSON.
                 self._read_from_file(self._old_yaml_index_path, format='yaml')
@@ -615,6 +1070,7 @@ class Database(object):
             new_spec = spec.copy(deps=False)
             self._data[key] = InstallRecord(
                 new_spec, path, installed, ref_count=0, explicit=explicit)
+            self._index = None
 
             # Connect dependencies from the DB to the new copy.
             for name, dep in iteritems(spec.dependencies_dict(_tracked_deps)):
@@ -673,6 +1129,7 @@ class Database(object):
 
         if rec.ref_count == 0 and not rec.installed:
             del self._data[key]
+            self._index = None
             for dep in spec.dependencies(_tracked_deps):
                 self._decrement_ref_count(dep)
 
@@ -687,6 +1144,7 @@ class Database(object):
             return rec.spec
 
         del self._data[key]
+        self._index = None
         for dep in rec.spec.dependencies(_tracked_deps):
             self._decrement_ref_count(dep)
 
@@ -710,14 +1168,23 @@ class Database(object):
         with self.write_transaction():
             return self._remove(spec)
 
+    def _get_index(self):
+        """Get the query index on the current records, building it if
+        needed.
+
+        Does no locking.
+        """
+        if self._index is None:
+            self._index = QueryIndex(self._data)
+        return self._index
+
     @_autospec
     def installed_dependents(self, spec):
         """List the installed specs that depend on this one."""
-        dependents = set()
-        for spec in self.query(spec):
-            for dependent in spec.traverse(direction='parents', root=False):
-                dependents.add(dependent)
-        return dependents
+        with self.read_transaction():
+            keys = [s.dag_hash() for s in self.query(spec)]
+            dependents = self._get_index().all_dependents(keys)
+            return set(self._data[key].spec for key in dependents)
 
     @_autospec
     def installed_extensions_for(self, extendee_spec):
@@ -779,16 +1246,28 @@ class Database(object):
                 else:
                     return []
 
-            # Abstract specs require more work -- currently we test
-            # against everything.
+            # Abstract specs require more work -- we test the records
+            # that the index can't rule out.
+            if isinstance(query_spec, string_types):
+                query_spec = spack.spec.Spec(query_spec)
+
+            keys = None
+            if query_spec is not any:
+                keys = self._get_index().candidates(query_spec)
+
+            if keys is None:
+                records = self._data.items()
+            else:
+                records = ((key, self._data[key]) for key in keys)
+
             results = []
-            for key, rec in self._data.items():
+            for key, rec in records:
                 if installed is not any and rec.installed != installed:
                     continue
                 if explicit is not any and rec.explicit != explicit:
                     continue
                 if known is not any and spack.repo.exists(
-                        rec.spec.name) != known:
+                        rec.name) != known:
                     continue
                 if query_spec is any or rec.spec.satisfies(query_spec):
                     results.append(rec.spec)
@@ -115,6 +115,11 @@ class DirectoryLayout(object):
         """Add to the list of currently installed extensions."""
         raise NotImplementedError()
 
+    def add_extensions(self, spec, ext_specs):
+        """Add several extensions to the list of currently installed
+        extensions at once."""
+        raise NotImplementedError()
+
     def remove_extension(self, spec, ext_spec):
         """Remove from the list of currently installed extensions."""
         raise NotImplementedError()
@@ -180,6 +185,7 @@ class YamlDirectoryLayout(DirectoryLayout):
         self.extension_file_name = 'extensions.yaml'
         self.build_log_name      = 'build.out'  # build log.
         self.build_env_name      = 'build.env'  # build environment
+        self.build_times_name    = 'install_times.json'  # phase timings
         self.packages_dir        = 'repos'      # archive of package.py files
 
         # Cache of already written/read extension maps.
@@ -235,6 +241,10 @@ class YamlDirectoryLayout(DirectoryLayout):
         return join_path(self.path_for_spec(spec), self.metadata_dir,
                          self.build_env_name)
 
+    def build_times_path(self, spec):
+        return join_path(self.path_for_spec(spec), self.metadata_dir,
+                         self.build_times_name)
+
     def build_packages_path(self, spec):
         return join_path(self.path_for_spec(spec), self.metadata_dir,
                          self.packages_dir)
@@ -306,7 +316,7 @@ class YamlDirectoryLayout(DirectoryLayout):
         # Create a temp file in the same directory as the actual file.
         dirname, basename = os.path.split(path)
         tmp = tempfile.NamedTemporaryFile(
-            prefix=basename, dir=dirname, delete=False)
+            mode='w', prefix=basename, dir=dirname, delete=False)
 
         # write tmp file
         with tmp:
@@ -376,15 +386,21 @@ class YamlDirectoryLayout(DirectoryLayout):
             raise NoSuchExtensionError(spec, ext_spec)
 
     def add_extension(self, spec, ext_spec):
+        self.add_extensions(spec, [ext_spec])
+
+    def add_extensions(self, spec, ext_specs):
         _check_concrete(spec)
-        _check_concrete(ext_spec)
+        for ext_spec in ext_specs:
+            _check_concrete(ext_spec)
 
-        # Check whether it's already installed or if it's a conflict.
+        # Check whether they're already installed or if there's a conflict.
         exts = self._extension_map(spec)
-        self.check_extension_conflict(spec, ext_spec)
+        for ext_spec in ext_specs:
+            self.check_extension_conflict(spec, ext_spec)
+
+        exts.update((ext_spec.name, ext_spec) for ext_spec in ext_specs)
 
-        # do the actual adding.
-        exts[ext_spec.name] = ext_spec
+        # do the actual adding, once for all of them.
         self._write_extensions(spec, exts)
 
     def remove_extension(self, spec, ext_spec):
@@ -45,6 +45,7 @@ import sys
 import re
 import shutil
 import copy
+import time
 from functools import wraps
 from six import string_types
 from six import with_metaclass
@@ -53,11 +54,13 @@ import llnl.util.tty as tty
 from llnl.util.filesystem import *
 import spack
 import spack.error
+import spack.host_stats
 import spack.util.crypto as crypto
+import spack.util.download
 from spack.util.executable import *
 from spack.util.string import *
 from spack.version import Version, ver
-from spack.util.compression import decompressor_for, extension
+from spack.util.compression import decompressor_for, extension, extract
 
 import spack.util.pattern as pattern
 """List of all fetch strategies, created by FetchStrategy metaclass."""
@@ -186,6 +189,14 @@ class URLFetchStrategy(FetchStrategy):
         self.extra_curl_options = kwargs.get('curl_options', [])
         self._curl = None
 
+        # Algorithm the archive is hashed with while it is downloaded,
+        # when it has no digest to check
+        self.hash_algorithm = kwargs.get('hash_algorithm', None)
+
+        # (archive file, hasher) if the archive was hashed while it was
+        # downloaded
+        self._download_hash = None
+
         self.extension = kwargs.get('extension', None)
 
         if not self.url:
@@ -213,6 +224,70 @@ class URLFetchStrategy(FetchStrategy):
 
         tty.msg("Fetching %s" % self.url)
 
+        self._download_hash = None
+        start = time.time()
+        try:
+            if self.url.startswith('file://') and save_file:
+                content_type = self._fetch_local(partial_file)
+            elif (spack.url_fetch_method == 'urllib' and save_file and
+                    spack.util.download.supports(self.url)):
+                content_type = self._fetch_urllib(save_file, partial_file)
+            else:
+                content_type = self._fetch_curl(save_file, partial_file)
+        except URLNotFoundError:
+            # The server is fine, it just doesn't have this archive
+            raise
+        except FailedDownloadError:
+            spack.host_stats.record_failure(self.url)
+            raise
+
+        downloaded = partial_file or self.archive_file
+        if downloaded and os.path.exists(downloaded):
+            spack.host_stats.record_download(
+                self.url, time.time() - start, os.path.getsize(downloaded))
+
+        # Check if we somehow got an HTML file rather than the archive we
+        # asked for.  We only look at the last content type, to handle
+        # redirects properly.
+        if 'text/html' in content_type:
+            tty.warn("The contents of ",
+                     (self.archive_file if self.archive_file is not None
+                      else "the archive"),
+                     " look like HTML.",
+                     "The checksum will likely be bad.  If it is, you can use",
+                     "'spack clean <package>' to remove the bad archive, then",
+                     "fix your internet gateway issue and install again.")
+        if save_file:
+            os.rename(partial_file, save_file)
+
+        if not self.archive_file:
+            raise FailedDownloadError(self.url)
+
+    def _fetch_local(self, partial_file):
+        """Fetches an archive from the local filesystem, e.g. from a
+        file:// mirror, without copying its data if the filesystem can
+        share it (see ``link_or_copy``).
+
+        Returns:
+            str: an empty content type
+        """
+        path = re.sub('^file://', '', self.url)
+        if not os.path.isfile(path):
+            raise URLNotFoundError(
+                self.url, "URL %s was not found!" % self.url)
+
+        if os.path.lexists(partial_file):
+            os.remove(partial_file)
+        method = link_or_copy(path, partial_file)
+        tty.debug("Fetched %s with %s" % (path, method))
+        return ''
+
+    def _fetch_curl(self, save_file, partial_file):
+        """Downloads the archive with curl.
+
+        Returns:
+            str: the last content type in the HTTP headers
+        """
         if partial_file:
             save_args = ['-C',
                          '-',  # continue partial downloads
@@ -252,9 +327,15 @@ class URLFetchStrategy(FetchStrategy):
                 os.remove(partial_file)
 
             if curl.returncode == 22:
-                # This is a 404.  Curl will print the error.
+                # This is an HTTP error.  Curl will print it, and the
+                # status of the last answer is in the headers.
+                codes = re.findall(r'^HTTP/\S+ (\d+)', headers, re.M)
+                if codes and int(codes[-1]) in (404, 410):
+                    raise URLNotFoundError(
+                        self.url, "URL %s was not found!" % self.url)
                 raise FailedDownloadError(
-                    self.url, "URL %s was not found!" % self.url)
+                    self.url, "Curl failed with HTTP status %s" %
+                    (codes[-1] if codes else 'unknown'))
 
             elif curl.returncode == 60:
                 # This is a certificate error.  Suggest spack -k
@@ -274,23 +355,44 @@ class URLFetchStrategy(FetchStrategy):
                     self.url,
                     "Curl failed with error %d" % curl.returncode)
 
-        # Check if we somehow got an HTML file rather than the archive we
-        # asked for.  We only look at the last content type, to handle
-        # redirects properly.
         content_types = re.findall(r'Content-Type:[^\r\n]+', headers)
-        if content_types and 'text/html' in content_types[-1]:
-            tty.warn("The contents of ",
-                     (self.archive_file if self.archive_file is not None
-                      else "the archive"),
-                     " look like HTML.",
-                     "The checksum will likely be bad.  If it is, you can use",
-                     "'spack clean <package>' to remove the bad archive, then",
-                     "fix your internet gateway issue and install again.")
-        if save_file:
-            os.rename(partial_file, save_file)
+        return content_types[-1] if content_types else ''
 
-        if not self.archive_file:
-            raise FailedDownloadError(self.url)
+    def _fetch_urllib(self, save_file, partial_file):
+        """Downloads the archive in this process, hashing it on the way.
+
+        Returns:
+            str: the content type of the archive
+        """
+        hasher = None
+        if self.digest:
+            hasher = crypto.Checker(self.digest).new_hasher()
+        elif self.hash_algorithm:
+            hasher = crypto.hashes[self.hash_algorithm]()
+
+        try:
+            content_type = spack.util.download.download(
+                self.url, partial_file, hasher=hasher,
+                insecure=spack.insecure)
+        except spack.util.download.HTTPError as e:
+            if os.path.exists(partial_file):
+                os.remove(partial_file)
+            if e.code in (404, 410):
+                raise URLNotFoundError(
+                    self.url, "URL %s was not found!" % self.url)
+            raise FailedDownloadError(self.url, e.long_message)
+        except spack.util.download.DownloadError as e:
+            # Keep the partial file to resume the download next time
+            message = e.long_message
+            if 'CERTIFICATE_VERIFY_FAILED' in message:
+                message += (" If you believe your SSL configuration is "
+                            "bad, you can try running spack -k, which will "
+                            "not check SSL certificates.")
+            raise FailedDownloadError(self.url, message)
+
+        if hasher:
+            self._download_hash = (save_file, hasher)
+        return content_type
 
     @property
     def archive_file(self):
@@ -317,6 +419,13 @@ class URLFetchStrategy(FetchStrategy):
 
         if not self.extension:
             self.extension = extension(self.archive_file)
+
+        # Expand the archive in a single pass, straight into the stage.
+        # Exploding tarballs end up in their own directory.
+        if extract(self.archive_file, self.stage.path,
+                   "spack-expanded-archive", self.extension):
+            return
+
         decompress = decompressor_for(self.archive_file, self.extension)
 
         # Expand all tarballs in their own directory to contain
@@ -354,7 +463,9 @@ class URLFetchStrategy(FetchStrategy):
         if not self.archive_file:
             raise NoArchiveFileError("Cannot call archive() before fetching.")
 
-        shutil.copyfile(self.archive_file, destination)
+        if os.path.lexists(destination):
+            os.remove(destination)
+        link_or_copy(self.archive_file, destination)
 
     @_needs_stage
     def check(self):
@@ -365,12 +476,32 @@ class URLFetchStrategy(FetchStrategy):
                 "Attempt to check URLFetchStrategy with no digest.")
 
         checker = crypto.Checker(self.digest)
-        if not checker.check(self.archive_file):
+        if (self._download_hash and
+                self._download_hash[0] == self.archive_file):
+            # The archive was hashed while it was downloaded
+            ok = checker.check_hasher(self._download_hash[1])
+        else:
+            ok = checker.check(self.archive_file)
+        if not ok:
             raise ChecksumError(
                 "%s checksum failed for %s" %
                 (checker.hash_name, self.archive_file),
                 "Expected %s but got %s" % (self.digest, checker.sum))
 
+    @_needs_stage
+    def archive_checksum(self, algorithm):
+        """Hex digest of the archive, computed with a hashlib algorithm.
+
+        The archive isn't read again if it was hashed with the same
+        algorithm while it was downloaded.
+        """
+        if self._download_hash:
+            archive_file, hasher = self._download_hash
+            name = getattr(hasher, 'name', '').lower()
+            if archive_file == self.archive_file and name == algorithm:
+                return hasher.hexdigest()
+        return crypto.checksum(crypto.hashes[algorithm], self.archive_file)
+
     @_needs_stage
     def reset(self):
         """
@@ -422,8 +553,16 @@ class CacheURLFetchStrategy(URLFetchStrategy):
         if os.path.exists(filename):
             os.remove(filename)
 
-        # Symlink to local cached archive.
-        os.symlink(path, filename)
+        # Link to the cached archive.  A hard link keeps the archive if it
+        # is evicted from the cache; a symbolic link still avoids a copy
+        # when the stage is on another filesystem.
+        try:
+            os.link(path, filename)
+        except OSError:
+            os.symlink(path, filename)
+
+        # The archive was used: it's the last one the cache evicts
+        touch_atime(path)
 
         # Remove link if checksum fails, or subsequent fetchers
         # will assume they don't need to download.
@@ -982,9 +1121,25 @@ def from_list_url(pkg):
 
 
 class FsCache(object):
+    """Cache of the archives Spack fetched, laid out like a mirror.
+
+    If ``dedup`` is True, each distinct archive is stored once, in the
+    ``.blobs`` directory under the name of its sha256, and the names in
+    the mirror layout are hard links to it.
+
+    If ``limit`` is not 0, the least recently used archives are removed
+    whenever the cache grows larger than ``limit`` bytes.  Archives are
+    used when they are stored or fetched from the cache, and the time of
+    their last use is kept as their access time.
+    """
+
+    #: Directory of the archives stored by checksum, under the root
+    blob_dir = '.blobs'
 
-    def __init__(self, root):
+    def __init__(self, root, limit=0, dedup=False):
         self.root = os.path.abspath(root)
+        self.limit = limit
+        self.dedup = dedup
 
     def store(self, fetcher, relativeDst):
         # skip fetchers that aren't cachable
@@ -997,16 +1152,126 @@ class FsCache(object):
 
         dst = join_path(self.root, relativeDst)
         mkdirp(os.path.dirname(dst))
-        fetcher.archive(dst)
+        if self.dedup:
+            self._store_blob(fetcher, dst)
+        else:
+            fetcher.archive(dst)
+
+        if self.limit:
+            self.evict(self.limit, keep=dst)
+
+    def _store_blob(self, fetcher, dst):
+        blob_root = join_path(self.root, self.blob_dir)
+        mkdirp(blob_root)
+        tmp = join_path(blob_root, '.tmp-%d-%s' % (
+            os.getpid(), os.path.basename(dst)))
+        fetcher.archive(tmp)
+
+        blob = join_path(
+            blob_root, crypto.checksum(crypto.hashes['sha256'], tmp))
+        if os.path.exists(blob):
+            os.remove(tmp)
+            touch_atime(blob)
+        else:
+            os.rename(tmp, blob)
+
+        if os.path.lexists(dst):
+            os.remove(dst)
+        try:
+            os.link(blob, dst)
+        except OSError:
+            # The filesystem doesn't support hard links
+            shutil.copyfile(blob, dst)
 
     def fetcher(self, targetPath, digest, **kwargs):
         path = join_path(self.root, targetPath)
         return CacheURLFetchStrategy(path, digest, **kwargs)
 
+    def archives(self):
+        """Returns the archives in the cache, as a list of tuples of the
+        time they were last used, their size, and their paths.
+
+        Hard links to the same archive are grouped in a single tuple.
+        """
+        archives = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith('.tmp-'):
+                    continue
+                path = join_path(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                key = (st.st_dev, st.st_ino)
+                if key not in archives:
+                    archives[key] = (st.st_atime, st.st_size, [])
+                archives[key][2].append(path)
+        return list(archives.values())
+
+    def size(self):
+        """Number of bytes used by the cache."""
+        return sum(size for _, size, _ in self.archives())
+
+    def evict(self, limit, keep=None):
+        """Removes the least recently used archives until the cache is
+        not larger than ``limit`` bytes (no limit if it is 0).
+
+        Archives stored by checksum but not linked from the mirror layout
+        anymore are always removed, unless they were used in the last
+        minute (another process may be linking them).  The archive at the
+        path ``keep`` is never removed.
+
+        Returns:
+            tuple: the number of archives removed, and the number of bytes
+                that were reclaimed
+        """
+        blob_root = join_path(self.root, self.blob_dir)
+        archives = sorted(self.archives())
+        total = sum(size for _, size, _ in archives)
+        removed = reclaimed = 0
+
+        now = time.time()
+        for atime, size, paths in archives:
+            unused = (now - atime > 60 and
+                      all(os.path.dirname(p) == blob_root for p in paths))
+            if not unused and (not limit or total <= limit or keep in paths):
+                continue
+
+            for path in paths:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    # Another process may have removed it
+                    tty.debug(e)
+            removed += 1
+            reclaimed += size
+            total -= size
+
+        # Remove directories that are now empty
+        for dirpath, dirnames, filenames in os.walk(self.root, False):
+            if dirpath != self.root and not os.listdir(dirpath):
+                try:
+                    os.rmdir(dirpath)
+                except OSError:
+                    pass
+
+        return removed, reclaimed
+
     def destroy(self):
         shutil.rmtree(self.root, ignore_errors=True)
 
 
+def touch_atime(path):
+    """Sets the access time of a file to now, leaving its modification
+    time as it is.  Fails silently if the file can't be changed.
+    """
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError as e:
+        tty.debug(e)
+
+
 class FetchError(spack.error.SpackError):
     """Superclass fo fetcher errors."""
 
@@ -1023,6 +1288,11 @@ class FailedDownloadError(FetchError):
         self.url = url
 
 
+class URLNotFoundError(FailedDownloadError):
+    """Raised when the server answers a download with an error status,
+    e.g. because it doesn't have the file."""
+
+
 class NoArchiveFileError(FetchError):
     """"Raised when an archive file is expected but none exists."""
 
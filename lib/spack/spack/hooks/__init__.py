@@ -66,10 +66,19 @@ class HookRunner(object):
         self.hook_name = hook_name
 
     def __call__(self, *args, **kwargs):
+        # If a timer is passed, each hook is measured as 'hook:module'
+        timer = kwargs.pop('timer', None)
         for module in all_hook_modules():
             if hasattr(module, self.hook_name):
                 hook = getattr(module, self.hook_name)
-                if hasattr(hook, '__call__'):
+                if not hasattr(hook, '__call__'):
+                    continue
+                if timer is None:
+                    hook(*args, **kwargs)
+                    continue
+                name = '%s:%s' % (
+                    self.hook_name, module.__name__.rsplit('.', 1)[-1])
+                with timer.measure(name):
                     hook(*args, **kwargs)
 
 
@@ -22,19 +22,22 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
-import spack.modules
-import spack.modules.common
 import llnl.util.tty as tty
 
-try:
-    enabled = spack.modules.common.configuration['enable']
-except KeyError:
-    tty.debug('NO MODULE WRITTEN: list of enabled module files is empty')
-    enabled = []
-
 
 def _for_each_enabled(spec, method_name):
     """Calls a method for each enabled module"""
+    # Module generators are imported here, as they are only needed
+    # when installing or uninstalling.
+    import spack.modules
+    import spack.modules.common
+
+    try:
+        enabled = spack.modules.common.configuration['enable']
+    except KeyError:
+        tty.debug('NO MODULE WRITTEN: list of enabled module files is empty')
+        enabled = []
+
     for name in enabled:
         generator = spack.modules.module_types[name](spec)
         getattr(generator, method_name)()
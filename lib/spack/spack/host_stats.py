@@ -0,0 +1,303 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""History of the hosts Spack fetches archives from.
+
+For each host (mirror or upstream server), Spack remembers the latency
+of the last probes, the throughput of the last downloads, and how many
+times in a row it failed.  The history is kept in the misc cache, so it
+is shared by all the Spack processes of a user.
+
+:meth:`spack.stage.Stage.fetch` uses it to order mirrors: the ones that
+failed recently are tried last, and the others by expected download
+time.  Mirrors that haven't been measured for a while are probed first,
+all at the same time, so a dead mirror is found in ``probe_timeout``
+seconds instead of the time it takes a download from it to time out.
+"""
+import socket
+import time
+from multiprocessing.pool import ThreadPool
+
+from six.moves.urllib.parse import urlparse
+
+import llnl.util.tty as tty
+
+import spack
+import spack.util.spack_json as sjson
+
+#: Key of the history in the misc cache
+_cache_key = 'fetch/host-stats.json'
+
+#: Weight of a new measurement in the moving averages
+smoothing = 0.3
+
+#: Seconds after which a mirror is probed again
+probe_interval = 24 * 3600
+
+#: Seconds to wait for a host to accept a connection when probing
+probe_timeout = 5.0
+
+#: Maximum number of hosts probed at the same time
+probe_jobs = 8
+
+#: Seconds during which a host that failed is tried last, doubled for
+#: each other failure in a row
+failure_backoff = 300
+
+#: Archive size, in bytes, used to compare hosts by download time
+typical_size = 10 * 2 ** 20
+
+_default_ports = {'http': 80, 'https': 443, 'ftp': 21}
+
+
+def host_of(url):
+    """Returns the host a URL is fetched from, as ``scheme://netloc``,
+    or None for local files.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme in ('', 'file'):
+        return None
+    return '%s://%s' % (parsed.scheme, parsed.netloc)
+
+
+def _average(old, new):
+    if old is None:
+        return new
+    return (1 - smoothing) * old + smoothing * new
+
+
+class HostStats(object):
+    """What Spack remembers about one host."""
+
+    def __init__(self):
+        #: Moving average of the time to connect, in seconds
+        self.latency = None
+        #: Moving average of the download speed, in bytes per second
+        self.throughput = None
+        #: Number of failures in a row
+        self.failures = 0
+        #: Time of the last failure
+        self.last_failure = 0.0
+        #: Time of the last probe
+        self.last_probe = 0.0
+
+    def record_probe(self, latency, now=None):
+        """Records a successful probe that took ``latency`` seconds."""
+        self.latency = _average(self.latency, latency)
+        self.last_probe = now or time.time()
+        self.failures = 0
+
+    def record_download(self, seconds, size):
+        """Records the download of ``size`` bytes in ``seconds``."""
+        if seconds > 0 and size > 0:
+            self.throughput = _average(self.throughput, size / seconds)
+        self.failures = 0
+
+    def record_failure(self, now=None):
+        now = now or time.time()
+        self.failures += 1
+        self.last_failure = now
+        self.last_probe = now
+
+    def failing(self, now=None):
+        """True if the host failed recently, and should be tried last."""
+        if not self.failures:
+            return False
+        backoff = failure_backoff * 2 ** min(self.failures - 1, 8)
+        return (now or time.time()) - self.last_failure < backoff
+
+    def needs_probe(self, now=None):
+        return (now or time.time()) - self.last_probe > probe_interval
+
+    def expected_time(self):
+        """Expected time to download an archive of ``typical_size``, or
+        None if the host was never measured.
+        """
+        if self.latency is None and self.throughput is None:
+            return None
+        seconds = self.latency or 0.0
+        if self.throughput:
+            seconds += typical_size / self.throughput
+        return seconds
+
+    def to_dict(self):
+        return {
+            'latency': self.latency,
+            'throughput': self.throughput,
+            'failures': self.failures,
+            'last_failure': self.last_failure,
+            'last_probe': self.last_probe
+        }
+
+    @staticmethod
+    def from_dict(data):
+        stats = HostStats()
+        for name, value in data.items():
+            if hasattr(stats, name):
+                setattr(stats, name, value)
+        return stats
+
+
+def read():
+    """Returns the history of all hosts, as a dict host -> HostStats."""
+    try:
+        if not spack.misc_cache.init_entry(_cache_key):
+            return {}
+        with spack.misc_cache.read_transaction(_cache_key) as f:
+            return _load(f)
+    except Exception as e:
+        tty.debug('Cannot read the host stats: %s' % e)
+        return {}
+
+
+def update(function):
+    """Applies ``function`` to the history, a dict host -> HostStats in
+    which missing hosts are created, and saves it.
+    """
+    try:
+        spack.misc_cache.init_entry(_cache_key)
+        with spack.misc_cache.write_transaction(_cache_key) as (old, new):
+            stats = _load(old) if old else {}
+            function(_Defaults(stats))
+            sjson.dump(
+                dict((h, s.to_dict()) for h, s in stats.items()), new)
+    except Exception as e:
+        # The history only makes fetches faster; never fail because of it
+        tty.debug('Cannot update the host stats: %s' % e)
+
+
+def _load(stream):
+    try:
+        data = sjson.load(stream)
+    except Exception:
+        return {}
+    return dict((h, HostStats.from_dict(d)) for h, d in data.items())
+
+
+class _Defaults(object):
+    """Dict-like view of the history, in which missing hosts are created."""
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __getitem__(self, host):
+        if host not in self.stats:
+            self.stats[host] = HostStats()
+        return self.stats[host]
+
+
+def record_download(url, seconds, size):
+    host = host_of(url)
+    if host:
+        update(lambda stats: stats[host].record_download(seconds, size))
+
+
+def record_failure(url):
+    host = host_of(url)
+    if host:
+        update(lambda stats: stats[host].record_failure())
+
+
+def probe(host):
+    """Measures the time a host takes to accept a TCP connection.
+
+    Returns:
+        float: latency in seconds, or None if the host is unreachable
+    """
+    parsed = urlparse(host)
+    port = parsed.port or _default_ports.get(parsed.scheme)
+    if not parsed.hostname or not port:
+        return None
+
+    start = time.time()
+    try:
+        connection = socket.create_connection(
+            (parsed.hostname, port), probe_timeout)
+        connection.close()
+    except (socket.error, socket.timeout):
+        return None
+    return time.time() - start
+
+
+def probe_stale(hosts, stats):
+    """Probes, at the same time, the hosts that weren't measured for
+    ``probe_interval`` seconds, and records the results in stats and in
+    the history.
+    """
+    now = time.time()
+    stale = [h for h in hosts
+             if h not in stats or stats[h].needs_probe(now)]
+    if not stale:
+        return
+
+    tty.debug('Probing %s' % ', '.join(stale))
+    pool = ThreadPool(min(len(stale), probe_jobs))
+    try:
+        latencies = pool.map(probe, stale)
+    finally:
+        pool.close()
+
+    def record(history):
+        for host, latency in zip(stale, latencies):
+            if latency is None:
+                history[host].record_failure(now)
+            else:
+                history[host].record_probe(latency, now)
+            stats[host] = history[host]
+    update(record)
+
+
+def rank(urls, probe=True):
+    """Orders the URLs of the mirrors of an archive, best first.
+
+    Mirrors are sorted by expected download time.  Those that were never
+    measured keep their order, after the measured ones.  If ``probe`` is
+    True, hosts that weren't measured recently are probed first.
+
+    Returns:
+        tuple: (urls, failing), where failing are the URLs of the hosts
+            that failed recently, which should be tried last.
+    """
+    hosts = [host_of(url) for url in urls]
+    if not any(hosts):
+        # Only local mirrors
+        return list(urls), []
+
+    stats = read()
+    if probe:
+        probe_stale(set(h for h in hosts if h), stats)
+
+    now = time.time()
+    good, failing = [], []
+    for position, host in enumerate(hosts):
+        s = stats.get(host)
+        if s is not None and s.failing(now):
+            failing.append((s.last_failure, position))
+            continue
+        expected = s.expected_time() if s is not None else None
+        good.append((expected is None, expected or 0.0, position))
+
+    # Hosts that failed longest ago are more likely to be back
+    return ([urls[item[-1]] for item in sorted(good)],
+            [urls[item[-1]] for item in sorted(failing)])
@@ -0,0 +1,315 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Scheduler that builds independent packages of a DAG at the same time.
+
+Dependencies are installed in topological order, and a package is started
+as soon as all of its dependencies are installed.  Each build runs in its
+own process forked by :func:`spack.build_environment.start_build_process`,
+while the parent waits on all of them and registers each package in the
+database as it completes.
+
+The total number of make jobs is treated as a budget that is split among
+the builds that run at the same time, so that running several builds
+doesn't oversubscribe the machine.
+
+Installs can also be coordinated among several Spack processes, possibly
+running on different hosts that share the install tree.  In that case a
+process claims a package by taking the write lock on its prefix (see
+:meth:`spack.database.Database.prefix_lock`) before building it, and
+holds the lock until the package is in the database.  Packages claimed by
+another process are not built again: their dependents wait until the lock
+is released, and if the other process failed to install the package, it
+is built here.
+"""
+import os
+import select
+import time
+
+import llnl.util.tty as tty
+from llnl.util.lock import LockError
+
+import spack
+import spack.store
+from spack.graph import topological_sort
+
+#: Seconds between two attempts to claim a package that is being
+#: installed by another process
+lock_poll_interval = 1.0
+
+
+def claim(spec):
+    """Try to take the write lock on the prefix of spec, without waiting.
+
+    Returns:
+        True if the lock was taken, False if another process holds it
+    """
+    try:
+        spack.store.db.prefix_lock(spec).acquire_write(timeout=0)
+        return True
+    except LockError:
+        return False
+
+
+def wait_for_claim(spec):
+    """Take the write lock on the prefix of spec, waiting for as long as
+    another process holds it.
+    """
+    if not claim(spec):
+        tty.msg('{0} is being installed by another process, '
+                'waiting for it'.format(spec.name))
+        while not claim(spec):
+            time.sleep(lock_poll_interval)
+
+
+def release(spec):
+    """Release a lock taken by :func:`claim` or :func:`wait_for_claim`."""
+    spack.store.db.prefix_lock(spec).release_write()
+
+
+class ParallelInstaller(object):
+    """Installs the dependencies of a concrete spec, running up to
+    ``concurrent_builds`` builds at the same time.
+
+    Keyword arguments that are not listed here are forwarded to every
+    build, as :meth:`~spack.package.PackageBase.do_install` does when it
+    installs dependencies one at a time.
+
+    If ``coordinate`` is True, packages are claimed before being built, so
+    that other processes installing the same packages don't build them
+    twice.
+    """
+
+    def __init__(self, spec,
+                 concurrent_builds=1,
+                 coordinate=False,
+                 make_jobs=None,
+                 keep_prefix=False,
+                 keep_stage=False,
+                 skip_patch=False,
+                 verbose=False,
+                 run_tests=False,
+                 fake=False,
+                 dirty=False,
+                 **kwargs):
+        if not spec.concrete:
+            raise ValueError("Can only install concrete specs.")
+
+        self.spec = spec
+        self.concurrent_builds = max(concurrent_builds, 1)
+        self.coordinate = coordinate
+        self.make_jobs = make_jobs or spack.build_jobs
+        self.keep_prefix = keep_prefix
+        self.build_args = {
+            'keep_prefix': keep_prefix,
+            'keep_stage': keep_stage,
+            'skip_patch': skip_patch,
+            'verbose': verbose,
+            'run_tests': run_tests,
+            'fake': fake,
+            'dirty': dirty
+        }
+        self.kwargs = kwargs
+
+        #: Dependencies that are neither installed nor being built,
+        #: in topological order
+        self.pending = []
+        #: Names of the dependencies that are installed
+        self.installed = set()
+        #: Maps running builds to the spec they build and their jobs
+        self.running = {}
+        #: Dependencies that are being installed by other processes
+        self.waiting = []
+        #: Dependencies whose prefix lock is held by this installer
+        self.claimed = set()
+
+    def install_dependencies(self):
+        """Installs all the dependencies of the root spec, but not the
+        root itself.
+
+        If a build fails, no new build is started, but the ones that are
+        already running are allowed to complete before the error is
+        raised.
+        """
+        order = topological_sort(self.spec, reverse=True)
+        self.pending = [self.spec[name] for name in order
+                        if name != self.spec.name]
+        self.installed = set()
+        self.running = {}
+        self.waiting = []
+
+        error = None
+        while self.pending or self.running or self.waiting:
+            if error is None:
+                try:
+                    self._check_waiting()
+                    self._schedule()
+                except Exception as e:
+                    error = e
+
+            if error is not None:
+                # Stop waiting on other processes, and let the running
+                # builds complete
+                self.waiting = []
+
+            if not self.running:
+                if not self.waiting:
+                    break
+                time.sleep(lock_poll_interval)
+                continue
+
+            for build in self._wait_any():
+                spec, _ = self.running.pop(build)
+                try:
+                    spec.package._finish_install(
+                        build, keep_prefix=self.keep_prefix, explicit=False)
+                    self.installed.add(spec.name)
+                except Exception as e:
+                    tty.error('Failed to install {0}'.format(spec.name))
+                    if error is None:
+                        error = e
+                finally:
+                    self._release(spec)
+
+        if error is not None:
+            raise error
+
+    def _is_ready(self, spec):
+        """True if all the dependencies of spec are installed."""
+        return all(d.name in self.installed for d in spec.dependencies())
+
+    def _schedule(self):
+        """Starts builds for as many ready packages as there are free
+        slots.
+        """
+        progress = True
+        while progress and len(self.running) < self.concurrent_builds:
+            progress = False
+            ready = [s for s in self.pending if self._is_ready(s)]
+            for i, spec in enumerate(ready):
+                if len(self.running) >= self.concurrent_builds:
+                    break
+
+                self.pending.remove(spec)
+                progress = True
+
+                if not spec.external and not self._claim(spec):
+                    tty.msg('{0} is being installed by another process, '
+                            'waiting for it'.format(spec.name))
+                    self.waiting.append(spec)
+                    continue
+
+                try:
+                    # Installing a package may have been unnecessary, in
+                    # which case its dependents might be ready now.
+                    if not self._needs_build(spec):
+                        self._release(spec)
+                        self.installed.add(spec.name)
+                        continue
+
+                    jobs = self._jobs_for_next_build(len(ready) - i)
+                    self._start(spec, jobs)
+                except Exception:
+                    self._release(spec)
+                    raise
+
+    def _needs_build(self, spec):
+        """Handles the cases in which spec doesn't need to be built, and
+        returns whether it must be built.
+        """
+        pkg = spec.package
+        if spec.external:
+            pkg._process_external_package(False)
+            return False
+        return not pkg._check_already_installed(self.keep_prefix, False)
+
+    def _claim(self, spec):
+        """Claims spec, if installs are coordinated with other processes.
+
+        Returns:
+            False if another process is installing spec, True otherwise
+        """
+        if not self.coordinate or spec.name in self.claimed:
+            return True
+        if claim(spec):
+            self.claimed.add(spec.name)
+            return True
+        return False
+
+    def _release(self, spec):
+        if spec.name in self.claimed:
+            self.claimed.remove(spec.name)
+            release(spec)
+
+    def _check_waiting(self):
+        """Moves back to pending the packages that are not being installed
+        by other processes anymore.
+
+        Those packages were either installed by the other process, which is
+        detected when they are scheduled again, or they still need to be
+        built.
+        """
+        for spec in list(self.waiting):
+            if self._claim(spec):
+                self.waiting.remove(spec)
+                self.pending.append(spec)
+
+    def _jobs_for_next_build(self, ready):
+        """Number of make jobs for the next build, given the number of
+        builds that are ready to start.
+
+        The jobs that are not used by running builds are evenly split
+        among the ones that can start now.
+        """
+        used = sum(jobs for _, jobs in self.running.values())
+        free = max(self.make_jobs - used, 1)
+        slots = min(self.concurrent_builds - len(self.running), ready)
+        return max(free // max(slots, 1), 1)
+
+    def _start(self, spec, jobs):
+        pkg = spec.package
+        pkg._do_install_pop_kwargs(dict(self.kwargs))
+        tty.debug('Starting build of {0} with {1} make jobs'.format(
+            spec.name, jobs))
+
+        # Concurrent builds can't share the terminal input, so none of
+        # them reads from it.
+        build = pkg._start_install(
+            make_jobs=jobs,
+            input_stream=open(os.devnull),
+            **self.build_args
+        )
+        self.running[build] = (spec, jobs)
+
+    def _wait_any(self):
+        """Blocks until at least one of the running builds is done, and
+        returns the builds that are done.
+
+        If some packages are being installed by other processes, this
+        returns after ``lock_poll_interval`` seconds at the latest, so that
+        they are checked again.
+        """
+        timeout = lock_poll_interval if self.waiting else None
+        done, _, _ = select.select(list(self.running), [], [], timeout)
+        return done
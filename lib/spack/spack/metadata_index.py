@@ -0,0 +1,247 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""
+The ``metadata_index`` module records the directives of packages, so
+that commands which only need to *describe* packages (``spack list``,
+``spack info``, ...) don't have to import every ``package.py`` file.
+"""
+import re
+import textwrap
+from collections import namedtuple
+
+from six import StringIO
+
+import spack.error
+import spack.fetch_strategy as fs
+import spack.util.spack_json as sjson
+from spack.spec import Spec
+from spack.version import Version
+
+#: Version of the index format.  Indexes with a different version are
+#: rebuilt from scratch.
+_index_version = 1
+
+#: What ``PackageMetadata.variants`` maps variant names to.
+VariantMetadata = namedtuple(
+    'VariantMetadata', ['default', 'allowed_values', 'description'])
+
+
+class PackageMetadata(object):
+    """Directives of a single package, as recorded in a MetadataIndex.
+
+    This exposes the parts of the ``Package`` interface that describe a
+    package, so it can be used in place of a package instance when
+    printing information about it.
+    """
+
+    def __init__(self, name, mtime, data):
+        self.name = name
+        self.mtime = mtime
+        self._data = data
+
+    @staticmethod
+    def from_package(pkg, mtime):
+        """Read the metadata of a package instance."""
+        versions = []
+        for v in pkg.versions:
+            try:
+                fetcher = str(fs.for_package_version(pkg, v))
+            except spack.error.SpackError:
+                fetcher = ''
+            versions.append([str(v), fetcher])
+
+        variants = dict(
+            (name, [v.default, v.allowed_values, v.description])
+            for name, v in pkg.variants.items())
+
+        dependencies = [
+            [name, sorted(pkg.dependency_types[name])]
+            for name in pkg.dependencies]
+
+        provided = [
+            [str(spec), sorted(str(w) for w in whens)]
+            for spec, whens in pkg.provided.items()]
+
+        return PackageMetadata(pkg.name, mtime, {
+            'homepage': getattr(pkg, 'homepage', None),
+            'build_system_class': pkg.build_system_class,
+            'doc': pkg.__doc__,
+            'versions': versions,
+            'variants': variants,
+            'phases': list(pkg.phases),
+            'dependencies': dependencies,
+            'provided': provided
+        })
+
+    def to_dict(self):
+        data = dict(self._data)
+        data['mtime'] = self.mtime
+        return data
+
+    @staticmethod
+    def from_dict(name, data):
+        data = dict(data)
+        mtime = data.pop('mtime')
+        return PackageMetadata(name, mtime, data)
+
+    @property
+    def homepage(self):
+        return self._data['homepage']
+
+    @property
+    def build_system_class(self):
+        return self._data['build_system_class']
+
+    @property
+    def doc(self):
+        """The docstring of the package class."""
+        return self._data['doc']
+
+    @property
+    def versions(self):
+        """Maps the versions of the package to a description of how
+        they are fetched."""
+        return dict((Version(v), f) for v, f in self._data['versions'])
+
+    @property
+    def variants(self):
+        return dict((name, VariantMetadata(*v))
+                    for name, v in self._data['variants'].items())
+
+    @property
+    def phases(self):
+        return self._data['phases']
+
+    @property
+    def dependencies(self):
+        """Maps the names of the dependencies to their types."""
+        return dict(self._data['dependencies'])
+
+    def dependencies_of_type(self, *deptypes):
+        """Get subset of the dependencies with certain types."""
+        return dict((name, types) for name, types in self.dependencies.items()
+                    if any(d in types for d in deptypes))
+
+    @property
+    def provided(self):
+        """Maps provided virtual specs to the specs providing them."""
+        return dict((Spec(spec), set(Spec(w) for w in whens))
+                    for spec, whens in self._data['provided'])
+
+    def format_doc(self, **kwargs):
+        """Wrap doc string at 72 characters and format nicely"""
+        indent = kwargs.get('indent', 0)
+
+        if not self.doc:
+            return ""
+
+        doc = re.sub(r'\s+', ' ', self.doc)
+        lines = textwrap.wrap(doc, 72)
+        results = StringIO()
+        for line in lines:
+            results.write((" " * indent) + line + "\n")
+        return results.getvalue()
+
+    def __eq__(self, other):
+        return (self.name, self.mtime, self._data) == \
+            (other.name, other.mtime, other._data)
+
+    def __ne__(self, other):
+        return not self == other
+
+
+class MetadataIndex(object):
+    """Metadata of all the packages in a repository, by package name.
+
+    Each entry remembers the modification time of the ``package.py``
+    file it was read from, so that callers can tell which packages
+    need to be read again.
+    """
+
+    def __init__(self):
+        self.packages = {}
+
+    def update(self, pkg, mtime):
+        """Record the metadata of a package instance."""
+        self.packages[pkg.name] = PackageMetadata.from_package(pkg, mtime)
+
+    def merge(self, other):
+        """Merge ``other`` MetadataIndex into this one."""
+        self.packages.update(other.packages)
+
+    def remove(self, pkg_name):
+        """Forget a package, if it is in the index."""
+        self.packages.pop(pkg_name, None)
+
+    def outdated(self, mtimes):
+        """Names of packages that are new or changed since they were
+        indexed, and names of indexed packages that no longer exist.
+
+        Arguments:
+            mtimes (dict): maps the names of the packages in the
+                repository to the modification time of their
+                ``package.py`` file.
+        """
+        stale = sorted(name for name, mtime in mtimes.items()
+                       if name not in self.packages or
+                       self.packages[name].mtime != mtime)
+        removed = sorted(name for name in self.packages
+                         if name not in mtimes)
+        return stale, removed
+
+    def __getitem__(self, pkg_name):
+        return self.packages[pkg_name]
+
+    def __contains__(self, pkg_name):
+        return pkg_name in self.packages
+
+    def __eq__(self, other):
+        return self.packages == other.packages
+
+    def __ne__(self, other):
+        return not self == other
+
+    def to_json(self, stream=None):
+        packages = dict((name, m.to_dict())
+                        for name, m in self.packages.items())
+        return sjson.dump({'metadata_index': {
+            'version': _index_version,
+            'packages': packages}}, stream=stream, compact=True)
+
+    @staticmethod
+    def from_json(stream):
+        """Read an index; outdated or unreadable indexes are empty."""
+        index = MetadataIndex()
+        try:
+            data = sjson.load(stream)['metadata_index']
+        except (ValueError, KeyError, TypeError):
+            return index
+
+        if data.get('version') != _index_version:
+            return index
+
+        for name, pkg_data in data['packages'].items():
+            index.packages[name] = PackageMetadata.from_dict(name, pkg_data)
+        return index
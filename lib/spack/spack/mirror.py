@@ -30,8 +30,11 @@ the main server for a particular package is down.  Or, if the computer
 where spack is run is not connected to the internet, it allows spack
 to download packages directly from a mirror (e.g., on an intranet).
 """
+import multiprocessing
 import sys
 import os
+import time
+
 import llnl.util.tty as tty
 from llnl.util.filesystem import *
 
@@ -39,10 +42,15 @@ import spack
 import spack.error
 import spack.url as url
 import spack.fetch_strategy as fs
+import spack.util.crypto as crypto
+import spack.util.spack_json as sjson
 from spack.spec import Spec
 from spack.version import *
 from spack.util.compression import allowed_archive
 
+#: Name of the manifest of a mirror, in its root directory
+manifest_name = 'manifest.json'
+
 
 def mirror_archive_filename(spec, fetcher, resourceId=None):
     """Get the name of the spec's archive in the mirror."""
@@ -128,6 +136,44 @@ def suggest_archive_basename(resource):
     return basename
 
 
+def read_manifest(mirror_root):
+    """Returns the manifest of a mirror, or an empty one.
+
+    The manifest maps the path of each archive, relative to the mirror
+    root, to the ``digest`` it was verified against (None if it was not
+    checksummed), and the ``size`` and ``mtime`` the archive had then.
+    An archive whose size and modification time didn't change doesn't
+    need to be read again to know its checksum.
+    """
+    return sjson.load_file(join_path(mirror_root, manifest_name))
+
+
+def write_manifest(mirror_root, manifest):
+    """Writes the manifest of a mirror (see ``read_manifest``)."""
+    sjson.dump_file(manifest, join_path(mirror_root, manifest_name))
+
+
+def _manifest_entry(archive_path, digest):
+    st = os.stat(archive_path)
+    return {'digest': digest, 'size': st.st_size, 'mtime': st.st_mtime}
+
+
+def _archive_is_current(archive_path, digest, entry):
+    """Whether an archive already in a mirror has the right checksum.
+
+    Archives without a ``digest`` to check only need to exist.  The
+    others are read only if ``entry``, their entry in the manifest,
+    doesn't show they were verified since they last changed.
+    """
+    if not os.path.isfile(archive_path):
+        return False
+    if not digest:
+        return True
+    if entry and entry == _manifest_entry(archive_path, digest):
+        return True
+    return crypto.Checker(digest).check(archive_path)
+
+
 def create(path, specs, **kwargs):
     """Create a directory to be used as a spack mirror, and fill it with
     package archives.
@@ -141,6 +187,8 @@ def create(path, specs, **kwargs):
         no_checksum: If True, do not checkpoint when fetching (default False)
         num_versions: Max number of versions to fetch per spec, \
             if spec is ambiguous (default is 0 for all of them)
+        jobs: Number of specs to fetch at the same time (default is \
+            the ``fetch_jobs`` setting in ``config.yaml``)
 
     Return Value:
         Returns a tuple of lists: (present, mirrored, error)
@@ -152,6 +200,11 @@ def create(path, specs, **kwargs):
     This routine iterates through all known package versions, and
     it creates specs for those versions.  If the version satisfies any spec
     in the specs list, it is downloaded and added to the mirror.
+
+    Specs are added to the mirror by a pool of worker processes.  Archives
+    that are already in the mirror are kept if their checksum matches the
+    package, and the checksums are recorded in the manifest of the mirror,
+    so that the next run doesn't need to read the archives again.
     """
     # Make sure nothing is in the way.
     if os.path.isfile(path):
@@ -181,55 +234,156 @@ def create(path, specs, **kwargs):
         'mirrored': [],
         'error': []
     }
-
-    # Iterate through packages and download all safe tarballs for each
-    for spec in version_specs:
-        add_single_spec(spec, mirror_root, categories, **kwargs)
+    if not version_specs:
+        return [], [], []
+
+    jobs = kwargs.get('jobs', None)
+    if jobs is None:
+        jobs = spack.fetch_jobs
+    jobs = max(1, min(jobs, len(version_specs)))
+
+    manifest = read_manifest(mirror_root)
+    no_checksum = kwargs.get('no_checksum', False)
+    added_bytes = 0
+    start = time.time()
+
+    # Fetch strategies change the working directory, so specs are added
+    # by processes rather than threads.  The processes are forked, and
+    # inherit their arguments without pickling them.
+    pool = multiprocessing.Pool(
+        jobs, initializer=_init_worker,
+        initargs=(version_specs, mirror_root, manifest, no_checksum))
+    try:
+        results = pool.imap_unordered(
+            _add_spec_in_worker, range(len(version_specs)))
+        for done, (i, category, entries, size, error) in enumerate(
+                results, 1):
+            spec = version_specs[i]
+            categories[category].append(spec)
+            manifest.update(entries)
+            added_bytes += size
+
+            progress = "[%d/%d] %s" % (
+                done, len(version_specs), spec.format("$_$@"))
+            if category == 'error':
+                tty.warn("%s: error while fetching" % progress, error)
+            elif category == 'present':
+                tty.msg("%s: already present" % progress)
+            else:
+                tty.msg("%s: added (%.1f MB)" % (progress, size / 2.0 ** 20))
+    finally:
+        pool.terminate()
+        pool.join()
+        write_manifest(mirror_root, manifest)
+
+    seconds = time.time() - start
+    tty.msg("Added %.1f MB to the mirror in %.1fs (%.2f MB/s)" % (
+        added_bytes / 2.0 ** 20, seconds,
+        added_bytes / 2.0 ** 20 / max(seconds, 1e-3)))
 
     return categories['present'], categories['mirrored'], categories['error']
 
 
+#: Arguments of the worker processes of ``create``
+_worker_args = None
+
+
+def _init_worker(specs, mirror_root, manifest, no_checksum):
+    """Initializer of the processes that add specs to a mirror."""
+    global _worker_args
+    _worker_args = (specs, mirror_root, manifest, no_checksum)
+    tty.silence_worker()
+
+
+def _add_spec_in_worker(i):
+    """Adds the i-th spec of the pool to the mirror.
+
+    Returns:
+        tuple: ``i``, the category of the spec (see ``create``), the new
+            entries of the manifest, the number of bytes added to the
+            mirror, and the error if any
+    """
+    specs, mirror_root, manifest, no_checksum = _worker_args
+    try:
+        present, entries, size = _add_archives(
+            specs[i], mirror_root, manifest, no_checksum)
+        return i, 'present' if present else 'mirrored', entries, size, None
+    except Exception as e:
+        tty.debug_traceback()
+        return i, 'error', {}, 0, getattr(e, 'message', None) or str(e)
+
+
+def _add_archives(spec, mirror_root, manifest, no_checksum=False):
+    """Adds the archive of a spec, and of its resources, to a mirror.
+
+    Archives that are already in the mirror with the right checksum are
+    skipped (see ``_archive_is_current``).
+
+    Returns:
+        tuple: whether all the archives were already in the mirror, the
+            entries of the manifest for the archives, and the number of
+            bytes added to the mirror
+    """
+    spec_exists_in_mirror = True
+    entries = {}
+    added_bytes = 0
+    with spec.package.stage:
+        # fetcher = stage.fetcher
+        # fetcher.fetch()
+        # ...
+        # fetcher.archive(archive_path)
+        for ii, stage in enumerate(spec.package.stage):
+            fetcher = stage.fetcher
+            if ii == 0:
+                # create a subdirectory for the current package@version
+                relative_path = mirror_archive_path(spec, fetcher)
+                name = spec.format("$_$@")
+            else:
+                resource = stage.resource
+                relative_path = mirror_archive_path(
+                    spec, fetcher, resource.name)
+                name = "{resource} ({pkg}).".format(
+                    resource=resource.name, pkg=spec.format("$_$@"))
+            archive_path = os.path.abspath(
+                join_path(mirror_root, relative_path))
+            subdir = os.path.dirname(archive_path)
+            mkdirp(subdir)
+
+            digest = None
+            if not no_checksum:
+                digest = getattr(fetcher, 'digest', None)
+
+            if _archive_is_current(
+                    archive_path, digest, manifest.get(relative_path)):
+                tty.msg("{name} : already added".format(name=name))
+            else:
+                spec_exists_in_mirror = False
+                fetcher.fetch()
+                if not no_checksum:
+                    fetcher.check()
+                    tty.msg("{name} : checksum passed".format(name=name))
+
+                # Fetchers have to know how to archive their files.  Use
+                # that to move/copy/create an archive in the mirror.
+                if os.path.exists(archive_path):
+                    os.remove(archive_path)
+                fetcher.archive(archive_path)
+                added_bytes += os.path.getsize(archive_path)
+                tty.msg("{name} : added".format(name=name))
+
+            entries[relative_path] = _manifest_entry(archive_path, digest)
+
+    return spec_exists_in_mirror, entries, added_bytes
+
+
 def add_single_spec(spec, mirror_root, categories, **kwargs):
     tty.msg("Adding package {pkg} to mirror".format(pkg=spec.format("$_$@")))
-    spec_exists_in_mirror = True
     try:
-        with spec.package.stage:
-            # fetcher = stage.fetcher
-            # fetcher.fetch()
-            # ...
-            # fetcher.archive(archive_path)
-            for ii, stage in enumerate(spec.package.stage):
-                fetcher = stage.fetcher
-                if ii == 0:
-                    # create a subdirectory for the current package@version
-                    archive_path = os.path.abspath(join_path(
-                        mirror_root, mirror_archive_path(spec, fetcher)))
-                    name = spec.format("$_$@")
-                else:
-                    resource = stage.resource
-                    archive_path = os.path.abspath(join_path(
-                        mirror_root,
-                        mirror_archive_path(spec, fetcher, resource.name)))
-                    name = "{resource} ({pkg}).".format(
-                        resource=resource.name, pkg=spec.format("$_$@"))
-                subdir = os.path.dirname(archive_path)
-                mkdirp(subdir)
+        present, entries, added_bytes = _add_archives(
+            spec, mirror_root, kwargs.get('manifest', {}),
+            kwargs.get('no_checksum', False))
 
-                if os.path.exists(archive_path):
-                    tty.msg("{name} : already added".format(name=name))
-                else:
-                    spec_exists_in_mirror = False
-                    fetcher.fetch()
-                    if not kwargs.get('no_checksum', False):
-                        fetcher.check()
-                        tty.msg("{name} : checksum passed".format(name=name))
-
-                    # Fetchers have to know how to archive their files.  Use
-                    # that to move/copy/create an archive in the mirror.
-                    fetcher.archive(archive_path)
-                    tty.msg("{name} : added".format(name=name))
-
-        if spec_exists_in_mirror:
+        if present:
             categories['present'].append(spec)
         else:
             categories['mirrored'].append(spec)
@@ -49,7 +49,9 @@ module type.
 """
 import copy
 import datetime
+import hashlib
 import inspect
+import json
 import os.path
 import re
 
@@ -59,8 +61,10 @@ import llnl.util.tty as tty
 import spack
 import spack.build_environment as build_environment
 import spack.environment
+import spack.spec
 import spack.tengine as tengine
 import spack.util.path
+import spack.util.spack_json as sjson
 import spack.error
 
 #: Root folders where the various module files should be written
@@ -72,6 +76,9 @@ configuration = spack.config.get_config('modules')
 #: Inspections that needs to be done on spec prefixes
 prefix_inspections = configuration.get('prefix_inspections', {})
 
+#: Name of the manifest of the module files of a type, in their root
+manifest_name = '.spack-manifest.json'
+
 
 def update_dictionary_extending_lists(target, update):
     """Updates a dictionary, but extends lists instead of overriding them.
@@ -191,6 +198,24 @@ def root_path(name):
     return spack.util.path.canonicalize_path(path)
 
 
+def read_manifest(root):
+    """Returns the manifest of the module files in ``root``, or an empty
+    one.
+
+    The manifest maps the path of each module file, relative to the
+    root, to the fingerprint of what it was generated from (see
+    ``BaseModuleFileWriter.fingerprint``).
+    """
+    return sjson.load_file(os.path.join(root, manifest_name))
+
+
+def write_manifest(root, manifest):
+    """Writes the manifest of the module files in ``root`` (see
+    ``read_manifest``).
+    """
+    sjson.dump_file(manifest, os.path.join(root, manifest_name))
+
+
 class BaseConfiguration(object):
     """Manipulates the information needed to generate a module file to make
     querying easier. It needs to be sub-classed for specific module types.
@@ -466,8 +491,8 @@ class BaseContext(tengine.Context):
             self.spec.prefix, prefix_inspections
         )
 
-        # Modifications that are coded at package level
-        _ = spack.environment.EnvironmentModifications()
+        # Modifications that are coded at package level.  They are
+        # computed once and shared with other module files and builds.
         # TODO : the code down below is quite similar to
         # TODO : build_environment.setup_package and needs to be factored out
         # TODO : to a single place
@@ -475,13 +500,13 @@ class BaseContext(tengine.Context):
         # before asking for package-specific modifications
         for item in dependencies(self.spec, 'all'):
             package = self.spec[item.name].package
-
             # Forces consistency among spec and spec.package.spec
             # but does not admit change in recipes that involve new
             # dependencies or variants
             package.spec = self.spec[item.name]
 
-            modules = build_environment.parent_class_modules(package.__class__)
+            modules = build_environment.parent_class_modules(
+                package.__class__)
             for mod in modules:
                 build_environment.set_module_variables_for_package(
                     package, mod
@@ -492,12 +517,21 @@ class BaseContext(tengine.Context):
             package.setup_dependent_package(
                 self.spec.package.module, self.spec
             )
-            package.setup_dependent_environment(_, env, self.spec)
+            _, run_env = build_environment.cached_environment(
+                self.spec, self.spec[item.name],
+                'setup_dependent_environment',
+                lambda s, r: package.setup_dependent_environment(
+                    s, r, self.spec))
+            env.extend(run_env)
+
         # Package specific modifications
         build_environment.set_module_variables_for_package(
             self.spec.package, self.spec.package.module
         )
-        self.spec.package.setup_environment(_, env)
+        _, run_env = build_environment.cached_environment(
+            self.spec, self.spec, 'setup_environment',
+            self.spec.package.setup_environment)
+        env.extend(run_env)
 
         # Modifications required from modules.yaml
         env.extend(self.conf.env)
@@ -579,6 +613,51 @@ class BaseModuleFileWriter(object):
         # ... and return the first match
         return choices.pop(0)
 
+    def fingerprint(self, templates_mtime):
+        """Returns a checksum of what the module file is generated from.
+
+        This is the spec, the options and rules of ``modules.yaml`` that
+        apply to it, the names of the modules it loads, the template, the
+        time the templates were last modified (``templates_mtime``) and
+        the time the recipes of the packages in the spec were modified.
+        The module file doesn't need to be written again as long as its
+        fingerprint is the same.
+        """
+        m = self.module
+        options = dict((key, value) for key, value in
+                       m.configuration.items() if not isinstance(value, dict))
+        loads = self.conf.specs_to_load + self.conf.specs_to_prereq
+
+        recipes = []
+        for s in self.spec.traverse(deptype=('link', 'run')):
+            if spack.repo.exists(s.name):
+                recipe = spack.repo.filename_for_package_name(s.name)
+                recipes.append((s.name, os.path.getmtime(recipe)))
+
+        module_system_name = str(m.__name__).split('.')[-1]
+        inputs = {
+            'spack': str(spack.spack_version),
+            'spec': self.spec.dag_hash(),
+            'options': options,
+            'rules': self.conf.conf,
+            'prefix_inspections': prefix_inspections,
+            'loads': [m.make_layout(x).use_name for x in loads],
+            'template': self._get_template(),
+            'templates_mtime': templates_mtime,
+            'context': getattr(self.spec.package,
+                               '{0}_context'.format(module_system_name), {}),
+            'recipes': recipes,
+        }
+
+        def encode(obj):
+            # Specs in the rules are known by their hash
+            if isinstance(obj, spack.spec.Spec):
+                return obj.dag_hash()
+            return str(obj)
+
+        text = json.dumps(inputs, sort_keys=True, default=encode)
+        return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
     def write(self, overwrite=False):
         """Writes the module file.
 
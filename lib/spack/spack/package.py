@@ -41,7 +41,6 @@ import os
 import re
 import sys
 import textwrap
-import time
 from six import StringIO
 from six import string_types
 from six import with_metaclass
@@ -54,8 +53,11 @@ import spack.directives
 import spack.error
 import spack.fetch_strategy as fs
 import spack.hooks
+import spack.installer
 import spack.mirror
+import spack.prefetch
 import spack.repository
+import spack.tree_cache
 import spack.url
 import spack.util.web
 
@@ -67,6 +69,7 @@ from spack import directory_layout
 from spack.util.executable import which
 from spack.stage import Stage, ResourceStage, StageComposite
 from spack.util.environment import dump_environment
+from spack.util.timer import Timer
 from spack.version import *
 
 """Allowed URL schemes for spack packages."""
@@ -584,9 +587,8 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         if not hasattr(self, 'license_url'):
             self.license_url = None
 
-        # Set up some internal variables for timing.
-        self._fetch_time = 0.0
-        self._total_time = 0.0
+        # Times the steps of fetching and installing this package.
+        self.timer = Timer()
 
         if self.is_extension:
             spack.repo.get(self.extendee_spec)._check_extendable()
@@ -594,16 +596,23 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         self.extra_args = {}
 
     def possible_dependencies(self, visited=None):
-        """Return set of possible transitive dependencies of this package."""
+        """Return set of possible transitive dependencies of this package.
+
+        Dependencies of dependencies are read from the package metadata
+        index, so the packages don't need to be imported.
+        """
         if visited is None:
             visited = set()
 
         visited.add(self.name)
-        for name in self.dependencies:
-            if name not in visited and not spack.spec.Spec(name).virtual:
-                pkg = spack.repo.get(name)
-                for name in pkg.possible_dependencies(visited):
-                    visited.add(name)
+        queue = list(self.dependencies)
+        while queue:
+            name = queue.pop()
+            if name in visited or spack.spec.Spec.is_virtual(name):
+                continue
+
+            visited.add(name)
+            queue.extend(spack.repo.package_metadata(name).dependencies)
 
         return visited
 
@@ -901,7 +910,6 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         if not self.spec.concrete:
             raise ValueError("Can only fetch concrete packages.")
 
-        start_time = time.time()
         if spack.do_checksum and self.version not in self.versions:
             tty.warn("There is no checksum on file to fetch %s safely." %
                      self.spec.format('$_$@'))
@@ -920,12 +928,12 @@ class PackageBase(with_metaclass(PackageMeta, object)):
                 raise FetchError("Will not fetch %s" %
                                  self.spec.format('$_$@'), ck_msg)
 
-        self.stage.fetch(mirror_only)
-
-        self._fetch_time = time.time() - start_time
+        with self.timer.measure('fetch'):
+            self.stage.fetch(mirror_only)
 
         if spack.do_checksum and self.version in self.versions:
-            self.stage.check()
+            with self.timer.measure('checksum'):
+                self.stage.check()
 
         self.stage.cache_local()
 
@@ -936,7 +944,8 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             raise ValueError("Can only stage concrete packages.")
 
         self.do_fetch(mirror_only)
-        self.stage.expand_archive()
+        with self.timer.measure('expand'):
+            self.stage.expand_archive()
         self.stage.chdir_to_source()
 
     def patch(self):
@@ -949,6 +958,14 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         if not self.spec.concrete:
             raise ValueError("Can only patch concrete packages.")
 
+        # Sources expanded and patched the same way before are copied
+        # from the source tree cache, if it is enabled.
+        tree_key = self._source_tree_key()
+        if tree_key and not self.stage.source_path:
+            if spack.source_tree_cache.restore(tree_key, self.stage.path):
+                tty.msg("Using patched sources of %s from the source tree "
+                        "cache" % self.name)
+
         # Kick off the stage first.
         self.do_stage()
 
@@ -984,29 +1001,30 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             return
 
         # Apply all the patches for specs that match this one
-        patched = False
-        for spec, patch_list in self.patches.items():
-            if self.spec.satisfies(spec):
-                for patch in patch_list:
-                    try:
-                        patch.apply(self.stage)
-                        tty.msg('Applied patch %s' % patch.path_or_url)
-                        patched = True
-                    except:
-                        # Touch bad file if anything goes wrong.
-                        tty.msg('Patch %s failed.' % patch.path_or_url)
-                        touch(bad_file)
-                        raise
-
-        if has_patch_fun:
-            try:
-                self.patch()
-                tty.msg("Ran patch() for %s" % self.name)
-                patched = True
-            except:
-                tty.msg("patch() function failed for %s" % self.name)
-                touch(bad_file)
-                raise
+        with self.timer.measure('patch'):
+            patched = False
+            for spec, patch_list in self.patches.items():
+                if self.spec.satisfies(spec):
+                    for patch in patch_list:
+                        try:
+                            patch.apply(self.stage)
+                            tty.msg('Applied patch %s' % patch.path_or_url)
+                            patched = True
+                        except:
+                            # Touch bad file if anything goes wrong.
+                            tty.msg('Patch %s failed.' % patch.path_or_url)
+                            touch(bad_file)
+                            raise
+
+            if has_patch_fun:
+                try:
+                    self.patch()
+                    tty.msg("Ran patch() for %s" % self.name)
+                    patched = True
+                except:
+                    tty.msg("patch() function failed for %s" % self.name)
+                    touch(bad_file)
+                    raise
 
         # Get rid of any old failed file -- patches have either succeeded
         # or are not needed.  This is mostly defensive -- it's needed
@@ -1020,6 +1038,43 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         else:
             touch(no_patches_file)
 
+        if tree_key:
+            spack.source_tree_cache.store(tree_key, archive_dir)
+
+    def _source_tree_key(self):
+        """Returns the key of the patched sources of this package in the
+        source tree cache, or None if they can't be cached.
+
+        Only sources expanded from an archive with a checksum, without
+        resources, are cached, and only if all their patches have a
+        checksum.  Packages that define ``patch()`` are never cached,
+        because it may depend on anything in their spec.
+        """
+        if not spack.source_tree_cache_path:
+            return None
+
+        fetcher = self.fetcher[0]
+        if (not isinstance(fetcher, fs.URLFetchStrategy) or
+                not fetcher.digest or not fetcher.expand_archive or
+                self._get_needed_resources()):
+            return None
+
+        default_patch = getattr(PackageBase.patch, '__func__',
+                                PackageBase.patch)
+        if self.patch.__func__ is not default_patch:
+            return None
+
+        patches = []
+        for spec, patch_list in self.patches.items():
+            if self.spec.satisfies(spec):
+                for patch in patch_list:
+                    checksum = patch.checksum()
+                    if checksum is None:
+                        return None
+                    patches.append((checksum, patch.level))
+
+        return spack.tree_cache.tree_key(fetcher.digest, patches)
+
     @property
     def namespace(self):
         namespace, dot, module = self.__module__.rpartition('.')
@@ -1153,6 +1208,9 @@ class PackageBase(with_metaclass(PackageMeta, object)):
                    fake=False,
                    explicit=False,
                    dirty=None,
+                   concurrent_builds=None,
+                   coordinate=None,
+                   fetch_jobs=None,
                    **kwargs):
         """Called by commands to install a package and its dependencies.
 
@@ -1171,12 +1229,23 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             verbose (bool): Display verbose build output (by default,
                 suppresses it)
             make_jobs (int): Number of make jobs to use for install. Default
-                is ncpus
+                is ncpus. When several packages are built at the same time,
+                this is the total budget shared among them.
             run_tests (bool): Run tests within the package's install()
             fake (bool): Don't really build; install fake stub files instead.
             explicit (bool): True if package was explicitly installed, False
                 if package was implicitly installed (as a dependency).
             dirty (bool): Don't clean the build environment before installing.
+            concurrent_builds (int): Maximum number of dependencies to build
+                at the same time. Default is the ``concurrent_builds``
+                setting in config.yaml.
+            coordinate (bool): Lock each package before building it, so that
+                other Spack processes sharing the install tree wait for it
+                instead of building it again. Default is the
+                ``coordinate_installs`` setting in config.yaml.
+            fetch_jobs (int): Number of packages whose sources are fetched
+                at the same time, ahead of their builds. Default is the
+                ``fetch_jobs`` setting in config.yaml.
             force (bool): Install again, even if already installed.
         """
         if not self.spec.concrete:
@@ -1188,44 +1257,149 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         if self.spec.external:
             return self._process_external_package(explicit)
 
-        # Ensure package is not already installed
-        layout = spack.store.layout
-        with spack.store.db.prefix_read_lock(self.spec):
-            if (keep_prefix and os.path.isdir(self.prefix) and
-                    (not self.installed)):
-                tty.msg(
-                    "Continuing from partial install of %s" % self.name)
-            elif layout.check_installed(self.spec):
-                msg = '{0.name} is already installed in {0.prefix}'
-                tty.msg(msg.format(self))
-                rec = spack.store.db.get_record(self.spec)
-                return self._update_explicit_entry_in_db(rec, explicit)
+        if coordinate is None:
+            coordinate = spack.coordinate_installs
+
+        # Ensure package is not already installed.  When installs are
+        # coordinated, another process may hold the lock on the prefix
+        # for its whole build, so this is only checked once the package
+        # is claimed.
+        if not coordinate and self._check_already_installed(
+                keep_prefix, explicit):
+            return
 
         # Dirty argument takes precedence over dirty config setting.
         if dirty is None:
             dirty = spack.dirty
 
+        if concurrent_builds is None:
+            concurrent_builds = spack.concurrent_builds
+
         self._do_install_pop_kwargs(kwargs)
 
-        # First, install dependencies recursively.
-        if install_deps:
-            tty.debug('Installing {0} dependencies'.format(self.name))
-            for dep in self.spec.dependencies():
-                dep.package.do_install(
+        # Fetch the sources of the whole DAG while the builds run.  This
+        # is a no-op for dependencies, which are installed while the
+        # prefetcher of the root package is active.
+        specs = []
+        if install_deps and not fake:
+            specs = (s for s in self.spec.traverse(order='post')
+                     if not s.package.installed)
+        with spack.prefetch.Prefetcher(specs, jobs=fetch_jobs):
+            # First, install dependencies recursively.
+            if install_deps and (concurrent_builds > 1 or coordinate):
+                tty.debug('Installing {0} dependencies with up to {1} '
+                          'concurrent builds'.format(
+                              self.name, concurrent_builds))
+                installer = spack.installer.ParallelInstaller(
+                    self.spec,
+                    concurrent_builds=concurrent_builds,
+                    coordinate=coordinate,
+                    make_jobs=make_jobs,
                     keep_prefix=keep_prefix,
                     keep_stage=keep_stage,
-                    install_deps=install_deps,
                     fake=fake,
                     skip_patch=skip_patch,
                     verbose=verbose,
-                    make_jobs=make_jobs,
                     run_tests=run_tests,
                     dirty=dirty,
                     **kwargs
                 )
+                installer.install_dependencies()
+
+            elif install_deps:
+                tty.debug('Installing {0} dependencies'.format(self.name))
+                for dep in self.spec.dependencies():
+                    dep.package.do_install(
+                        keep_prefix=keep_prefix,
+                        keep_stage=keep_stage,
+                        install_deps=install_deps,
+                        fake=fake,
+                        skip_patch=skip_patch,
+                        verbose=verbose,
+                        make_jobs=make_jobs,
+                        run_tests=run_tests,
+                        dirty=dirty,
+                        concurrent_builds=concurrent_builds,
+                        **kwargs
+                    )
+
+            if coordinate:
+                spack.installer.wait_for_claim(self.spec)
+            try:
+                # Another process may have installed the package while we
+                # were waiting for it.
+                if coordinate and self._check_already_installed(
+                        keep_prefix, explicit):
+                    return
+
+                build = self._start_install(
+                    keep_prefix=keep_prefix,
+                    keep_stage=keep_stage,
+                    skip_patch=skip_patch,
+                    verbose=verbose,
+                    make_jobs=make_jobs,
+                    run_tests=run_tests,
+                    fake=fake,
+                    dirty=dirty
+                )
+                self._finish_install(
+                    build, keep_prefix=keep_prefix, explicit=explicit)
+            finally:
+                if coordinate:
+                    spack.installer.release(self.spec)
+
+    def _check_already_installed(self, keep_prefix, explicit):
+        """Checks whether this package needs to be built.
+
+        Args:
+            keep_prefix (bool): if True, a partial install will be continued
+                rather than considered already installed
+            explicit (bool): True if the package was explicitly installed.
+                Used to update the corresponding entry in the DB.
 
+        Returns:
+            True if the package is already installed, False otherwise
+        """
+        layout = spack.store.layout
+        with spack.store.db.prefix_read_lock(self.spec):
+            if (keep_prefix and os.path.isdir(self.prefix) and
+                    (not self.installed)):
+                tty.msg(
+                    "Continuing from partial install of %s" % self.name)
+            elif layout.check_installed(self.spec):
+                msg = '{0.name} is already installed in {0.prefix}'
+                tty.msg(msg.format(self))
+                rec = spack.store.db.get_record(self.spec)
+                self._update_explicit_entry_in_db(rec, explicit)
+                return True
+        return False
+
+    def _start_install(self,
+                       keep_prefix=False,
+                       keep_stage=False,
+                       skip_patch=False,
+                       verbose=False,
+                       make_jobs=None,
+                       run_tests=False,
+                       fake=False,
+                       dirty=False,
+                       input_stream=None):
+        """Creates the install prefix and forks a child process that builds
+        this package, without installing its dependencies.
+
+        Arguments have the same meaning as in :meth:`do_install`, except
+        ``input_stream``, which is the stream forwarded to the build process
+        as its standard input.
+
+        Returns:
+            BuildProcess: the running build, to be passed to
+                :meth:`_finish_install`
+        """
         tty.msg('Installing %s' % self.name)
 
+        # Don't stage the sources while a prefetcher is working on them.
+        prefetched = spack.prefetch.wait(self.spec)
+
         # Set run_tests flag before starting build.
         self.run_tests = run_tests
 
@@ -1250,7 +1424,12 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             # original input stream, we are making the following assignment:
             sys.stdin = input_stream
 
-            start_time = time.time()
+            # Time this build from scratch, even if the package was
+            # fetched or staged before, except for what the prefetcher
+            # did for it.
+            self.timer = Timer()
+            for name, seconds in prefetched:
+                self.timer.add(name, seconds, before_start=True)
             if not fake:
                 if not skip_patch:
                     self.do_patch()
@@ -1265,7 +1444,7 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             with self._stage_and_write_lock():
                 # Run the pre-install hook in the child process after
                 # the directory is created.
-                spack.hooks.pre_install(self.spec)
+                spack.hooks.pre_install(self.spec, timer=self.timer)
                 if fake:
                     self.do_fake_install()
                 else:
@@ -1301,39 +1480,73 @@ class PackageBase(with_metaclass(PackageMeta, object)):
                             )
                             # Redirect stdout and stderr to daemon pipe
                             with log_redirection:
-                                getattr(self, phase)(
-                                    self.spec, self.prefix)
-                    self.log()
+                                with self.timer.measure(phase_name):
+                                    getattr(self, phase)(
+                                        self.spec, self.prefix)
+                    with self.timer.measure('log'):
+                        self.log()
+                # What the package adds to environments may depend on
+                # what is now in its prefix.
+                spack.build_environment.invalidate_environment_cache(
+                    self.spec)
                 # Run post install hooks before build stage is removed.
-                spack.hooks.post_install(self.spec)
+                spack.hooks.post_install(self.spec, timer=self.timer)
 
-            # Stop timer.
-            self._total_time = time.time() - start_time
-            build_time = self._total_time - self._fetch_time
+            # Save the timings; the parent adds the database write.
+            total_time = self.timer.total
+            self.timer.write_json(
+                spack.store.layout.build_times_path(self.spec))
 
+            fetch_time = self.timer.seconds('fetch')
             tty.msg("Successfully installed %s" % self.name,
                     "Fetch: %s.  Build: %s.  Total: %s." %
-                    (_hms(self._fetch_time), _hms(build_time),
-                     _hms(self._total_time)))
+                    (_hms(fetch_time), _hms(total_time - fetch_time),
+                     _hms(total_time)))
             print_pkg(self.prefix)
 
+        build = None
         try:
             # Create the install prefix and fork the build process.
             spack.store.layout.create_install_directory(self.spec)
             # Fork a child to do the actual installation
-            spack.build_environment.fork(self, build_process, dirty=dirty)
-            # If we installed then we should keep the prefix
-            keep_prefix = self.last_phase is None or keep_prefix
-            # note: PARENT of the build process adds the new package to
-            # the database, so that we don't need to re-read from file.
-            spack.store.db.add(
-                self.spec, spack.store.layout, explicit=explicit
-            )
+            build = spack.build_environment.start_build_process(
+                self, build_process, dirty=dirty, input_stream=input_stream)
+            return build
         except directory_layout.InstallDirectoryAlreadyExistsError:
             # Abort install if install directory exists.
             # But do NOT remove it (you'd be overwriting someone else's stuff)
             tty.warn("Keeping existing install prefix in place.")
             raise
+        finally:
+            # Remove the install prefix if anything went wrong before the
+            # build process could start.
+            if build is None and not keep_prefix:
+                self.remove_prefix()
+
+    def _finish_install(self, build, keep_prefix=False, explicit=False):
+        """Waits for a build started by :meth:`_start_install` to complete,
+        then registers the package in the DB.
+
+        Args:
+            build (BuildProcess): the running build
+            keep_prefix (bool): Keep install prefix on failure. By default,
+                destroys it.
+            explicit (bool): True if package was explicitly installed, False
+                if package was implicitly installed (as a dependency).
+        """
+        try:
+            build.wait()
+            # If we installed then we should keep the prefix
+            keep_prefix = self.last_phase is None or keep_prefix
+            # note: PARENT of the build process adds the new package to
+            # the database, so that we don't need to re-read from file.
+            times_path = spack.store.layout.build_times_path(self.spec)
+            timer = Timer.read_json(times_path)
+            with timer.measure('database'):
+                spack.store.db.add(
+                    self.spec, spack.store.layout, explicit=explicit
+                )
+            timer.write_json(times_path)
         except StopIteration as e:
             # A StopIteration exception means that do_install
             # was asked to stop early from clients
@@ -1559,6 +1772,7 @@ class PackageBase(with_metaclass(PackageMeta, object)):
             msg = 'Deleting DB entry [{0}]'
             tty.debug(msg.format(spec.short_spec))
             spack.store.db.remove(spec)
+            spack.build_environment.invalidate_environment_cache(spec)
 
         if pkg is not None:
             spack.hooks.post_uninstall(spec)
@@ -1597,21 +1811,53 @@ class PackageBase(with_metaclass(PackageMeta, object)):
         activate() directly.
         """
         self._sanity_check_extension()
-
-        spack.store.layout.check_extension_conflict(
-            self.extendee_spec, self.spec)
-
-        # Activate any package dependencies that are also extensions.
-        if not force:
-            for spec in self.dependency_activations():
-                if not spec.package.activated:
-                    spec.package.do_activate(force=force)
-
-        self.extendee_spec.package.activate(self, **self.extendee_args)
-
-        spack.store.layout.add_extension(self.extendee_spec, self.spec)
-        tty.msg("Activated extension %s for %s" %
-                (self.spec.short_spec, self.extendee_spec.format("$_$@$+$%@")))
+        self.extendee_spec.package.do_activate_extensions(
+            [self.spec], force=force)
+
+    def do_activate_extensions(self, specs, force=False):
+        """Called on an extendee to activate several of its extensions at
+        once, along with the extensions they depend on unless ``force``
+        is set.
+
+        All the extensions are checked for conflicts before any of them
+        is activated, then the activate_extensions() method is called
+        once for all of them.  Commands should call this routine, and
+        should not call activate_extensions() directly.
+        """
+        extensions = []
+        for spec in specs:
+            # Activate any package dependencies that are also extensions.
+            if not force:
+                deps = [dep for dep in spec.package.dependency_activations()
+                        if not dep.package.activated]
+                extensions.extend(reversed(deps))
+            extensions.append(spec)
+
+        # Dependencies can be shared by several extensions
+        extensions = list(dedupe(extensions))
+
+        by_name = {}
+        for spec in extensions:
+            spec.package._sanity_check_extension()
+            if spec.package.extendee_spec != self.spec:
+                raise ActivationError("%s does not extend %s!" %
+                                      (spec.short_spec, self.spec.short_spec))
+
+            spack.store.layout.check_extension_conflict(self.spec, spec)
+            other = by_name.setdefault(spec.name, spec)
+            if other != spec:
+                raise ActivationError(
+                    "Cannot activate both %s and %s." %
+                    (other.short_spec, spec.short_spec))
+
+        self.activate_extensions(
+            [(spec.package, spec.package.extendee_args)
+             for spec in extensions])
+
+        spack.store.layout.add_extensions(self.spec, extensions)
+        for spec in extensions:
+            tty.msg("Activated extension %s for %s" %
+                    (spec.short_spec, self.spec.format("$_$@$+$%@")))
 
     def dependency_activations(self):
         return (spec for spec in self.spec.traverse(root=False, deptype='run')
@@ -1638,6 +1884,48 @@ class PackageBase(with_metaclass(PackageMeta, object)):
 
         tree.merge(self.prefix, ignore=ignore)
 
+    def activate_extensions(self, extensions):
+        """Symlinks all files from several extensions into this package's
+        install dir at once.
+
+        ``extensions`` is a list of ``(extension, kwargs)`` tuples, where
+        ``kwargs`` are the arguments activate() takes for the extension.
+        No file is linked if any of the extensions conflicts with the
+        install dir or with another one.  Packages that override
+        activate() but not this method get activate() called for each
+        extension instead.  Spack internals should call
+        do_activate_extensions().
+
+        """
+        cls = type(self)
+        if (cls.activate != PackageBase.activate and
+                cls.activate_extensions == PackageBase.activate_extensions):
+            for extension, kwargs in extensions:
+                self.activate(extension, **kwargs)
+            return
+
+        def make_ignore(kwargs):
+            ignore_arg = kwargs.get('ignore', lambda f: False)
+            return lambda filename: (
+                filename in spack.store.layout.hidden_file_paths or
+                ignore_arg(filename))
+
+        # Files of the extensions checked so far, so that conflicts
+        # between the extensions are found too
+        index = {}
+        trees = []
+        for extension, kwargs in extensions:
+            ignore = make_ignore(kwargs)
+            tree = LinkTree(extension.prefix)
+            conflict = tree.find_conflict(
+                self.prefix, index=index, ignore=ignore)
+            if conflict:
+                raise ExtensionConflictError(conflict)
+            trees.append((tree, ignore))
+
+        for tree, ignore in trees:
+            tree.merge(self.prefix, ignore=ignore)
+
     def do_deactivate(self, **kwargs):
         """Called on the extension to invoke extendee's deactivate() method."""
         self._sanity_check_extension()
@@ -28,6 +28,7 @@ import spack
 import spack.error
 import spack.stage
 import spack.fetch_strategy as fs
+import spack.util.crypto as crypto
 
 from llnl.util.filesystem import join_path
 from spack.util.executable import which
@@ -84,6 +85,12 @@ class Patch(object):
         _patch = which("patch", required=True)
         _patch('-s', '-p', str(self.level), '-i', self.path)
 
+    def checksum(self):
+        """Returns a checksum of the content of this patch, or None if it
+        can't be known before the patch is retrieved.
+        """
+        return None
+
 
 class FilePatch(Patch):
     """Describes a patch that is retrieved from a file in the repository"""
@@ -95,6 +102,9 @@ class FilePatch(Patch):
         if not os.path.isfile(self.path):
             raise NoSuchPatchFileError(pkg.name, self.path)
 
+    def checksum(self):
+        return crypto.checksum(crypto.hashes['sha256'], self.path)
+
 
 class UrlPatch(Patch):
     """Describes a patch that is retrieved from a URL"""
@@ -103,6 +113,31 @@ class UrlPatch(Patch):
         self.url = path_or_url
         self.md5 = kwargs.get('md5')
 
+    def checksum(self):
+        return self.md5
+
+    def _make_stage(self, stage):
+        fetcher = fs.URLFetchStrategy(self.url, digest=self.md5)
+        mirror = join_path(
+            os.path.dirname(stage.mirror_path),
+            os.path.basename(self.url)
+        )
+        return spack.stage.Stage(fetcher, mirror_path=mirror)
+
+    def fetch(self, stage):
+        """Retrieve the patch in a temporary stage, and store it in the
+        fetch cache so that :meth:`apply` doesn't download it again.
+
+        Only patches with a checksum are cached.
+
+        Args:
+            stage: stage for the package that needs to be patched
+        """
+        with self._make_stage(stage) as patch_stage:
+            patch_stage.fetch()
+            patch_stage.check()
+            patch_stage.cache_local()
+
     def apply(self, stage):
         """Retrieve the patch in a temporary stage, computes
         self.path and calls `super().apply(stage)`
@@ -110,12 +145,7 @@ class UrlPatch(Patch):
         Args:
             stage: stage for the package that needs to be patched
         """
-        fetcher = fs.URLFetchStrategy(self.url, digest=self.md5)
-        mirror = join_path(
-            os.path.dirname(stage.mirror_path),
-            os.path.basename(self.url)
-        )
-        with spack.stage.Stage(fetcher, mirror_path=mirror) as patch_stage:
+        with self._make_stage(stage) as patch_stage:
             patch_stage.fetch()
             patch_stage.check()
             patch_stage.cache_local()
@@ -0,0 +1,250 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Fetches the sources of the packages in a DAG ahead of their builds.
+
+Without prefetching, the sources of a package are fetched when its build
+starts, so the time spent waiting on mirrors adds up over the whole DAG.
+A :class:`Prefetcher` instead starts a bounded number of workers up
+front, which fetch, checksum and expand the archives, resources and URL
+patches of every package that needs to be built, in build order, while
+the builds run.
+
+Fetch strategies change the working directory of the process they run
+in, so the workers are processes forked before the builds start rather
+than threads.  They take the next package from state shared with the
+parent.  Before a build starts, :func:`wait` waits for its package if a
+worker is fetching it, or takes it away from the workers if none has
+started it yet.
+
+Prefetching is only an optimization: if it fails for a package, the
+build of that package fetches the sources again and reports the error.
+
+The time the workers spend fetching, checking and expanding the sources
+of a package is kept in the shared state, and :func:`wait` hands it to
+the build of that package, which records it with its own timings.
+"""
+import multiprocessing
+
+import llnl.util.tty as tty
+
+import spack
+from spack.patch import UrlPatch
+from spack.util.timer import Timer
+
+#: The prefetcher fetching sources for the current install, if any
+active = None
+
+#: Seconds between two checks that the workers are still alive
+poll_interval = 1.0
+
+#: Steps of a build that the workers measure
+timed_steps = ('fetch', 'checksum', 'expand')
+
+# States of the packages in a prefetcher
+_queued, _running, _done, _failed, _taken = range(5)
+
+
+def wait(spec):
+    """Waits until the active prefetcher, if any, is done with spec.
+
+    Returns:
+        list: ``(name, seconds)`` tuples for the steps of
+            :data:`timed_steps` that took time in the prefetcher, if it
+            prefetched spec
+    """
+    if active is not None and active.wait(spec):
+        return active.timings(spec)
+    return []
+
+
+class Prefetcher(object):
+    """Fetches the sources of ``specs`` with up to ``jobs`` workers.
+
+    ``specs`` is iterated when the workers start; externals are skipped.
+    A prefetcher is used as a context manager: workers start when entering
+    the context, unless another prefetcher is already active, and are
+    stopped when exiting it.
+
+    If ``expand`` is False, archives are only fetched and checked.  They
+    are not expanded either if the patched sources of their package are
+    in the source tree cache.
+    """
+
+    def __init__(self, specs, jobs=None, expand=True, mirror_only=False):
+        self.jobs = spack.fetch_jobs if jobs is None else jobs
+        self.expand = expand
+        self.mirror_only = mirror_only
+        self._candidates = specs
+        self.specs = []
+        self._index = {}
+        self._states = None
+        self._times = None
+        self._condition = None
+        self._workers = []
+
+    def __enter__(self):
+        global active
+        if active is None and self.jobs > 0:
+            self.start()
+            active = self
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        global active
+        if active is self:
+            active = None
+            self.stop(terminate=exc_type is not None)
+
+    def start(self):
+        """Starts the workers."""
+        for spec in self._candidates:
+            key = spec.dag_hash()
+            if key in self._index or spec.external:
+                continue
+            self._index[key] = len(self.specs)
+            self.specs.append(spec)
+
+        if not self.specs:
+            return
+
+        self._states = multiprocessing.Array('i', len(self.specs), lock=False)
+        self._times = multiprocessing.Array(
+            'd', len(self.specs) * len(timed_steps), lock=False)
+        self._condition = multiprocessing.Condition()
+        for _ in range(min(self.jobs, len(self.specs))):
+            worker = multiprocessing.Process(target=self._work)
+            worker.daemon = True
+            worker.start()
+            self._workers.append(worker)
+        tty.debug('Prefetching the sources of {0} packages with {1} '
+                  'workers'.format(len(self.specs), len(self._workers)))
+
+    def stop(self, terminate=False):
+        """Waits for the workers to finish their current fetch, and stops
+        them.  If ``terminate`` is True, workers are killed instead.
+        """
+        if self._workers:
+            with self._condition:
+                for i, state in enumerate(self._states):
+                    if state == _queued:
+                        self._states[i] = _taken
+            for worker in self._workers:
+                if terminate:
+                    worker.terminate()
+                worker.join()
+        self._workers = []
+
+    def wait(self, spec):
+        """Waits until no worker is fetching the sources of spec.
+
+        Returns:
+            True if the sources of spec were prefetched, False otherwise
+        """
+        i = self._index.get(spec.dag_hash())
+        if i is None or not self._workers:
+            return False
+
+        with self._condition:
+            if self._states[i] == _queued:
+                self._states[i] = _taken
+            elif self._states[i] == _running:
+                tty.msg('Waiting for the sources of {0} to be fetched'.format(
+                    spec.name))
+            while self._states[i] == _running and self._alive():
+                self._condition.wait(poll_interval)
+            state = self._states[i]
+
+        if state == _failed:
+            tty.debug('Prefetching {0} failed'.format(spec.name))
+        return state == _done
+
+    def timings(self, spec):
+        """Time spent on the steps of :data:`timed_steps` for spec by
+        the workers, as a list of ``(name, seconds)`` tuples.
+        """
+        i = self._index.get(spec.dag_hash())
+        if i is None or self._times is None:
+            return []
+        start = i * len(timed_steps)
+        times = self._times[start:start + len(timed_steps)]
+        return [(name, seconds) for name, seconds in zip(timed_steps, times)
+                if seconds]
+
+    def _alive(self):
+        return any(worker.is_alive() for worker in self._workers)
+
+    def _work(self):
+        """Main loop of the worker processes."""
+        tty.silence_worker()
+
+        while True:
+            with self._condition:
+                try:
+                    i = list(self._states).index(_queued)
+                except ValueError:
+                    return
+                self._states[i] = _running
+
+            state = _done
+            timer = None
+            try:
+                timer = self._fetch(self.specs[i])
+            except Exception:
+                tty.debug_traceback()
+                state = _failed
+
+            with self._condition:
+                if timer is not None:
+                    for j, name in enumerate(timed_steps):
+                        self._times[i * len(timed_steps) + j] = \
+                            timer.seconds(name)
+                self._states[i] = state
+                self._condition.notify_all()
+
+    def _fetch(self, spec):
+        """Fetches the sources of spec, and returns the timer of its
+        package.
+        """
+        pkg = spec.package
+        pkg.timer = Timer()
+        # Patched sources in the source tree cache are copied from it
+        # when the package is patched, unless the archive is expanded.
+        tree_key = pkg._source_tree_key()
+        if self.expand and not (tree_key and
+                                tree_key in spack.source_tree_cache):
+            pkg.do_stage(mirror_only=self.mirror_only)
+        else:
+            pkg.do_fetch(mirror_only=self.mirror_only)
+
+        # Patches without a checksum are not cached, so they would be
+        # downloaded again when applied.
+        for when_spec, patch_list in pkg.patches.items():
+            if not spec.satisfies(when_spec):
+                continue
+            for patch in patch_list:
+                if isinstance(patch, UrlPatch) and patch.md5:
+                    patch.fetch(pkg.stage)
+
+        return pkg.timer
@@ -29,12 +29,14 @@ import errno
 import sys
 import inspect
 import imp
+import multiprocessing
 import re
 import traceback
 from bisect import bisect_left
 from types import ModuleType
 
 import yaml
+from six import StringIO
 
 import llnl.util.tty as tty
 from llnl.util.filesystem import *
@@ -42,8 +44,10 @@ from llnl.util.filesystem import *
 import spack
 import spack.error
 import spack.spec
+from spack.metadata_index import MetadataIndex
 from spack.provider_index import ProviderIndex
 from spack.util.path import canonicalize_path
+from spack.util.multiproc import parmap
 from spack.util.naming import *
 
 #
@@ -63,6 +67,39 @@ package_file_name  = 'package.py'  # Filename for packages in a repository.
 # Guaranteed unused default value for some functions.
 NOT_PROVIDED = object()
 
+#
+# Loading many packages is spread across this many processes, so that
+# each of them imports at least _min_shard_size packages.
+#
+_loader_processes = multiprocessing.cpu_count()
+_min_shard_size = 32
+
+
+def _map_shards(function, pkg_names):
+    """Split pkg_names in shards, and call function on each of them in
+       its own process.
+
+       Returns the list of results, which must be picklable.  If there
+       are too few packages to bother forking, or if a worker fails,
+       function is called on all the names in this process instead, so
+       that errors are raised here.
+    """
+    nprocs = min(_loader_processes, len(pkg_names) // _min_shard_size)
+    if nprocs < 2:
+        return [function(pkg_names)]
+
+    def run(shard):
+        try:
+            return True, function(shard)
+        except BaseException:
+            return False, None
+
+    shards = [pkg_names[i::nprocs] for i in range(nprocs)]
+    results = parmap(run, shards)
+    if not all(ok for ok, _ in results):
+        return [function(pkg_names)]
+    return [result for _, result in results]
+
 
 def _autospec(function):
     """Decorator that automatically converts the argument of a single-arg
@@ -224,6 +261,21 @@ class RepoPath(object):
         for name in self.all_package_names():
             yield self.get(name)
 
+    def map_packages(self, function):
+        """Call function on every package, loading them in parallel.
+
+        Returns a dict mapping package names to the results of function,
+        which must be picklable.
+        """
+        def load(pkg_names):
+            return dict((name, function(self.get(name)))
+                        for name in pkg_names)
+
+        results = {}
+        for shard in _map_shards(load, self.all_package_names()):
+            results.update(shard)
+        return results
+
     @property
     def provider_index(self):
         """Merged ProviderIndex from all Repos in the RepoPath."""
@@ -320,6 +372,10 @@ class RepoPath(object):
         """Find a class for the spec's package and return the class object."""
         return self.repo_for_pkg(pkg_name).get_pkg_class(pkg_name)
 
+    def package_metadata(self, pkg_name):
+        """Find the metadata of a package, without importing it."""
+        return self.repo_for_pkg(pkg_name).package_metadata(pkg_name)
+
     @_autospec
     def dump_provenance(self, spec, path):
         """Dump provenance information for a spec to a particular path.
@@ -350,6 +406,22 @@ class RepoPath(object):
         return self.exists(pkg_name)
 
 
+class RepoPathImporter(object):
+    """Import hook that hands imports of packages to a RepoPath.
+
+    The RepoPath is only retrieved when a module in the ``spack.pkg``
+    namespace is imported, so other imports don't require creating it.
+    """
+
+    def __init__(self, get_repo_path):
+        self.get_repo_path = get_repo_path
+
+    def find_module(self, fullname, path=None):
+        if fullname.split('.')[:2] != repo_namespace.split('.'):
+            return None
+        return self.get_repo_path().find_module(fullname, path)
+
+
 class Repo(object):
     """Class representing a package repository in the filesystem.
 
@@ -425,9 +497,15 @@ class Repo(object):
         # list of packages that are newer than the index.
         self._needs_update = []
 
+        # modification times of the package.py files, by package name.
+        self._package_mtimes = {}
+
         # Index of virtual dependencies
         self._provider_index = None
 
+        # Index of package directives
+        self._metadata_index = None
+
         # Cached list of package names.
         self._all_package_names = None
 
@@ -437,6 +515,9 @@ class Repo(object):
         # Unique filename for cache of virtual dependency providers
         self._cache_file = 'providers/%s-index.yaml' % self.namespace
 
+        # Unique filename for cache of package metadata
+        self._metadata_cache_file = 'metadata/%s-index.json' % self.namespace
+
     def _create_namespace(self):
         """Create this repo's namespace module and insert it into sys.modules.
 
@@ -638,10 +719,13 @@ class Repo(object):
                 else:
                     self._provider_index = ProviderIndex()
 
-                for pkg_name in self._needs_update:
-                    namespaced_name = '%s.%s' % (self.namespace, pkg_name)
-                    self._provider_index.remove_provider(namespaced_name)
-                    self._provider_index.update(namespaced_name)
+                namespaced_names = ['%s.%s' % (self.namespace, pkg_name)
+                                    for pkg_name in self._needs_update]
+                for name in namespaced_names:
+                    self._provider_index.remove_provider(name)
+
+                for index in _map_shards(_index_providers, namespaced_names):
+                    self._provider_index.merge(ProviderIndex.from_yaml(index))
 
                 self._provider_index.to_yaml(new)
 
@@ -652,6 +736,62 @@ class Repo(object):
             self._update_provider_index()
         return self._provider_index
 
+    def _update_metadata_index(self):
+        self._fast_package_check()
+
+        # Read the old MetadataIndex, and only update it if some
+        # package.py file was added, removed or modified since.
+        key = self._metadata_cache_file
+        if spack.misc_cache.init_entry(key):
+            with spack.misc_cache.read_transaction(key) as f:
+                self._metadata_index = MetadataIndex.from_json(f)
+            stale, removed = self._metadata_index.outdated(
+                self._package_mtimes)
+            if not stale and not removed:
+                return
+
+        with spack.misc_cache.write_transaction(key) as (old, new):
+            if old:
+                self._metadata_index = MetadataIndex.from_json(old)
+            else:
+                self._metadata_index = MetadataIndex()
+
+            stale, removed = self._metadata_index.outdated(
+                self._package_mtimes)
+            for pkg_name in removed:
+                self._metadata_index.remove(pkg_name)
+
+            def index_metadata(pkg_names):
+                index = MetadataIndex()
+                for pkg_name in pkg_names:
+                    index.update(
+                        self.get(pkg_name), self._package_mtimes[pkg_name])
+                return index
+
+            for index in _map_shards(index_metadata, stale):
+                self._metadata_index.merge(index)
+
+            self._metadata_index.to_json(new)
+
+    @property
+    def metadata_index(self):
+        """Index of the directives of all the packages in this repo."""
+        if self._metadata_index is None:
+            self._update_metadata_index()
+        return self._metadata_index
+
+    def package_metadata(self, pkg_name):
+        """Get the metadata of a package without importing it, unless
+        its package.py file changed since it was last indexed."""
+        namespace, _, pkg_name = pkg_name.rpartition('.')
+        if namespace and (namespace != self.namespace):
+            raise InvalidNamespaceError('Invalid namespace for %s repo: %s'
+                                        % (self.namespace, namespace))
+
+        if pkg_name not in self.metadata_index:
+            raise UnknownPackageError(pkg_name, self)
+        return self.metadata_index[pkg_name]
+
     @_autospec
     def providers_for(self, vpkg_spec):
         providers = self.provider_index.providers_for(vpkg_spec)
@@ -743,6 +883,7 @@ class Repo(object):
 
                 # All checks passed.  Add it to the list.
                 self._all_package_names.append(pkg_name)
+                self._package_mtimes[pkg_name] = sinfo.st_mtime
 
                 # record the package if it is newer than the index.
                 if sinfo.st_mtime > index_mtime:
@@ -845,6 +986,17 @@ class Repo(object):
         return self.exists(pkg_name)
 
 
+def _index_providers(pkg_names):
+    """Index the virtual packages provided by some packages, as YAML."""
+    index = ProviderIndex()
+    for name in pkg_names:
+        index.update(name)
+
+    stream = StringIO()
+    index.to_yaml(stream)
+    return stream.getvalue()
+
+
 def create_repo(root, namespace=None):
     """Create a new repository in root with the specified namespace.
 
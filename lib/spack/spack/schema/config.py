@@ -63,11 +63,27 @@ schema = {
                     },
                 },
                 'source_cache': {'type': 'string'},
+                'source_cache_limit': {
+                    'anyOf': [
+                        {'type': 'integer', 'minimum': 0},
+                        {'type': 'string',
+                         'pattern':
+                         r'^\s*\d+(\.\d+)?\s*[KMGTPkmgtp]?[Bb]?\s*$'}]
+                },
+                'source_cache_dedup': {'type': 'boolean'},
+                'source_tree_cache': {'type': 'string'},
                 'misc_cache': {'type': 'string'},
                 'verify_ssl': {'type': 'boolean'},
                 'checksum': {'type': 'boolean'},
                 'dirty': {'type': 'boolean'},
                 'build_jobs': {'type': 'integer', 'minimum': 1},
+                'concurrent_builds': {'type': 'integer', 'minimum': 1},
+                'coordinate_installs': {'type': 'boolean'},
+                'fetch_jobs': {'type': 'integer', 'minimum': 0},
+                'url_fetch_method': {
+                    'type': 'string',
+                    'enum': ['curl', 'urllib']
+                },
             }
         },
     },
@@ -98,7 +98,6 @@ expansion when it is the first character in an id typed on the command line.
 import base64
 import sys
 import collections
-import ctypes
 import hashlib
 import itertools
 import os
@@ -207,9 +206,6 @@ special_types = {
 
 legal_deps = tuple(special_types) + alldeps
 
-"""Max integer helps avoid passing too large a value to cyaml."""
-maxint = 2 ** (ctypes.sizeof(ctypes.c_int) * 8 - 1) - 1
-
 
 def validate_deptype(deptype):
     if isinstance(deptype, str):
@@ -1376,8 +1372,20 @@ class Spec(object):
         if self._hash:
             return self._hash[:length]
         else:
-            yaml_text = syaml.dump(
-                self.to_node_dict(), default_flow_style=True, width=maxint)
+            return self._dag_hash({})[:length]
+
+    def _dag_hash(self, hashes):
+        """Compute the DAG hash of this spec.
+
+        ``hashes`` maps ids of the specs already hashed to their hashes,
+        so that each node of a DAG that isn't concrete is hashed once.
+        """
+        if self._hash:
+            return self._hash
+
+        key = id(self)
+        if key not in hashes:
+            yaml_text = syaml.dump_flow(self.to_node_dict(hashes))
             sha = hashlib.sha1(yaml_text.encode('utf-8'))
 
             b32_hash = base64.b32encode(sha.digest()).lower()
@@ -1386,13 +1394,24 @@ class Spec(object):
 
             if self.concrete:
                 self._hash = b32_hash
-            return b32_hash[:length]
+            hashes[key] = b32_hash
+
+        return hashes[key]
 
     def dag_hash_bit_prefix(self, bits):
         """Get the first <bits> bits of the DAG hash as an integer type."""
         return base32_prefix_bits(self.dag_hash(), bits)
 
-    def to_node_dict(self):
+    def to_node_dict(self, hashes=None):
+        """Get the node of this spec as a dict, with the hashes of its
+        dependencies.
+
+        ``hashes`` memoizes the hashes of dependencies, see
+        ``_dag_hash()``.
+        """
+        if hashes is None:
+            hashes = {}
+
         d = syaml_dict()
 
         if self.versions:
@@ -1429,7 +1448,7 @@ class Spec(object):
             d['dependencies'] = syaml_dict([
                 (name,
                  syaml_dict([
-                     ('hash', dspec.spec.dag_hash()),
+                     ('hash', dspec.spec._dag_hash(hashes)),
                      ('type', sorted(str(s) for s in dspec.deptypes))])
                  ) for name, dspec in sorted(deps.items())
             ])
@@ -1438,9 +1457,10 @@ class Spec(object):
 
     def to_dict(self):
         node_list = []
+        hashes = {}
         for s in self.traverse(order='pre', deptype=('link', 'run')):
-            node = s.to_node_dict()
-            node[s.name]['hash'] = s.dag_hash()
+            node = s.to_node_dict(hashes)
+            node[s.name]['hash'] = s._dag_hash(hashes)
             node_list.append(node)
 
         return syaml_dict([('spec', node_list)])
@@ -40,6 +40,7 @@ from llnl.util.filesystem import *
 import spack
 import spack.config
 import spack.error
+import spack.host_stats
 import spack.fetch_strategy as fs
 import spack.util.pattern as pattern
 from spack.version import *
@@ -407,11 +408,18 @@ class Stage(object):
             # repositories.  How can this be made safer?
             self.skip_checksum_for_mirror = not bool(digest)
 
-            # Add URL strategies for all the mirrors with the digest
-            for url in urls:
-                fetchers.insert(
-                    0, fs.URLFetchStrategy(
-                        url, digest, expand=expand, extension=extension))
+            # Add URL strategies for all the mirrors with the digest, the
+            # fastest first.  Mirrors that failed recently are tried after
+            # the default fetcher.
+            urls, failing = spack.host_stats.rank(urls)
+            fetchers[:0] = [
+                fs.URLFetchStrategy(
+                    url, digest, expand=expand, extension=extension)
+                for url in urls]
+            fetchers.extend(
+                fs.URLFetchStrategy(
+                    url, digest, expand=expand, extension=extension)
+                for url in failing)
             if self.default_fetcher.cachable:
                 fetchers.insert(
                     0, spack.fetch_cache.fetcher(
@@ -23,10 +23,11 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 
+import os
 import textwrap
 
-import jinja2
 import llnl.util.lang
+from llnl.util.filesystem import mkdirp
 import six
 import spack
 
@@ -83,20 +84,89 @@ class Context(six.with_metaclass(ContextMeta, object)):
         return dict(d)
 
 
+#: Environments already made, by directories where to search for templates
+_environments = {}
+
+
 def make_environment(dirs=None):
-    """Returns an configured environment for template rendering."""
+    """Returns an configured environment for template rendering.
+
+    The environment is made once per process for each list of
+    directories, so that templates are only compiled the first time they
+    are used. Compiled templates are also kept in the misc cache, and
+    reused by later processes until the template is modified.
+    """
     if dirs is None:
         # Default directories where to search for templates
         dirs = spack.template_dirs
+    key = tuple(dirs)
+    if key not in _environments:
+        _environments[key] = _make_environment(dirs)
+    return _environments[key]
+
+
+def _make_environment(dirs):
+    # jinja2 is imported here, as it is slow to import and only
+    # needed to write module files.
+    import jinja2
+
     # Loader for the templates
     loader = jinja2.FileSystemLoader(dirs)
     # Environment of the template engine
-    env = jinja2.Environment(loader=loader, trim_blocks=True)
+    env = jinja2.Environment(
+        loader=loader, trim_blocks=True, bytecode_cache=_bytecode_cache(dirs)
+    )
     # Custom filters
     _set_filters(env)
     return env
 
 
+def templates_mtime(dirs=None):
+    """Returns the time the templates in ``dirs`` were last modified."""
+    if dirs is None:
+        dirs = spack.template_dirs
+    mtimes = [0]
+    for template_dir in dirs:
+        for dirpath, dirnames, filenames in os.walk(template_dir):
+            mtimes.extend(os.path.getmtime(os.path.join(dirpath, f))
+                          for f in filenames)
+    return max(mtimes)
+
+
+def _bytecode_cache(dirs):
+    """Returns a bytecode cache that keeps the templates in ``dirs``
+    compiled in the misc cache, or None if it can't be used.
+    """
+    import jinja2
+
+    class BytecodeCache(jinja2.FileSystemBytecodeCache):
+        """Writes compiled templates atomically, so that concurrent
+        processes never read a partial file, and ignores failures to
+        write them.
+        """
+
+        def dump_bytecode(self, bucket):
+            filename = self._get_cache_filename(bucket)
+            tmp = '{0}.{1}.tmp'.format(filename, os.getpid())
+            try:
+                with open(tmp, 'wb') as f:
+                    bucket.write_bytecode(f)
+                os.rename(tmp, filename)
+            except (IOError, OSError):
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+
+    # There is one file per template, whose path is part of its key.
+    # Jinja compiles a template again when its checksum doesn't match
+    # the one stored with the bytecode, and then overwrites the file.
+    try:
+        directory = spack.misc_cache.cache_path('templates')
+        mkdirp(directory)
+    except (IOError, OSError):
+        return None
+    return BytecodeCache(directory)
+
+
 # Extra filters for template engine environment
 
 def prepend_to_line(text, token):
@@ -0,0 +1,107 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import hashlib
+import os
+
+import pytest
+
+import llnl.util.tty as tty
+import spack
+import spack.cmd.checksum
+import spack.util.crypto
+from spack.version import ver
+
+
+@pytest.fixture(params=['curl', 'urllib'])
+def url_fetch_method(request, monkeypatch):
+    monkeypatch.setattr(spack, 'url_fetch_method', request.param)
+    return request.param
+
+
+@pytest.fixture()
+def archives(mock_http_server, monkeypatch):
+    """Serves three versions of an archive, and answers the question of
+    ``spack checksum`` with all of them.  Version 3.0 is missing.
+    """
+    md5s = {}
+    url_dict = {}
+    for version in ('1.0', '2.0', '3.0'):
+        name = 'foo-%s.tar.gz' % version
+        url_dict[ver(version)] = '%s/%s' % (mock_http_server.url, name)
+        if version != '3.0':
+            data = ('contents of version %s' % version).encode('utf-8')
+            with open(os.path.join(mock_http_server.root, name), 'wb') as f:
+                f.write(data)
+            md5s[version] = hashlib.md5(data).hexdigest()
+
+    monkeypatch.setattr(tty, 'get_number', lambda *args, **kwargs: 3)
+    return url_dict, md5s
+
+
+@pytest.mark.parametrize('jobs', [1, 3])
+def test_get_checksums(archives, url_fetch_method, jobs):
+    url_dict, md5s = archives
+    first_stages = []
+
+    def first_stage_function(stage, url):
+        assert os.path.isfile(stage.archive_file)
+        first_stages.append(url)
+
+    version_lines = spack.cmd.checksum.get_checksums(
+        url_dict, 'foo', first_stage_function=first_stage_function,
+        jobs=jobs)
+
+    assert version_lines.splitlines() == [
+        "    version('2.0', '%s')" % md5s['2.0'],
+        "    version('1.0', '%s')" % md5s['1.0']]
+
+    # The function runs once, on the newest version that was fetched
+    assert first_stages == [url_dict[ver('2.0')]]
+
+    # No stage is left behind
+    for version in url_dict:
+        name = spack.cmd.checksum._stage_name('foo', version)
+        assert not os.path.exists(os.path.join(spack.stage_path, name))
+
+
+def test_get_checksums_while_downloading(archives, monkeypatch):
+    """With urllib, archives are hashed as they are downloaded."""
+    url_dict, md5s = archives
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+
+    def checksum(*args, **kwargs):
+        raise AssertionError('archive was read again')
+    monkeypatch.setattr(spack.util.crypto, 'checksum', checksum)
+
+    version_lines = spack.cmd.checksum.get_checksums(url_dict, 'foo')
+    assert md5s['1.0'] in version_lines
+    assert md5s['2.0'] in version_lines
+
+
+def test_get_checksums_fails(archives):
+    url_dict, md5s = archives
+    with pytest.raises(SystemExit):
+        spack.cmd.checksum.get_checksums(
+            {ver('3.0'): url_dict[ver('3.0')]}, 'foo')
@@ -117,3 +117,32 @@ def test_remove_and_add_dotkit(database, parser):
     module.module(parser, args)
     for item in module_files:
         assert os.path.exists(item)
+
+
+def test_refresh_is_incremental(database, parser, monkeypatch):
+    """Tests that refresh only writes module files whose inputs changed."""
+    args = parser.parse_args(
+        ['refresh', '-y', '-j', '2', '-m', 'tcl', 'mpileaks'])
+    module_files = _get_module_files(args)
+    module.module(parser, args)
+    for item in module_files:
+        assert os.path.exists(item)
+
+    written = []
+
+    def write(self, overwrite=False):
+        written.append(self.layout.filename)
+
+    writer_cls = modules.module_types['tcl']
+    monkeypatch.setattr(writer_cls, 'write', write)
+
+    # Nothing changed since the last refresh
+    args = parser.parse_args(
+        ['refresh', '-y', '-j', '1', '-m', 'tcl', 'mpileaks'])
+    module.module(parser, args)
+    assert written == []
+
+    # Module files that were removed are written again
+    os.remove(module_files[0])
+    module.module(parser, args)
+    assert written == [module_files[0]]
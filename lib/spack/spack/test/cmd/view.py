@@ -0,0 +1,78 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import argparse
+import os
+
+import pytest
+import spack.cmd.view as view
+from spack.spec import Spec
+
+
+@pytest.fixture(scope='module')
+def parser():
+    """Returns the parser for the view command"""
+    parser = argparse.ArgumentParser()
+    view.setup_parser(parser)
+    return parser
+
+
+def test_view_is_incremental(database, parser, tmpdir, monkeypatch):
+    """Tests that packages are linked once, and removed from the
+    manifest of the view."""
+    path = str(tmpdir.join('view'))
+    libelf = Spec('libelf').concretized()
+    libdwarf = Spec('libdwarf').concretized()
+
+    args = parser.parse_args(['-j', '2', 'symlink', path, 'libelf'])
+    view.view(parser, args)
+    assert os.path.islink(os.path.join(path, 'bin', 'libelf'))
+    manifest = view.read_manifest(path)
+    assert os.path.join('bin', 'libelf') in manifest[libelf.dag_hash()][
+        'files']
+
+    # Only the prefix of libdwarf is read, as libelf is in the view
+    listed = []
+    list_files = view.list_files
+
+    def _list_files(prefix):
+        listed.append(prefix)
+        return list_files(prefix)
+
+    monkeypatch.setattr(view, 'list_files', _list_files)
+    args = parser.parse_args(['-j', '2', 'symlink', path, 'libdwarf'])
+    view.view(parser, args)
+    assert listed == [libdwarf.prefix]
+    assert os.path.islink(os.path.join(path, 'bin', 'libdwarf'))
+
+    args = parser.parse_args(['-d', 'false', 'remove', path, 'libdwarf'])
+    view.view(parser, args)
+    assert not os.path.exists(os.path.join(path, 'bin', 'libdwarf'))
+    assert not os.path.exists(os.path.join(path, '.spack', 'libdwarf'))
+    assert os.path.islink(os.path.join(path, 'bin', 'libelf'))
+    assert list(view.read_manifest(path)) == [libelf.dag_hash()]
+
+    args = parser.parse_args(['remove', path, 'libelf'])
+    view.view(parser, args)
+    assert os.listdir(path) == []
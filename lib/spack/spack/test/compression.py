@@ -0,0 +1,209 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+import stat
+import tarfile
+import zipfile
+
+import pytest
+
+import spack.util.compression as compression
+from spack.util.compression import ExtractError, extract
+from spack.util.executable import which
+
+
+@pytest.fixture()
+def source(tmpdir):
+    """A small source tree, with an executable and a symbolic link."""
+    root = tmpdir.ensure('archive-src', dir=True)
+    top = root.ensure('pkg-1.0', dir=True)
+    top.ensure('src', 'main.c').write('int main() { return 0; }\n')
+    configure = top.join('configure')
+    configure.write('#!/bin/sh\n')
+    configure.chmod(0o755)
+    top.join('link').mksymlinkto('src/main.c')
+    for path in (configure, top.join('src', 'main.c')):
+        os.utime(str(path), (1000000000, 1000000000))
+    return root
+
+
+def make_tarball(source, path, names=('pkg-1.0',), compressor=None):
+    with tarfile.open(path, 'w') as tar:
+        for name in names:
+            tar.add(str(source.join(name)), name)
+    if compressor:
+        exe = which(compressor)
+        if not exe:
+            pytest.skip('%s is not installed' % compressor)
+        exe('-f', path)
+        path += '.' + {'gzip': 'gz', 'bzip2': 'bz2', 'xz': 'xz'}[compressor]
+    return path
+
+
+def make_zip(source, path, names=('pkg-1.0',)):
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name in names:
+            if source.join(name).isfile():
+                zf.write(str(source.join(name)), name)
+            for dirpath, dirnames, filenames in os.walk(
+                    str(source.join(name))):
+                for f in filenames:
+                    full = os.path.join(dirpath, f)
+                    zf.write(full, os.path.relpath(full, str(source)))
+    return path
+
+
+def check_tree(top):
+    assert top.join('src', 'main.c').read() == 'int main() { return 0; }\n'
+    assert os.stat(str(top.join('configure'))).st_mode & stat.S_IXUSR
+    assert top.join('configure').mtime() == 1000000000
+
+
+@pytest.mark.parametrize('compressor', [None, 'gzip', 'bzip2', 'xz'])
+@pytest.mark.parametrize('in_python', [False, True])
+def test_extract_tarball(tmpdir, source, monkeypatch, compressor,
+                         in_python):
+    if in_python:
+        monkeypatch.setattr(compression, '_decompressor', lambda fmt: None)
+        if compressor == 'xz' and 'xz' not in compression._tarfile_modes:
+            pytest.skip('Python cannot decompress xz')
+
+    archive = make_tarball(
+        source, str(tmpdir.join('pkg-1.0.tar')), compressor=compressor)
+    stage = tmpdir.ensure('stage', dir=True)
+    assert extract(archive, str(stage), 'container')
+
+    # The single top-level directory is expanded directly in the stage
+    assert sorted(os.listdir(str(stage))) == ['pkg-1.0']
+    check_tree(stage.join('pkg-1.0'))
+    assert stage.join('pkg-1.0', 'link').readlink() == 'src/main.c'
+
+
+def test_extract_zip(tmpdir, source):
+    archive = make_zip(source, str(tmpdir.join('pkg-1.0.zip')))
+    stage = tmpdir.ensure('stage', dir=True)
+    assert extract(archive, str(stage), 'container')
+
+    assert sorted(os.listdir(str(stage))) == ['pkg-1.0']
+    check_tree(stage.join('pkg-1.0'))
+
+
+@pytest.mark.parametrize('make_archive', [make_tarball, make_zip])
+def test_extract_exploding_archive(tmpdir, source, make_archive):
+    source.ensure('README').write('readme')
+    archive = make_archive(
+        source, str(tmpdir.join('archive')), names=('pkg-1.0', 'README'))
+
+    stage = tmpdir.ensure('stage', dir=True)
+    assert extract(archive, str(stage), 'container')
+
+    assert os.listdir(str(stage)) == ['container']
+    check_tree(stage.join('container', 'pkg-1.0'))
+    assert stage.join('container', 'README').read() == 'readme'
+
+
+def test_extract_does_not_overwrite_stage(tmpdir, source):
+    archive = make_tarball(source, str(tmpdir.join('pkg-1.0.tar')))
+    stage = tmpdir.ensure('stage', dir=True)
+    stage.ensure('pkg-1.0').write('archive')
+
+    assert extract(archive, str(stage), 'container')
+    assert stage.join('pkg-1.0').read() == 'archive'
+    check_tree(stage.join('container', 'pkg-1.0'))
+
+
+def test_extract_unsafe_archive(tmpdir, source):
+    archive = str(tmpdir.join('unsafe.tar'))
+    with tarfile.open(archive, 'w') as tar:
+        tar.add(str(source.join('pkg-1.0', 'configure')), '../configure')
+
+    stage = tmpdir.ensure('stage', dir=True)
+    with pytest.raises(ExtractError):
+        extract(archive, str(stage), 'container')
+    assert not tmpdir.join('configure').exists()
+
+
+def test_extract_links_outside_of_archive(tmpdir, source):
+    # `automake --add-missing` without `--copy` makes links like this one
+    archive = str(tmpdir.join('links.tar'))
+    with tarfile.open(archive, 'w') as tar:
+        tar.add(str(source.join('pkg-1.0')), 'pkg-1.0')
+        link = tarfile.TarInfo('pkg-1.0/config.guess')
+        link.type = tarfile.SYMTYPE
+        link.linkname = '/usr/share/automake-1.16/config.guess'
+        tar.addfile(link)
+
+    stage = tmpdir.ensure('stage', dir=True)
+    assert extract(archive, str(stage), 'container')
+    assert stage.join('pkg-1.0', 'config.guess').readlink() == \
+        '/usr/share/automake-1.16/config.guess'
+
+
+def test_extract_through_symlink(tmpdir, source):
+    outside = tmpdir.ensure('outside', dir=True)
+    outside.join('file').write('outside\n')
+    owned = source.join('owned')
+    owned.write('owned\n')
+
+    def make_archive(name, member):
+        archive = str(tmpdir.join(name))
+        with tarfile.open(archive, 'w') as tar:
+            link = tarfile.TarInfo('pkg-1.0/esc')
+            link.type = tarfile.SYMTYPE
+            link.linkname = str(outside)
+            tar.addfile(link)
+            tar.addfile(member)
+            tar.add(str(owned), member.name)
+        return archive
+
+    # A member written through a link made by the archive is refused
+    member = tarfile.TarInfo('pkg-1.0/esc/owned')
+    archive = make_archive('through.tar', member)
+    stage = tmpdir.ensure('stage', dir=True)
+    with pytest.raises(ExtractError):
+        extract(archive, str(stage), 'container')
+    assert not outside.join('owned').exists()
+
+    # And so is a hard link to a file outside, that it would overwrite
+    member = tarfile.TarInfo('pkg-1.0/hard')
+    member.type = tarfile.LNKTYPE
+    member.linkname = 'pkg-1.0/esc/file'
+    archive = make_archive('hard.tar', member)
+    stage = tmpdir.ensure('stage2', dir=True)
+    with pytest.raises(ExtractError):
+        extract(archive, str(stage), 'container')
+    assert outside.join('file').read() == 'outside\n'
+
+
+def test_extract_leaves_other_formats(tmpdir):
+    # Single compressed files are not archives
+    path = tmpdir.join('file.gz')
+    path.write('not a tarball')
+    assert not extract(str(path), str(tmpdir), 'container', 'gz')
+
+    path = tmpdir.join('file.tar')
+    path.write('not a tarball')
+    assert not extract(str(path), str(tmpdir), 'container', 'tar')
+    assert not tmpdir.join('container').exists()
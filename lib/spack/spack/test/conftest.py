@@ -24,10 +24,13 @@
 ##############################################################################
 import collections
 import copy
+import hashlib
 import os
 import re
 import shutil
+import threading
 from six import StringIO
+from six.moves import BaseHTTPServer, socketserver
 
 import llnl.util.filesystem
 import llnl.util.lang
@@ -40,13 +43,21 @@ import spack.architecture
 import spack.database
 import spack.directory_layout
 import spack.fetch_strategy
+import spack.file_cache
+import spack.package_prefs
 import spack.platforms.test
 import spack.repository
 import spack.stage
+import spack.tengine
 import spack.util.executable
 import spack.util.pattern
 
 
+# The default RepoPath is created lazily.  Create it now, from the real
+# configuration, as tests swap the mock repository in and out of it.
+spack.repo.instance
+
+
 ##########
 # Monkey-patching that is applied to all tests
 ##########
@@ -61,6 +72,15 @@ def no_stdin_duplication(monkeypatch):
                         lambda x: StringIO())
 
 
+@pytest.fixture(autouse=True)
+def no_template_cache(monkeypatch):
+    """Makes a new template environment for each test, without keeping
+    compiled templates in the misc cache.
+    """
+    monkeypatch.setattr(spack.tengine, '_environments', {})
+    monkeypatch.setattr(spack.tengine, '_bytecode_cache', lambda dirs: None)
+
+
 @pytest.fixture(autouse=True)
 def mock_fetch_cache(monkeypatch):
     """Substitutes spack.fetch_cache with a mock object that does nothing
@@ -125,6 +145,21 @@ def refresh_builtin_mock(builtin_mock, repo_path):
     return builtin_mock
 
 
+@pytest.fixture()
+def misc_cache(tmpdir, monkeypatch):
+    """Indexes repositories in a temporary cache."""
+    cache = spack.file_cache.FileCache(str(tmpdir.join('misc_cache')))
+    monkeypatch.setattr(spack, 'misc_cache', cache)
+    return cache
+
+
+@pytest.fixture()
+def parallel_loader(monkeypatch):
+    """Loads packages in several processes, however few there are."""
+    monkeypatch.setattr(spack.repository, '_loader_processes', 4)
+    monkeypatch.setattr(spack.repository, '_min_shard_size', 1)
+
+
 @pytest.fixture(scope='session')
 def linux_os():
     """Returns a named tuple with attributes 'name' and 'version'
@@ -336,6 +371,101 @@ def mock_archive():
     stage.destroy()
 
 
+class MockHTTPRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serves the files in the root of the server, with keep-alive
+    connections, ``Range: bytes=N-`` requests and ETags.
+    ``/redirect/<path>`` redirects to ``/<path>``, and ``/status/<code>``
+    answers with that status.
+    """
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body=b'', headers=()):
+        self.send_response(status)
+        for header in headers:
+            self.send_header(*header)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+        self.server.responses.append((self.command, self.path, status))
+
+    def do_GET(self):
+        headers = dict((k.lower(), v) for k, v in self.headers.items())
+        self.server.requests.append((self.path, headers))
+        if self.path.startswith('/redirect/'):
+            location = self.path[len('/redirect'):]
+            return self.send(302, headers=[('Location', location)])
+        if self.path.startswith('/status/'):
+            return self.send(int(self.path.split('/')[2]))
+
+        path = os.path.join(self.server.root, self.path.lstrip('/'))
+        if not os.path.isfile(path):
+            return self.send(404)
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        content_type = 'application/octet-stream'
+        if path.endswith('.html'):
+            content_type = 'text/html'
+        etag = '"%s"' % hashlib.md5(data).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            return self.send(304, headers=[('ETag', etag)])
+        headers = [('Content-Type', content_type), ('ETag', etag)]
+
+        match = re.match(r'bytes=(\d+)-$', self.headers.get('Range', ''))
+        if not match:
+            return self.send(200, data, headers)
+
+        start = int(match.group(1))
+        if start >= len(data):
+            return self.send(416)
+        headers.append(('Content-Range', 'bytes %d-%d/%d' % (
+            start, len(data) - 1, len(data))))
+        self.send(206, data[start:], headers)
+
+    do_HEAD = do_GET
+
+
+class MockHTTPServer(socketserver.ThreadingMixIn,
+                     BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients may close connections without sending a request
+        pass
+
+
+@pytest.fixture()
+def mock_http_server(tmpdir):
+    """Local HTTP server, serving the files in ``server.root``.
+
+    The server counts the connections it accepted, records the path
+    and headers (with lowercase names) of each request in
+    ``server.requests``, and the method, path and status of each
+    response in ``server.responses``.
+    """
+    server = MockHTTPServer(('127.0.0.1', 0), MockHTTPRequestHandler)
+    server.root = str(tmpdir.mkdir('http-root'))
+    server.url = 'http://127.0.0.1:%d' % server.server_address[1]
+    server.connections = 0
+    server.requests = []
+    server.responses = []
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
 @pytest.fixture(scope='session')
 def mock_git_repository():
     """Creates a very simple git repository with two branches and
@@ -31,7 +31,9 @@ import os.path
 
 import pytest
 import spack
+import spack.database
 import spack.store
+import spack.util.spack_json as sjson
 from spack.util.executable import Executable
 from llnl.util.tty.colify import colify
 
@@ -246,6 +248,36 @@ def test_050_basic_query(database):
     assert len(install_db.query('mpileaks ^zmpi')) == 1
 
 
+@pytest.mark.parametrize('query', [
+    'mpileaks', 'mpi', 'mpi@2:', 'mpileaks@2.3', 'mpileaks@:1.0',
+    '%gcc', '%clang@3.3', 'mpileaks+debug', 'mpileaks~debug',
+    'mpileaks debug=true', '+shared', 'mpileaks ^mpich', 'callpath ^mpi',
+    '^mpich2', '^mpi', '^libelf ^mpich', 'dyninst ^libdwarf', 'fake',
+    'nonexistent-package', 'libelf@0.8.13%gcc'
+])
+def test_indexed_query_matches_linear_scan(database, query):
+    """Ensure the query index doesn't change the results of queries."""
+    install_db = database.mock.db
+    query_spec = spack.spec.Spec(query)
+
+    with install_db.read_transaction():
+        expected = sorted(
+            rec.spec for rec in install_db._data.values()
+            if rec.spec.satisfies(query_spec))
+        assert install_db.query(query_spec, installed=any) == expected
+
+
+def test_installed_dependents(database):
+    install_db = database.mock.db
+    libelf = install_db.query_one('libelf')
+
+    dependents = install_db.installed_dependents(libelf)
+    expected = set(s for s in install_db.query()
+                   if s != libelf and 'libelf' in s)
+    assert dependents == expected
+    assert len(dependents) == 8
+
+
 def _check_remove_and_add_package(install_db, spec):
     """Remove a spec from the DB, then add it and make sure everything's
     still ok once it is added.  This checks that it was
@@ -397,3 +429,149 @@ def test_external_entries_in_db(database):
     assert rec.spec.external_path == '/path/to/external_tool'
     assert rec.spec.external_module is None
     assert rec.explicit is True
+
+
+def test_journal_appends_changes(database, refresh_db_on_exit, monkeypatch):
+    """Ensure writes append to the journal, and that other processes only
+    read the new journal entries."""
+    install_db = database.mock.db
+    monkeypatch.setattr(spack.database, '_journal_compaction_ratio', 100)
+    install_db.reindex(spack.store.layout)
+
+    other_db = spack.database.Database(install_db.root)
+    with other_db.read_transaction():
+        assert len(other_db.query('mpileaks ^mpich2')) == 1
+
+    index_stat = spack.database._file_stat(install_db._index_path)
+    journal_size = os.path.getsize(install_db._journal_path)
+
+    _mock_remove('mpileaks ^mpich2')
+
+    assert spack.database._file_stat(install_db._index_path) == index_stat
+    assert os.path.getsize(install_db._journal_path) > journal_size
+
+    def fail(*args, **kwargs):
+        raise AssertionError('index.json should not be read again')
+    monkeypatch.setattr(other_db, '_read_from_file', fail)
+
+    with other_db.read_transaction():
+        assert other_db.query('mpileaks ^mpich2', installed=any) == []
+        other_db._check_ref_counts()
+
+    # A process that didn't read the database before gets the same result
+    new_db = spack.database.Database(install_db.root)
+    with new_db.read_transaction():
+        assert new_db.query(installed=any) == install_db.query(installed=any)
+        new_db._check_ref_counts()
+
+
+def test_journal_compaction(database, refresh_db_on_exit, monkeypatch):
+    """Ensure the journal is folded into a new snapshot when it grows."""
+    install_db = database.mock.db
+    monkeypatch.setattr(spack.database, '_journal_compaction_ratio', 0)
+    index_stat = spack.database._file_stat(install_db._index_path)
+
+    _mock_remove('mpileaks ^mpich2')
+
+    assert spack.database._file_stat(install_db._index_path) != index_stat
+    with open(install_db._journal_path) as f:
+        assert len(f.readlines()) == 1
+
+    new_db = spack.database.Database(install_db.root)
+    with new_db.read_transaction():
+        assert new_db.query('mpileaks ^mpich2', installed=any) == []
+        new_db._check_ref_counts()
+
+
+def test_incomplete_journal_entry(database, monkeypatch):
+    """Ensure an entry left incomplete by a dead writer is ignored, then
+    overwritten by the next writer."""
+    install_db = database.mock.db
+    monkeypatch.setattr(spack.database, '_journal_compaction_ratio', 100)
+    install_db.reindex(spack.store.layout)
+
+    spec = install_db.remove('mpileaks ^mpich')
+    with open(install_db._journal_path, 'a') as f:
+        f.write('[{"hash": "')
+
+    new_db = spack.database.Database(install_db.root)
+    with new_db.read_transaction():
+        assert new_db.query('mpileaks ^mpich', installed=any) == []
+
+    new_db.add(spec, spack.store.layout)
+    with open(install_db._journal_path) as f:
+        assert f.read().endswith(']\n')
+
+    with install_db.read_transaction():
+        assert len(install_db.query('mpileaks ^mpich')) == 1
+        install_db._check_ref_counts()
+
+
+def test_upgrade_from_snapshot_without_journal(
+        database, refresh_db_on_exit, monkeypatch):
+    """Ensure databases written before the journal are read without
+    reindexing, and are then written with the version that has one."""
+    install_db = database.mock.db
+    with open(install_db._index_path) as f:
+        index = sjson.load(f)
+    index['database']['version'] = '0.9.3'
+    del index['database']['generation']
+    with open(install_db._index_path, 'w') as f:
+        sjson.dump(index, f)
+    os.remove(install_db._journal_path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError('The database should not be reindexed')
+
+    new_db = spack.database.Database(install_db.root)
+    monkeypatch.setattr(new_db, 'reindex', fail)
+    with new_db.write_transaction():
+        assert len(new_db.query('mpileaks ^mpich')) == 1
+
+    with open(install_db._index_path) as f:
+        version = sjson.load(f)['database']['version']
+    assert version == str(spack.database._db_version)
+    assert os.path.exists(install_db._journal_path)
+
+
+def test_specs_are_built_lazily(database):
+    """Ensure reading the database doesn't build specs that aren't used."""
+    install_db = database.mock.db
+    new_db = spack.database.Database(install_db.root)
+
+    with new_db.read_transaction():
+        assert all(rec._spec is None for rec in new_db._data.values())
+
+        libelf = new_db.query_one('libelf')
+        built = [rec for rec in new_db._data.values()
+                 if rec._spec is not None]
+        assert [rec.spec for rec in built] == [libelf]
+
+        # Dependencies are built along with their dependents
+        mpileaks = new_db.query_one('mpileaks ^mpich')
+        deps = dict((s.name, s) for s in mpileaks.traverse())
+        assert deps['libelf'] is libelf
+
+        names = sorted(rec.name for rec in new_db._data.values())
+        assert names == sorted(
+            s.name for s in install_db.query(installed=any))
+
+
+def test_index_of_lazy_records(database):
+    """Ensure records are indexed the same whether their spec was built
+    or not."""
+    install_db = database.mock.db
+    new_db = spack.database.Database(install_db.root)
+
+    with new_db.read_transaction():
+        lazy_index = spack.database.QueryIndex(new_db._data)
+        for rec in new_db._data.values():
+            rec.spec
+        index = spack.database.QueryIndex(new_db._data)
+
+    for attr in ('by_name', 'by_compiler', 'by_variant', 'dependents',
+                 'unversioned', 'no_compiler'):
+        assert getattr(lazy_index, attr) == getattr(index, attr)
+
+    assert (dict((k, v[1]) for k, v in lazy_index.by_version.items()) ==
+            dict((k, v[1]) for k, v in index.by_version.items()))
@@ -0,0 +1,182 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import hashlib
+import os
+
+import pytest
+
+import spack
+import spack.fetch_strategy as fs
+import spack.host_stats
+import spack.util.crypto as crypto
+import spack.util.download as download
+from spack.stage import Stage
+
+
+@pytest.fixture()
+def connections(monkeypatch):
+    """Empty connection pool, closed at the end of the test."""
+    pool = download.ConnectionPool()
+    monkeypatch.setattr(download, 'connections', pool)
+    yield pool
+    pool.clear()
+
+
+@pytest.fixture()
+def served_files(mock_http_server):
+    """Three files of 3MB served by the mock server, by name."""
+    files = {}
+    for name in ('a.tar.gz', 'b.tar.gz', 'c.tar.gz'):
+        data = os.urandom(3 * 2 ** 20)
+        with open(os.path.join(mock_http_server.root, name), 'wb') as f:
+            f.write(data)
+        files[name] = data
+    return files
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_download_reuses_connections(
+        mock_http_server, served_files, connections, tmpdir):
+    for name, data in served_files.items():
+        path = str(tmpdir.join(name))
+        hasher = hashlib.sha256()
+        download.download(
+            mock_http_server.url + '/' + name, path, hasher=hasher)
+        assert read(path) == data
+        assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+
+    assert mock_http_server.connections == 1
+
+
+def test_download_resumes_partial_file(
+        mock_http_server, served_files, connections, tmpdir):
+    data = served_files['a.tar.gz']
+    path = str(tmpdir.join('a.tar.gz.part'))
+    with open(path, 'wb') as f:
+        f.write(data[:1000])
+
+    hasher = hashlib.md5()
+    download.download(mock_http_server.url + '/a.tar.gz', path, hasher)
+    assert read(path) == data
+    assert hasher.hexdigest() == hashlib.md5(data).hexdigest()
+
+    _, headers = mock_http_server.requests[-1]
+    assert headers['range'] == 'bytes=1000-'
+
+
+def test_download_restarts_invalid_partial_file(
+        mock_http_server, served_files, connections, tmpdir):
+    data = served_files['a.tar.gz']
+    path = str(tmpdir.join('a.tar.gz.part'))
+    with open(path, 'wb') as f:
+        f.write(data + b'garbage')
+
+    download.download(mock_http_server.url + '/a.tar.gz', path)
+    assert read(path) == data
+
+
+def test_download_follows_redirects(
+        mock_http_server, served_files, connections, tmpdir):
+    path = str(tmpdir.join('b.tar.gz'))
+    download.download(mock_http_server.url + '/redirect/b.tar.gz', path)
+    assert read(path) == served_files['b.tar.gz']
+    assert mock_http_server.connections == 1
+
+
+def test_download_errors(mock_http_server, connections, tmpdir):
+    path = str(tmpdir.join('missing.tar.gz'))
+    with pytest.raises(download.HTTPError) as e:
+        download.download(mock_http_server.url + '/missing.tar.gz', path)
+    assert e.value.code == 404
+
+    with pytest.raises(download.HTTPError) as e:
+        download.download('file://' + path + '.nope', path)
+    assert e.value.code == 404
+
+
+def test_download_file_url(mock_archive, tmpdir):
+    path = str(tmpdir.join('archive.tar.gz'))
+    hasher = hashlib.sha1()
+    download.download(mock_archive.url, path, hasher)
+    assert read(path) == read(mock_archive.archive_file)
+    assert hasher.hexdigest() == crypto.checksum(
+        hashlib.sha1, mock_archive.archive_file)
+
+
+def test_fetch_checks_archive_while_downloading(
+        mock_http_server, served_files, connections, misc_cache,
+        monkeypatch):
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+    data = served_files['c.tar.gz']
+    url = mock_http_server.url + '/c.tar.gz'
+
+    def no_checksum(*args, **kwargs):
+        raise AssertionError('The archive is read again')
+
+    monkeypatch.setattr(crypto, 'checksum', no_checksum)
+
+    fetcher = fs.URLFetchStrategy(url, hashlib.sha256(data).hexdigest())
+    with Stage(fetcher) as stage:
+        stage.fetch()
+        stage.check()
+        assert read(stage.archive_file) == data
+
+    fetcher = fs.URLFetchStrategy(url, hashlib.sha256(b'').hexdigest())
+    with Stage(fetcher) as stage:
+        stage.fetch()
+        with pytest.raises(fs.ChecksumError):
+            stage.check()
+
+
+@pytest.mark.parametrize('method', ['urllib', 'curl'])
+def test_fetch_missing_url(
+        mock_http_server, connections, misc_cache, monkeypatch, method):
+    monkeypatch.setattr(spack, 'url_fetch_method', method)
+    fetcher = fs.URLFetchStrategy(mock_http_server.url + '/missing.tar.gz')
+    with Stage(fetcher) as stage:
+        with pytest.raises(fs.URLNotFoundError):
+            fetcher.fetch()
+        assert not os.listdir(stage.path)
+
+
+@pytest.mark.parametrize('method', ['urllib', 'curl'])
+def test_fetch_server_error(
+        mock_http_server, connections, misc_cache, monkeypatch, method):
+    monkeypatch.setattr(spack, 'url_fetch_method', method)
+    failures = []
+    monkeypatch.setattr(spack.host_stats, 'record_failure', failures.append)
+
+    # Server errors count against the server, unlike missing archives
+    url = mock_http_server.url + '/status/503'
+    fetcher = fs.URLFetchStrategy(url)
+    with Stage(fetcher):
+        with pytest.raises(fs.FailedDownloadError) as e:
+            fetcher.fetch()
+        assert not isinstance(e.value, fs.URLNotFoundError)
+    assert failures == [url]
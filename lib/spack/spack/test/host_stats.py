@@ -0,0 +1,125 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+import socket
+import time
+
+import pytest
+
+import spack
+import spack.config
+import spack.fetch_strategy as fs
+import spack.host_stats as host_stats
+from spack.stage import Stage
+
+
+@pytest.fixture()
+def dead_url():
+    """URL of a local port on which nothing listens."""
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return 'http://127.0.0.1:%d' % port
+
+
+def set_stats(**kwargs):
+    """Records stats for the hosts of the URLs given as keyword names."""
+    def record(stats):
+        for host, (latency, throughput, failures) in kwargs.items():
+            s = stats['http://%s' % host]
+            s.latency, s.throughput = latency, throughput
+            s.last_probe = time.time()
+            for _ in range(failures):
+                s.record_failure()
+    host_stats.update(record)
+
+
+def test_rank(misc_cache):
+    set_stats(fast=(0.01, 1e8, 0), slow=(0.5, 1e5, 0), dead=(0.01, 1e8, 1))
+    urls = ['http://%s/a.tar.gz' % h
+            for h in ('new1', 'dead', 'slow', 'fast', 'new2')]
+    good, failing = host_stats.rank(urls, probe=False)
+    assert good == ['http://fast/a.tar.gz', 'http://slow/a.tar.gz',
+                    'http://new1/a.tar.gz', 'http://new2/a.tar.gz']
+    assert failing == ['http://dead/a.tar.gz']
+
+
+def test_failure_backoff():
+    stats = host_stats.HostStats()
+    now = time.time()
+    stats.record_failure(now)
+    assert stats.failing(now + host_stats.failure_backoff - 1)
+    assert not stats.failing(now + host_stats.failure_backoff + 1)
+
+    # Each failure in a row doubles the backoff
+    stats.record_failure(now)
+    assert stats.failing(now + host_stats.failure_backoff + 1)
+
+    stats.record_probe(0.1, now)
+    assert not stats.failing(now)
+
+
+def test_probe(mock_http_server, dead_url, misc_cache):
+    assert host_stats.probe(mock_http_server.url) is not None
+    assert host_stats.probe(dead_url) is None
+
+    stats = {}
+    host_stats.probe_stale([mock_http_server.url, dead_url], stats)
+    assert not stats[mock_http_server.url].failing()
+    assert stats[dead_url].failing()
+    assert host_stats.read()[dead_url].failures == 1
+
+    # Hosts probed recently are not probed again
+    host_stats.probe_stale([dead_url], stats)
+    assert host_stats.read()[dead_url].failures == 1
+
+
+def test_fetch_skips_dead_mirror(
+        mock_http_server, dead_url, misc_cache, monkeypatch):
+    os.mkdir(os.path.join(mock_http_server.root, 'pkg'))
+    with open(os.path.join(mock_http_server.root, 'pkg', 'a.tar.gz'),
+              'wb') as f:
+        f.write(b'archive')
+
+    mirrors = {'dead': dead_url, 'live': mock_http_server.url}
+    get_config = spack.config.get_config
+    monkeypatch.setattr(
+        spack.config, 'get_config',
+        lambda section, *args: (mirrors if section == 'mirrors'
+                                else get_config(section, *args)))
+    monkeypatch.setattr(spack, 'url_fetch_method', 'urllib')
+
+    fetcher = fs.URLFetchStrategy(mock_http_server.url + '/missing.tar.gz')
+    with Stage(fetcher, mirror_path='pkg/a.tar.gz') as stage:
+        stage.fetch()
+        assert stage.fetcher.url == mock_http_server.url + '/pkg/a.tar.gz'
+
+    # The dead mirror was probed, but never used
+    stats = host_stats.read()
+    assert stats[dead_url].failures == 1
+    assert stats[mock_http_server.url].throughput > 0
+    assert [path for path, _ in mock_http_server.requests] == [
+        '/pkg/a.tar.gz']
@@ -22,18 +22,38 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import argparse
+import multiprocessing
+import os
+import time
+
 import pytest
 import spack
+import spack.cmd.install_times
+import spack.directory_layout
+import spack.installer
+import spack.modules
+import spack.modules.common
+import spack.prefetch
 import spack.store
+import spack.util.spack_json as sjson
+from llnl.util.filesystem import join_path, touch
+from llnl.util.lock import Lock
 from spack.database import Database
 from spack.directory_layout import YamlDirectoryLayout
 from spack.fetch_strategy import URLFetchStrategy, FetchStrategyComposite
 from spack.spec import Spec
+from spack.util.timer import Timer
 
 
 @pytest.fixture()
-def install_mockery(tmpdir, config, builtin_mock):
+def install_mockery(tmpdir, config, builtin_mock, monkeypatch):
     """Hooks a fake install directory and a fake db into Spack."""
+    # Write module files of installed specs in the fake directory too,
+    # or they are found by the module file tests.
+    roots = dict((name, str(tmpdir.join('modules', name)))
+                 for name in spack.modules.module_types)
+    monkeypatch.setattr(spack.modules.common, 'roots', roots)
     layout = spack.store.layout
     db = spack.store.db
     # Use a fake install directory to avoid conflicts bt/w
@@ -102,3 +122,226 @@ def test_failing_build(mock_archive):
     pkg = spec.package
     with pytest.raises(spack.build_environment.ChildError):
         pkg.do_install()
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_concurrent_install():
+    spec = Spec('mpileaks').concretized()
+
+    pkg = spec.package
+    try:
+        pkg.do_install(
+            fake=True, explicit=True, concurrent_builds=3, make_jobs=6)
+        for s in spec.traverse():
+            assert s.package.installed
+            assert spack.store.db.get_record(s).explicit == (s is spec)
+    except Exception:
+        for s in spec.traverse():
+            s.package.remove_prefix()
+        raise
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_concurrent_install_failing_dependency(monkeypatch):
+    spec = Spec('mpileaks').concretized()
+
+    def _fail(self):
+        raise spack.build_environment.InstallError('Mock failure')
+
+    monkeypatch.setattr(
+        type(spec['libdwarf'].package), 'do_fake_install', _fail)
+
+    with pytest.raises(spack.build_environment.ChildError):
+        spec.package.do_install(fake=True, concurrent_builds=3)
+
+    # Builds that were not waiting on the failure complete, the others
+    # are not started
+    assert spec['libelf'].package.installed
+    assert not spec['libdwarf'].package.installed
+    assert not spec['dyninst'].package.installed
+    assert not spec.package.installed
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_coordinated_install_waits_for_other_process(monkeypatch):
+    spec = Spec('mpileaks').concretized()
+    libelf = spec['libelf']
+    monkeypatch.setattr(spack.installer, 'lock_poll_interval', 0.1)
+
+    claimed = multiprocessing.Event()
+
+    def other_install():
+        # Another process claims libelf and installs it
+        spack.installer.claim(libelf)
+        claimed.set()
+        time.sleep(0.5)
+        libelf.package.do_install(fake=True)
+        spack.installer.release(libelf)
+
+    other = multiprocessing.Process(target=other_install)
+    other.start()
+    claimed.wait()
+
+    def _fail(self):
+        raise spack.build_environment.InstallError('Installed twice')
+
+    # Building libelf here would fail: it must be installed by the other
+    # process, while the packages that don't need it are built.
+    monkeypatch.setattr(type(libelf.package), 'do_fake_install', _fail)
+    try:
+        spec.package.do_install(fake=True, coordinate=True)
+    finally:
+        other.join()
+
+    for s in spec.traverse():
+        assert s.package.installed
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_coordinated_install_waits_for_root(monkeypatch):
+    spec = Spec('libelf').concretized()
+    monkeypatch.setattr(spack.installer, 'lock_poll_interval', 0.1)
+
+    claimed = multiprocessing.Event()
+
+    def other_install():
+        # Another process claims the package for longer than it takes
+        # to time out on the read lock of its prefix
+        spack.installer.claim(spec)
+        claimed.set()
+        time.sleep(1.0)
+        spec.package.do_install(fake=True)
+        spack.installer.release(spec)
+
+    other = multiprocessing.Process(target=other_install)
+    other.start()
+    claimed.wait()
+
+    acquire_read = Lock.acquire_read
+    monkeypatch.setattr(Lock, 'acquire_read',
+                        lambda self, timeout=None: acquire_read(self, 0.2))
+
+    def _fail(self):
+        raise spack.build_environment.InstallError('Installed twice')
+
+    monkeypatch.setattr(type(spec.package), 'do_fake_install', _fail)
+    try:
+        spec.package.do_install(fake=True, coordinate=True)
+    finally:
+        other.join()
+
+    assert spec.package.installed
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_install_times(mock_archive):
+    spec = Spec('trivial-install-test-package').concretized()
+    pkg = spec.package
+    fake_fetchify(mock_archive.url, pkg)
+
+    try:
+        pkg.do_install()
+        timer = Timer.read_json(spack.store.layout.build_times_path(spec))
+    finally:
+        pkg.remove_prefix()
+
+    names = [name for name, _ in timer.phases]
+    for name in ('fetch', 'expand', 'install', 'log', 'post_install:sbang'):
+        assert name in names
+    # The parent process records the database write last
+    assert names[-1] == 'database'
+    assert timer.total >= sum(seconds for _, seconds in timer.phases)
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_install_times_of_prefetched_package(mock_archive, monkeypatch):
+    spec = Spec('trivial-install-test-package').concretized()
+    pkg = spec.package
+    fake_fetchify(mock_archive.url, pkg)
+    monkeypatch.setattr(spack.prefetch, 'wait',
+                        lambda spec: [('fetch', 100.0), ('expand', 10.0)])
+
+    try:
+        pkg.do_install()
+        timer = Timer.read_json(spack.store.layout.build_times_path(spec))
+    finally:
+        pkg.remove_prefix()
+
+    # The steps measured by the prefetcher are part of the build
+    assert timer.seconds('fetch') >= 100.0
+    assert timer.seconds('expand') >= 10.0
+    assert timer.total >= 110.0
+
+
+def test_timer_read_from_file(tmpdir, monkeypatch):
+    path = str(tmpdir.join('times.json'))
+    timer = Timer()
+    timer.add('install', 2.0)
+    timer.write_json(path)
+    with open(path) as f:
+        total = sjson.load(f)['total']
+
+    # Time passes, but a timer read from a file doesn't run
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 100)
+    timer = Timer.read_json(path)
+    assert timer.total == total
+
+    # Only the steps added to it extend its total
+    timer.add('database', 1.0)
+    timer.write_json(path)
+    assert Timer.read_json(path).total == total + 1.0
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_install_times_command(capsys):
+    spec = Spec('mpileaks').concretized()
+    spec.package.do_install(fake=True)
+
+    parser = argparse.ArgumentParser()
+    spack.cmd.install_times.setup_parser(parser)
+
+    spack.cmd.install_times.install_times(parser, parser.parse_args([]))
+    out, _ = capsys.readouterr()
+    lines = out.strip().split('\n')
+    assert lines[0].split()[0] == 'phase'
+    assert lines[-1].split()[:2] == ['total', str(len(list(spec.traverse())))]
+    assert 'database' in out
+
+    args = parser.parse_args(['--packages', '-n', '2'])
+    spack.cmd.install_times.install_times(parser, args)
+    out, _ = capsys.readouterr()
+    assert len(out.strip().split('\n')) == 3
+
+    args = parser.parse_args(['--json', 'libelf'])
+    spack.cmd.install_times.install_times(parser, args)
+    out, _ = capsys.readouterr()
+    data = sjson.load(out)
+    assert data['installs'] == 1
+    assert 'database' in [p['name'] for p in data['phases']]
+
+
+@pytest.mark.usefixtures('install_mockery')
+def test_activate_extensions_at_once():
+    spec = Spec('extension2').concretized()
+    spec.package.do_install(fake=True)
+    extendee = spec['extendee']
+    extension1 = spec['extension1']
+
+    # Conflicts between the extensions are found before linking any
+    touch(join_path(spec.prefix.bin, 'extension1'))
+    with pytest.raises(spack.package.ExtensionConflictError):
+        extendee.package.do_activate_extensions([spec])
+    assert not os.path.exists(join_path(extendee.prefix.bin, 'extension2'))
+    assert not spack.store.layout.extension_map(extendee)
+
+    # Both extensions are activated by activating extension2
+    os.remove(join_path(spec.prefix.bin, 'extension1'))
+    extendee.package.do_activate_extensions([spec])
+    for s in (spec, extension1):
+        assert s.package.activated
+        link = join_path(extendee.prefix.bin, s.name)
+        assert os.path.realpath(link) == join_path(s.prefix.bin, s.name)
+
+    with pytest.raises(spack.directory_layout.ExtensionAlreadyInstalledError):
+        extendee.package.do_activate_extensions([spec])
@@ -150,3 +150,21 @@ def test_ignore(stage, link_tree):
 
         assert os.path.isfile('source/.spec')
         assert os.path.isfile('dest/.spec')
+
+
+def test_find_conflict_with_index(stage, link_tree):
+    with working_dir(stage.path):
+        touchp('other/c/d/e/7')
+        touchp('other/f/8')
+        other = LinkTree('other')
+
+        # Trees checked with the same index conflict with each other
+        index = {}
+        assert link_tree.find_conflict('dest', index=index) is None
+        assert other.find_conflict('dest', index=index) == 'dest/c/d/e/7'
+        assert not os.path.exists('dest')
+
+        # But directories can be shared
+        os.remove('other/c/d/e/7')
+        assert other.find_conflict('dest', index=index) is None
+        assert 'dest/f/8' in index
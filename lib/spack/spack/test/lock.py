@@ -244,6 +244,40 @@ class LockTest(unittest.TestCase):
             self.acquire_read(10, 5),
             self.timeout_write(3, 10), self.timeout_write(5, 1))
 
+    #
+    # Test that a timeout of 0 tries to take the lock once.
+    #
+    def test_write_lock_no_wait(self):
+        def try_write(barrier):
+            lock = Lock(self.lock_path)
+            barrier.wait()  # wait for lock acquire in first process
+            self.assertRaises(LockError, lock.acquire_write, 0)
+            barrier.wait()
+
+        self.multiproc_test(self.acquire_write(), try_write)
+
+        lock = Lock(self.lock_path)
+        self.assertTrue(lock.acquire_write(0))
+        lock.release_write()
+
+    #
+    # Test that releasing a lock doesn't release the other locks of the
+    # same process on the same file.
+    #
+    def test_release_keeps_other_ranges(self):
+        def acquire_and_release(barrier):
+            lock_1 = Lock(self.lock_path, 0, 1)
+            lock_2 = Lock(self.lock_path, 1, 1)
+            lock_1.acquire_write()
+            lock_2.acquire_write()
+            lock_2.release_write()
+            barrier.wait()
+            barrier.wait()  # hold lock_1 until timeout in other procs.
+
+        self.multiproc_test(
+            acquire_and_release,
+            self.timeout_write(0, 1), self.timeout_read(0, 1))
+
     #
     # Test that read can be upgraded to write.
     #
@@ -0,0 +1,138 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Tests for the package metadata index."""
+import os
+import shutil
+
+import pytest
+from six import StringIO
+
+import spack
+import spack.repository
+from spack.file_cache import FileCache
+from spack.metadata_index import MetadataIndex
+from spack.repository import Repo, create_repo
+
+
+@pytest.fixture()
+def small_repo(tmpdir):
+    """A repository with a few packages copied from the mock repo."""
+    root, _ = create_repo(str(tmpdir.join('repo')), 'metadata_test')
+    for name in ('libdwarf', 'libelf', 'mpich'):
+        pkg_dir = os.path.join(root, 'packages', name)
+        os.mkdir(pkg_dir)
+        shutil.copy(os.path.join(
+            spack.mock_packages_path, 'packages', name, 'package.py'), pkg_dir)
+    return root
+
+
+def test_metadata_matches_packages(builtin_mock, misc_cache):
+    repo = Repo(spack.mock_packages_path)
+    for name in repo.all_package_names():
+        pkg = repo.get(name)
+        metadata = repo.package_metadata(name)
+
+        assert metadata.name == pkg.name
+        assert metadata.homepage == getattr(pkg, 'homepage', None)
+        assert metadata.build_system_class == pkg.build_system_class
+        assert metadata.format_doc(indent=2) == pkg.format_doc(indent=2)
+        assert sorted(metadata.versions) == sorted(pkg.versions)
+        assert metadata.phases == pkg.phases
+        assert metadata.provided == pkg.provided
+
+        assert sorted(metadata.variants) == sorted(pkg.variants)
+        for vname, variant in pkg.variants.items():
+            assert metadata.variants[vname].default == variant.default
+
+        for deptype in spack.alldeps:
+            assert (sorted(metadata.dependencies_of_type(deptype)) ==
+                    sorted(pkg.dependencies_of_type(deptype)))
+
+
+def test_json_round_trip(builtin_mock, misc_cache):
+    index = Repo(spack.mock_packages_path).metadata_index
+
+    ostream = StringIO()
+    index.to_json(ostream)
+
+    istream = StringIO(ostream.getvalue())
+    assert MetadataIndex.from_json(istream) == index
+
+
+def test_unreadable_index_is_empty():
+    assert not MetadataIndex.from_json(StringIO('{"metadata')).packages
+    assert not MetadataIndex.from_json(
+        StringIO('{"metadata_index": {"version": 0}}')).packages
+
+
+def test_only_changed_packages_are_imported(misc_cache, small_repo):
+    repo = Repo(small_repo)
+    assert repo.package_metadata('libelf').dependencies == {}
+    assert sorted(repo._modules) == ['libdwarf', 'libelf', 'mpich']
+
+    # Nothing changed: answered from the cache without importing
+    repo = Repo(small_repo)
+    assert 'libelf' in repo.package_metadata('libdwarf').dependencies
+    assert not repo._modules
+
+    # Only the modified package is imported again
+    pkg_file = repo.filename_for_package_name('libelf')
+    mtime = os.stat(pkg_file).st_mtime + 10
+    os.utime(pkg_file, (mtime, mtime))
+    mtime = os.stat(pkg_file).st_mtime
+
+    repo = Repo(small_repo)
+    assert repo.package_metadata('libdwarf').name == 'libdwarf'
+    assert sorted(repo._modules) == ['libelf']
+    assert repo.package_metadata('libelf').mtime == mtime
+
+    # Removed packages are dropped from the index
+    shutil.rmtree(repo.dirname_for_package_name('mpich'))
+
+    repo = Repo(small_repo)
+    assert 'mpich' not in repo.metadata_index
+    assert not repo._modules
+    with pytest.raises(spack.repository.UnknownPackageError):
+        repo.package_metadata('mpich')
+
+
+def test_parallel_update(misc_cache, small_repo, parallel_loader,
+                         monkeypatch, tmpdir):
+    repo = Repo(small_repo)
+    index = repo.metadata_index
+
+    # Packages were imported by the workers
+    assert sorted(index.packages) == ['libdwarf', 'libelf', 'mpich']
+    assert not repo._modules
+
+    monkeypatch.setattr(spack.repository, '_loader_processes', 1)
+    monkeypatch.setattr(spack, 'misc_cache', FileCache(str(tmpdir)))
+    assert Repo(small_repo).metadata_index == index
+
+
+def test_possible_dependencies(builtin_mock):
+    mpileaks = spack.repo.get('mpileaks')
+    assert mpileaks.possible_dependencies() == set([
+        'callpath', 'dyninst', 'libdwarf', 'libelf', 'mpileaks'])
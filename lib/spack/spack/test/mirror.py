@@ -23,6 +23,7 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 import filecmp
+import hashlib
 import os
 import pytest
 
@@ -30,6 +31,7 @@ from llnl.util.filesystem import join_path
 
 import spack
 import spack.mirror
+import spack.util.crypto
 import spack.util.executable
 from spack.spec import Spec
 from spack.stage import Stage
@@ -161,3 +163,64 @@ class TestMirror(object):
         set_up_package('trivial-install-test-package', mock_archive, 'url')
         check_mirror()
         repos.clear()
+
+
+@pytest.mark.usefixtures('config', 'refresh_builtin_mock')
+def test_mirror_create_is_incremental(mock_archive, tmpdir, monkeypatch):
+    spec = Spec('trivial-install-test-package').concretized()
+    pkg = spack.repo.get(spec)
+    v = next(iter(pkg.versions))
+    md5 = spack.util.crypto.checksum(hashlib.md5, mock_archive.archive_file)
+    monkeypatch.setitem(
+        pkg.versions, v, {'url': mock_archive.url, 'md5': md5})
+
+    mirror_root = str(tmpdir.join('mirror'))
+    relative_path = spack.mirror.mirror_archive_path(spec, pkg.fetcher)
+    archive_path = os.path.join(mirror_root, relative_path)
+
+    def create():
+        return spack.mirror.create(
+            mirror_root, ['trivial-install-test-package'], jobs=2)
+
+    present, mirrored, error = create()
+    assert (len(present), len(mirrored), len(error)) == (0, 1, 0)
+    manifest = spack.mirror.read_manifest(mirror_root)
+    assert manifest[relative_path]['digest'] == md5
+    assert spack.util.crypto.checksum(hashlib.md5, archive_path) == md5
+
+    # Without the manifest, archives are verified by their checksum
+    os.remove(os.path.join(mirror_root, spack.mirror.manifest_name))
+    present, mirrored, error = create()
+    assert (len(present), len(mirrored), len(error)) == (1, 0, 0)
+
+    # Archives that changed are checked, and fetched again if they are
+    # corrupt
+    # (The archive may be a hard link to the mock archive: replace it,
+    # don't write into it)
+    os.remove(archive_path)
+    with open(archive_path, 'w') as f:
+        f.write('corrupt')
+    present, mirrored, error = create()
+    assert (len(present), len(mirrored), len(error)) == (0, 1, 0)
+    assert spack.util.crypto.checksum(hashlib.md5, archive_path) == md5
+
+    # The manifest shows the archive is current without reading it
+    def check(self, filename):
+        raise AssertionError('%s was read again' % filename)
+
+    monkeypatch.setattr(spack.util.crypto.Checker, 'check', check)
+    present, mirrored, error = create()
+    assert (len(present), len(mirrored), len(error)) == (1, 0, 0)
+
+
+def test_invalid_manifest_is_ignored(tmpdir):
+    mirror_root = str(tmpdir)
+    path = tmpdir.join(spack.mirror.manifest_name)
+    for content in ('{"truncated', '["not", "an", "object"]'):
+        path.write(content)
+        assert spack.mirror.read_manifest(mirror_root) == {}
+
+    spack.mirror.write_manifest(mirror_root, {'a.tar.gz': {'size': 1}})
+    assert spack.mirror.read_manifest(mirror_root) == {
+        'a.tar.gz': {'size': 1}}
+    assert tmpdir.listdir() == [path]
@@ -23,7 +23,11 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 
+import spack.build_environment
+import spack.modules
 import spack.modules.common
+import spack.package
+from spack.spec import Spec
 
 
 def test_update_dictionary_extending_list():
@@ -51,3 +55,46 @@ def test_update_dictionary_extending_list():
     assert len(target['foo']) == 4
     assert len(target['bar']) == 4
     assert target['baz'] == 'foobaz'
+
+
+def test_environment_modifications_are_cached(
+        builtin_mock, config, monkeypatch):
+    """Module files of different types share the modifications packages
+    make to the environment, until they are invalidated.
+    """
+    calls = []
+
+    def setup_dependent_environment(self, spack_env, run_env, dependent):
+        calls.append(self.name)
+        run_env.set('FROM_' + self.name.upper(), dependent.name)
+
+    monkeypatch.setattr(spack.package.PackageBase,
+                        'setup_dependent_environment',
+                        setup_dependent_environment)
+    cache = spack.build_environment
+    cache.invalidate_environment_cache()
+
+    try:
+        spec = Spec('mpileaks').concretized()
+        tcl = spack.modules.TclModulefileWriter(spec)
+        first = dict((x.name, x.value) for _, x in
+                     tcl.context.environment_modifications)
+        assert first['FROM_CALLPATH'] == 'mpileaks'
+        assert sorted(calls) == sorted(
+            x.name for x in spec.traverse(root=False, deptype=('link',)))
+
+        # The modifications were cached, and not changed by the first
+        # module file
+        del calls[:]
+        dotkit = spack.modules.DotkitModulefileWriter(spec)
+        second = dict((x.name, x.value) for _, x in
+                      dotkit.context.environment_modifications)
+        assert calls == []
+        assert second == first
+
+        # Only the invalidated package computes them again
+        cache.invalidate_environment_cache(spec['callpath'])
+        dotkit.context.environment_modifications
+        assert calls == ['callpath']
+    finally:
+        cache.invalidate_environment_cache()
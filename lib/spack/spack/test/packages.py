@@ -60,6 +60,19 @@ class TestPackage(object):
             'package.py'
         )
 
+    def test_map_packages(self, parallel_loader):
+        names = spack.repo.map_packages(lambda pkg: pkg.name)
+        assert names == dict((n, n) for n in spack.repo.all_package_names())
+
+    def test_map_packages_error(self, parallel_loader):
+        def check(pkg):
+            if pkg.name == 'mpich':
+                raise ValueError(pkg.name)
+
+        # The failure is raised again by the parent process
+        with pytest.raises(ValueError):
+            spack.repo.map_packages(check)
+
     def test_package_class_names(self):
         assert 'Mpich' == mod_to_class('mpich')
         assert 'PmgrCollective' == mod_to_class('pmgr_collective')
@@ -0,0 +1,144 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+
+import pytest
+
+import llnl.util.tty as tty
+
+import spack
+import spack.prefetch
+from spack.fetch_strategy import URLFetchStrategy, FetchStrategyComposite
+from spack.prefetch import Prefetcher
+from spack.spec import Spec
+
+
+@pytest.fixture()
+def dag(config, builtin_mock, mock_archive, monkeypatch):
+    """Concrete DAG whose packages are all fetched from the mock archive,
+    without checksums.
+    """
+    monkeypatch.setattr(spack, 'do_checksum', False)
+    spec = Spec('cmake-client').concretized()
+    for s in spec.traverse():
+        fetcher = FetchStrategyComposite()
+        fetcher.append(URLFetchStrategy(mock_archive.url))
+        s.package.fetcher = fetcher
+        s.package.stage = None
+
+    yield spec
+
+    for s in spec.traverse():
+        s.package.stage.destroy()
+
+
+def join_workers(prefetcher):
+    """Waits until the workers are done with all the packages."""
+    for worker in prefetcher._workers:
+        worker.join()
+
+
+def test_prefetch_stages_sources(dag):
+    with Prefetcher(dag.traverse(), jobs=2) as prefetcher:
+        assert spack.prefetch.active is prefetcher
+        join_workers(prefetcher)
+        for s in dag.traverse():
+            assert prefetcher.wait(s)
+            assert os.path.isdir(s.package.stage.source_path)
+
+    assert spack.prefetch.active is None
+    assert [s.name for s in prefetcher.specs] == [
+        s.name for s in dag.traverse()]
+
+
+def test_prefetch_measures_steps(dag):
+    with Prefetcher([dag], jobs=1) as prefetcher:
+        join_workers(prefetcher)
+        names = [name for name, _ in spack.prefetch.wait(dag)]
+        assert 'fetch' in names
+        assert 'expand' in names
+
+    # Packages that were not prefetched have no timings
+    assert spack.prefetch.wait(dag) == []
+
+
+def test_nested_prefetcher_does_nothing(dag):
+    with Prefetcher(dag.traverse(), jobs=2) as prefetcher:
+        with Prefetcher(dag.traverse(), jobs=2) as nested:
+            assert spack.prefetch.active is prefetcher
+            assert not nested.specs
+            assert not nested.wait(dag)
+        assert spack.prefetch.active is prefetcher
+
+
+def test_taken_package_is_not_prefetched(dag):
+    prefetcher = Prefetcher([dag], jobs=1)
+    prefetcher.specs = [dag]
+    prefetcher._index = {dag.dag_hash(): 0}
+
+    # Pretend a worker is running, and the build took the package first
+    prefetcher._workers = [None]
+    prefetcher._states = [spack.prefetch._queued]
+    prefetcher._condition = _NoCondition()
+    assert not prefetcher.wait(dag)
+    assert prefetcher._states == [spack.prefetch._taken]
+
+
+def test_failed_prefetch_is_not_an_error(dag):
+    def fail(*args, **kwargs):
+        raise spack.fetch_strategy.FetchError('Mock failure')
+
+    dag.package.do_stage = fail
+    with Prefetcher([dag], jobs=1) as prefetcher:
+        join_workers(prefetcher)
+        assert prefetcher._states[0] == spack.prefetch._failed
+        assert not prefetcher.wait(dag)
+
+
+def test_failed_prefetch_is_reported_in_debug_mode(dag, capfd, monkeypatch):
+    def fail(*args, **kwargs):
+        raise spack.fetch_strategy.FetchError('Mock failure')
+
+    dag.package.do_stage = fail
+    monkeypatch.setattr(tty, '_debug', True)
+    with Prefetcher([dag], jobs=1) as prefetcher:
+        join_workers(prefetcher)
+    _, err = capfd.readouterr()
+    assert 'Traceback' in err
+    assert 'Mock failure' in err
+
+
+def test_no_jobs_disables_prefetching(dag):
+    with Prefetcher(dag.traverse(), jobs=0) as prefetcher:
+        assert spack.prefetch.active is None
+        assert not prefetcher.wait(dag)
+
+
+class _NoCondition(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
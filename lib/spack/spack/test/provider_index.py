@@ -40,6 +40,7 @@ Tests assume that mock packages provide this::
 from six import StringIO
 
 import spack
+import spack.repository
 from spack.provider_index import ProviderIndex
 from spack.spec import Spec
 
@@ -92,3 +93,12 @@ def test_copy(builtin_mock):
     p = ProviderIndex(spack.repo.all_package_names())
     q = p.copy()
     assert p == q
+
+
+def test_parallel_update(builtin_mock, misc_cache, parallel_loader):
+    repo = spack.repository.Repo(spack.mock_packages_path)
+    names = ['builtin.mock.%s' % n for n in repo.all_package_names()]
+
+    serial = ProviderIndex.from_yaml(
+        spack.repository._index_providers(names))
+    assert repo.provider_index == serial
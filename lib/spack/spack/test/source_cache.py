@@ -0,0 +1,152 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Tests for the source cache, spack.fetch_strategy.FsCache."""
+import argparse
+import os
+
+import pytest
+
+import spack
+import spack.cmd.clean
+import spack.config
+import spack.schema.config
+import spack.util.spack_yaml as syaml
+from spack.fetch_strategy import FsCache
+from spack.util.string import parse_size
+
+
+class MockFetcher(object):
+    cachable = True
+
+    def __init__(self, data):
+        self.data = data
+
+    def archive(self, destination):
+        with open(destination, 'w') as f:
+            f.write(self.data)
+
+
+@pytest.fixture()
+def source_cache(tmpdir, monkeypatch):
+    cache = FsCache(str(tmpdir.join('cache')))
+    monkeypatch.setattr(spack, 'fetch_cache', cache)
+    return cache
+
+
+def set_last_use(cache, path, atime):
+    path = os.path.join(cache.root, path)
+    os.utime(path, (atime, os.stat(path).st_mtime))
+
+
+def paths(cache):
+    return sorted(os.path.relpath(p, cache.root)
+                  for _, _, ps in cache.archives() for p in ps)
+
+
+def test_store_dedup(source_cache):
+    source_cache.dedup = True
+    source_cache.store(MockFetcher('same'), 'a/a-1.0.tar.gz')
+    source_cache.store(MockFetcher('same'), 'b/b-resource-1.0.tar.gz')
+    source_cache.store(MockFetcher('other'), 'a/a-2.0.tar.gz')
+
+    archives = source_cache.archives()
+    assert len(archives) == 2
+    assert source_cache.size() == len('same') + len('other')
+
+    a = os.stat(os.path.join(source_cache.root, 'a/a-1.0.tar.gz'))
+    b = os.stat(os.path.join(source_cache.root, 'b/b-resource-1.0.tar.gz'))
+    assert (a.st_ino, a.st_nlink) == (b.st_ino, 3)
+
+    # Storing a name again replaces its link
+    source_cache.store(MockFetcher('new'), 'a/a-1.0.tar.gz')
+    with open(os.path.join(source_cache.root, 'a/a-1.0.tar.gz')) as f:
+        assert f.read() == 'new'
+    with open(os.path.join(source_cache.root, 'b/b-resource-1.0.tar.gz')) as f:
+        assert f.read() == 'same'
+
+
+def test_evict_least_recently_used(source_cache):
+    for i, name in enumerate(['a', 'b', 'c']):
+        source_cache.store(MockFetcher(name * 10), '%s/%s-1.0.tar.gz' % (
+            name, name))
+    set_last_use(source_cache, 'a/a-1.0.tar.gz', 3000)
+    set_last_use(source_cache, 'b/b-1.0.tar.gz', 1000)
+    set_last_use(source_cache, 'c/c-1.0.tar.gz', 2000)
+
+    assert source_cache.evict(0) == (0, 0)
+    assert source_cache.evict(25) == (1, 10)
+    assert paths(source_cache) == ['a/a-1.0.tar.gz', 'c/c-1.0.tar.gz']
+
+    # Empty directories are removed too
+    assert not os.path.exists(os.path.join(source_cache.root, 'b'))
+
+    # The archive that was just stored is kept
+    source_cache.limit = 15
+    source_cache.store(MockFetcher('d' * 10), 'd/d-1.0.tar.gz')
+    assert paths(source_cache) == ['d/d-1.0.tar.gz']
+
+
+def test_evict_dedup(source_cache):
+    source_cache.dedup = True
+    source_cache.store(MockFetcher('same'), 'a/a-1.0.tar.gz')
+    source_cache.store(MockFetcher('same'), 'b/b-1.0.tar.gz')
+    blob = [p for p in paths(source_cache) if p.startswith('.blobs')][0]
+
+    # Archives that are linked aren't removed, only unused ones
+    os.remove(os.path.join(source_cache.root, 'a/a-1.0.tar.gz'))
+    set_last_use(source_cache, blob, 1000)
+    assert source_cache.evict(0) == (0, 0)
+
+    os.remove(os.path.join(source_cache.root, 'b/b-1.0.tar.gz'))
+    assert source_cache.evict(0) == (1, len('same'))
+    assert paths(source_cache) == []
+
+
+def test_clean_source_cache(source_cache, capsys):
+    source_cache.store(MockFetcher('a' * 2048), 'a/a-1.0.tar.gz')
+    source_cache.store(MockFetcher('b' * 1024), 'b/b-1.0.tar.gz')
+    set_last_use(source_cache, 'a/a-1.0.tar.gz', 1000)
+
+    parser = argparse.ArgumentParser()
+    spack.cmd.clean.setup_parser(parser)
+    spack.cmd.clean.clean(parser, parser.parse_args(['--max-size', '1K']))
+    out, _ = capsys.readouterr()
+
+    assert paths(source_cache) == ['b/b-1.0.tar.gz']
+    assert 'now uses 1.0K' in out
+
+
+@pytest.mark.parametrize('limit', ['0', '10G', '10g', '1.5 mb', '"512"'])
+def test_source_cache_limit_schema(limit):
+    data = syaml.load('config:\n  source_cache_limit: %s\n' % limit)
+    spack.config.validate_section(data, spack.schema.config.schema)
+    assert parse_size(data['config']['source_cache_limit']) >= 0
+
+
+@pytest.mark.parametrize('limit', ['10X', '-1', 'G'])
+def test_invalid_source_cache_limit(limit):
+    data = syaml.load('config:\n  source_cache_limit: %s\n' % limit)
+    with pytest.raises(spack.config.ConfigFormatError):
+        spack.config.validate_section(data, spack.schema.config.schema)
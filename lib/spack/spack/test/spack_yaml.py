@@ -108,3 +108,41 @@ def test_yaml_aliases():
 
     # ensure no YAML aliases appear in syaml dumps.
     assert '*id' not in string
+
+
+@pytest.mark.parametrize('value', [
+    'foo', 'x86_64', 'builtin.mock', '1.2.3', '1.0', '12', '0x1f', '1_000',
+    '+1', '.inf', '2017-01-01', 'true', 'False', 'yes', 'off', 'null', '~',
+    '=', '<<', '', ' foo', 'foo ', 'foo bar', '-O3', '-', '- foo', '---x',
+    '...', 'a:b', 'a: b', ':a', 'a,b', '[a]', '{a}', 'a?', 'a #b', 'a#b',
+    '#a', '@a', 'a@b', '%gcc', '*a', '&a', '!a', '|a', '>a', '`a', '"a"',
+    "it's", "'a'", '/path/to/external_tool', 'a\tb', 'a\nb', u'caf\xe9',
+    'x' * 200, True, False, None, 0, -5, 1.5, (1, 2)
+])
+def test_dump_flow_scalars(value):
+    """Ensure dump_flow() writes scalars, and keys, like PyYAML."""
+    for data in ([value], {'key': value}, {'key': [value, value]}):
+        assert (syaml.dump_flow(data) ==
+                syaml.dump(data, default_flow_style=True, width=syaml.maxint))
+
+    if isinstance(value, str):
+        data = {value: 'value'}
+        assert (syaml.dump_flow(data) ==
+                syaml.dump(data, default_flow_style=True, width=syaml.maxint))
+
+
+def test_dump_flow_collections():
+    data = syaml.syaml_dict([
+        ('zlib', syaml.syaml_dict([
+            ('version', '1.2.11'),
+            ('parameters', {'shared': True, 'pic': False, 'cflags': []}),
+            ('empty', {}),
+            ('dependencies', syaml.syaml_dict([
+                ('b', {'hash': 'abc', 'type': ['build', 'link']}),
+                ('a', {'hash': 'def', 'type': syaml.syaml_list(['link'])})
+            ]))
+        ]))
+    ])
+    expected = syaml.dump(data, default_flow_style=True, width=syaml.maxint)
+    assert syaml.dump_flow(data) == expected
+    assert expected.startswith('{zlib: {version: 1.2.11, parameters: ')
@@ -27,8 +27,12 @@
 YAML format preserves DAG informatoin in the spec.
 
 """
+import os
 from collections import Iterable, Mapping
 
+import pytest
+
+import spack
 import spack.util.spack_json as sjson
 import spack.util.spack_yaml as syaml
 from spack.spec import Spec
@@ -207,3 +211,33 @@ def reverse_all_dicts(data):
         return type(data)(reverse_all_dicts(elt) for elt in data)
     else:
         return data
+
+
+dag_hash_corpus = os.path.join(spack.test_path, 'data', 'dag_hash')
+
+
+@pytest.mark.parametrize('filename', sorted(os.listdir(dag_hash_corpus)))
+def test_dag_hash_compatibility(builtin_mock, filename):
+    """Ensure the DAG hashes of specs written by previous versions of
+    Spack don't change."""
+    with open(os.path.join(dag_hash_corpus, filename)) as f:
+        spec = Spec.from_yaml(f)
+
+    expected = dict((s.name, s.dag_hash()) for s in spec.traverse())
+    for s in spec.traverse():
+        s._hash = None
+
+    assert dict((s.name, s.dag_hash()) for s in spec.traverse()) == expected
+
+
+@pytest.mark.parametrize('spec,expected', [
+    ('libelf', 'pls4ef2ac3zxyybcn7lmwn5ml32rnekv'),
+    ('mpileaks ^callpath@1.0', 'f5jm4rnumhn3wbjctxueivfpdrn3v22k'),
+    ('mpileaks@1.0:5.0,6.1+debug~opt %gcc@4.5:',
+     'yzmzkk7febg2yemwl7ya5ygws2k7md2s'),
+    ('multivalue_variant foo=bar,baz', 'e5tcy355tvqkn5zsi3kcwsxbl6du5lvt')
+])
+def test_abstract_dag_hash_compatibility(builtin_mock, spec, expected):
+    spec = Spec(spec)
+    spec.normalize()
+    assert spec.dag_hash() == expected
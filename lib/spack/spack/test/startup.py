@@ -0,0 +1,126 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Tests that importing Spack stays cheap.
+
+Shell init scripts and module wrappers run commands like ``spack
+location`` many times, so ``import spack`` must not create expensive
+objects or import modules that only some commands need.
+"""
+import os
+import sys
+
+import pytest
+
+from llnl.util.lang import Singleton
+
+import spack.util.spack_json as sjson
+from spack.util.executable import Executable
+
+#: Largest fraction of the time it would take to import Spack and do
+#: all the lazy work up front that ``import spack`` may take.  Timings
+#: vary a lot between machines, so the budget is relative to what the
+#: lazy globals and modules cost on the same machine.  It depends on the
+#: load of the machine too, so it is only checked if the
+#: ``SPACK_BENCHMARKS`` environment variable is set.
+import_time_fraction = 0.6
+
+#: Modules that are only needed by some commands
+lazy_modules = ['jinja2', 'pytest', 'spack.modules', 'spack.cmd.pkg']
+
+#: Globals that are only created when they are first used
+lazy_globals = ['repo', 'abi', 'concretizer', 'fetch_cache', 'misc_cache']
+
+startup_script = """
+import importlib, sys, time
+start = time.time()
+import spack
+elapsed = time.time() - start
+
+modules = sorted(sys.modules)
+initialized = [name for name in %r if getattr(spack, name).initialized]
+
+start = time.time()
+for name in %r:
+    getattr(spack, name).instance
+for name in %r:
+    importlib.import_module(name)
+lazy = time.time() - start
+
+import spack.util.spack_json as sjson
+print(sjson.dump({
+    'time': elapsed,
+    'lazy_time': lazy,
+    'modules': modules,
+    'initialized': initialized
+}, compact=True))
+""" % (lazy_globals, lazy_globals, lazy_modules)
+
+
+def import_spack():
+    """Import Spack in a new interpreter, and report what it did."""
+    python = Executable(sys.executable)
+    python.add_default_env('PYTHONPATH', os.pathsep.join(sys.path))
+    return sjson.load(python('-c', startup_script, output=str))
+
+
+def test_import_is_lazy():
+    startup = import_spack()
+    assert not startup['initialized']
+    assert not [m for m in startup['modules']
+                if any(m == l or m.startswith(l + '.') for l in lazy_modules)]
+
+
+@pytest.mark.skipif(not os.environ.get('SPACK_BENCHMARKS'),
+                    reason='timings are only checked if SPACK_BENCHMARKS '
+                    'is set')
+def test_import_time_budget():
+    # Take the best of a few runs, so a busy machine doesn't fail it
+    runs = [import_spack() for i in range(3)]
+    fraction = min(r['time'] / (r['time'] + r['lazy_time']) for r in runs)
+    assert fraction < import_time_fraction
+
+
+def test_singleton():
+    created = []
+
+    def factory():
+        created.append(True)
+        return {'a': 1}
+
+    singleton = Singleton(factory)
+    assert not singleton.initialized
+
+    assert singleton['a'] == 1
+    assert 'a' in singleton
+    assert list(singleton) == ['a']
+    assert singleton.get('b') is None
+    assert singleton.initialized
+    assert len(created) == 1
+
+
+def test_package_imports_find_repo(builtin_mock):
+    # spack.pkg imports go to the current spack.repo
+    import spack.pkg.builtin.mock.mpich  # noqa
+    assert 'spack.pkg.builtin.mock.mpich' in sys.modules
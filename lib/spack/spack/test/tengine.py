@@ -23,12 +23,17 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 
+import os
+
 import pytest
 import spack.tengine as tengine
 import spack.config
 
 from spack.util.path import canonicalize_path
 
+#: Tests run without the bytecode cache (see ``no_template_cache``)
+bytecode_cache = tengine._bytecode_cache
+
 
 class TestContext(object):
 
@@ -108,3 +113,43 @@ class TestTengineEnvironment(object):
         template = env.get_template('b.txt')
         text = template.render({'word': 'world'})
         assert 'Howdy world!' == text
+
+    def test_environment_is_shared(self, misc_cache, monkeypatch, tmpdir):
+        """Tests that templates are compiled once per process, and kept
+        compiled in the misc cache until they are modified.
+        """
+        import jinja2
+        monkeypatch.setattr(tengine, '_bytecode_cache', bytecode_cache)
+
+        template = tmpdir.join('templates', 'a.txt')
+        template.write('Hello {{ word }}!', ensure=True)
+        template_dirs = [str(tmpdir.join('templates'))]
+        cache_dir = misc_cache.cache_path('templates')
+
+        env = tengine.make_environment(template_dirs)
+        assert tengine.make_environment(template_dirs) is env
+        text = env.get_template('a.txt').render({'word': 'world'})
+        assert 'Hello world!' == text
+        assert len(os.listdir(cache_dir)) == 1
+
+        # Another process loads the compiled template from the cache
+        def fail(*args, **kwargs):
+            raise AssertionError('template compiled again')
+
+        original = jinja2.Environment.__dict__['compile']
+        monkeypatch.setattr(jinja2.Environment, 'compile', fail)
+        monkeypatch.setattr(tengine, '_environments', {})
+        env = tengine.make_environment(template_dirs)
+        text = env.get_template('a.txt').render({'word': 'world'})
+        assert 'Hello world!' == text
+        monkeypatch.setattr(jinja2.Environment, 'compile', original)
+
+        # Until the templates are modified, which replaces the
+        # compiled template in the cache
+        template.write('Howdy {{ word }}!')
+        os.utime(str(template), (0, 0))
+        monkeypatch.setattr(tengine, '_environments', {})
+        env = tengine.make_environment(template_dirs)
+        text = env.get_template('a.txt').render({'word': 'world'})
+        assert 'Howdy world!' == text
+        assert len(os.listdir(cache_dir)) == 1
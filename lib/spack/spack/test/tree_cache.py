@@ -0,0 +1,161 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+import os
+
+import pytest
+
+import spack
+import spack.util.crypto as crypto
+from spack.fetch_strategy import URLFetchStrategy, FetchStrategyComposite
+from spack.prefetch import Prefetcher
+from spack.spec import Spec
+from spack.tree_cache import SourceTreeCache, tree_key
+
+
+@pytest.fixture()
+def tree_cache(tmpdir, monkeypatch):
+    """Enables a source tree cache in a temporary directory."""
+    root = str(tmpdir.join('trees'))
+    monkeypatch.setattr(spack, 'source_tree_cache_path', root)
+    monkeypatch.setattr(spack, 'source_tree_cache', SourceTreeCache(root))
+    return spack.source_tree_cache
+
+
+@pytest.fixture()
+def cached_pkg(config, builtin_mock, mock_archive, monkeypatch):
+    """Returns a function that makes a package staged from the mock
+    archive, with its checksum.
+    """
+    digest = crypto.checksum(crypto.hashes['md5'], mock_archive.archive_file)
+    stages = []
+
+    def make():
+        spec = Spec('trivial-install-test-package').concretized()
+        pkg = spack.repo.get(spec)
+        fetcher = FetchStrategyComposite()
+        fetcher.append(URLFetchStrategy(mock_archive.url, digest=digest))
+        pkg.fetcher = fetcher
+        monkeypatch.setitem(pkg.versions, spec.version, {'md5': digest})
+        pkg.stage = None
+        stages.append(pkg.stage)
+        return pkg
+
+    yield make
+    for stage in stages:
+        stage.destroy()
+
+
+def test_tree_key():
+    key = tree_key('abc', [('p1', 1), ('p2', 0)])
+    assert key == tree_key('abc', [('p1', 1), ('p2', 0)])
+    assert key != tree_key('abd', [('p1', 1), ('p2', 0)])
+    assert key != tree_key('abc', [('p2', 0), ('p1', 1)])
+    assert key != tree_key('abc', [('p1', 0), ('p2', 0)])
+    assert key != tree_key('abc', [('p1', 1)])
+
+
+def test_store_and_restore(tmpdir):
+    source = tmpdir.ensure('stage', 'source', dir=True)
+    source.ensure('sub', 'file').write('content')
+    source.join('link').mksymlinkto('sub/file')
+    os.utime(str(source.join('sub', 'file')), (1000000000, 1000000000))
+
+    cache = SourceTreeCache(str(tmpdir.join('cache')))
+    assert 'key' not in cache
+    assert not cache.restore('key', str(tmpdir))
+
+    cache.store('key', str(source))
+    assert 'key' in cache
+
+    stage = tmpdir.ensure('new-stage', dir=True)
+    assert cache.restore('key', str(stage))
+    copy = stage.join('source', 'sub', 'file')
+    assert copy.read() == 'content'
+    assert copy.mtime() == 1000000000
+    assert stage.join('source', 'link').readlink() == 'sub/file'
+
+    # The copy doesn't share its data with the cache
+    copy.write('changed', ensure=False)
+    assert cache.restore('key', str(tmpdir.ensure('other', dir=True)))
+    assert tmpdir.join('other', 'source', 'sub', 'file').read() == 'content'
+
+
+def test_patched_sources_are_cached(tree_cache, cached_pkg, monkeypatch):
+    pkg = cached_pkg()
+    key = pkg._source_tree_key()
+    assert key is not None
+
+    pkg.do_patch()
+    assert key in tree_cache
+    pkg.stage.destroy()
+
+    def fail_expand(self):
+        raise AssertionError('archive expanded again')
+
+    monkeypatch.setattr(URLFetchStrategy, 'expand', fail_expand)
+    pkg = cached_pkg()
+    pkg.do_patch()
+    assert os.path.isfile(os.path.join(pkg.stage.source_path, 'configure'))
+    assert os.path.isfile(
+        os.path.join(pkg.stage.source_path, '.spack_patched'))
+
+
+def test_prefetched_sources_are_restored(tree_cache, cached_pkg,
+                                         monkeypatch):
+    pkg = cached_pkg()
+    pkg.do_patch()
+    pkg.stage.destroy()
+
+    # The prefetcher only fetches the archive, so that the patched
+    # sources are copied from the cache.
+    pkg = cached_pkg()
+    with Prefetcher([pkg.spec], jobs=1) as prefetcher:
+        for worker in prefetcher._workers:
+            worker.join()
+        assert prefetcher.wait(pkg.spec)
+    assert os.path.isfile(pkg.stage.archive_file)
+    assert not pkg.stage.source_path
+
+    def fail_expand(self):
+        raise AssertionError('archive expanded again')
+
+    monkeypatch.setattr(URLFetchStrategy, 'expand', fail_expand)
+    pkg.do_patch()
+    assert os.path.isfile(
+        os.path.join(pkg.stage.source_path, '.spack_patched'))
+
+
+def test_sources_not_cached(tree_cache, cached_pkg, monkeypatch):
+    pkg = cached_pkg()
+    pkg.fetcher[0].digest = None
+    assert pkg._source_tree_key() is None
+
+    pkg = cached_pkg()
+    monkeypatch.setattr(spack, 'source_tree_cache_path', None)
+    assert pkg._source_tree_key() is None
+
+    pkg = cached_pkg()
+    monkeypatch.setattr(type(pkg), 'patch', lambda self: None, raising=False)
+    assert pkg._source_tree_key() is None
@@ -22,13 +22,18 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import errno
 import os
+import sys
 import pytest
 
+import llnl.util.filesystem
 from llnl.util.filesystem import *
 
 import spack
+import spack.fetch_strategy as fs
 from spack.spec import Spec
+from spack.stage import Stage
 from spack.version import ver
 import spack.util.crypto as crypto
 
@@ -38,11 +43,18 @@ def checksum_type(request):
     return request.param
 
 
+@pytest.fixture(params=['curl', 'urllib'])
+def url_fetch_method(request, monkeypatch):
+    monkeypatch.setattr(spack, 'url_fetch_method', request.param)
+    return request.param
+
+
 @pytest.mark.parametrize('secure', [True, False])
 def test_fetch(
         mock_archive,
         secure,
         checksum_type,
+        url_fetch_method,
         config,
         refresh_builtin_mock
 ):
@@ -91,3 +103,74 @@ def test_hash_detection(checksum_type):
 def test_unknown_hash(checksum_type):
     with pytest.raises(ValueError):
         crypto.Checker('a')
+
+
+def test_link_or_copy(tmpdir, monkeypatch):
+    src = tmpdir.join('src')
+    src.write('x' * 100000)
+
+    def copy(name):
+        dest = str(tmpdir.join(name))
+        method = link_or_copy(str(src), dest)
+        with open(dest) as f:
+            assert f.read() == src.read()
+        return method, os.stat(dest).st_ino
+
+    assert copy('hardlink') == ('hardlink', os.stat(str(src)).st_ino)
+
+    def fail(*args):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+    monkeypatch.setattr(os, 'link', fail)
+
+    method, inode = copy('clone')
+    assert method in ('reflink', 'kernel', 'copy')
+    assert inode != os.stat(str(src)).st_ino
+
+    # The other methods fall back to a plain copy when they fail
+    if sys.platform.startswith('linux'):
+        import fcntl
+        monkeypatch.setattr(fcntl, 'ioctl', fail)
+
+    def partial_kernel_copy(src_fd, dest_fd):
+        os.write(dest_fd, b'partial')
+        fail()
+    monkeypatch.setattr(
+        llnl.util.filesystem, '_kernel_copy', partial_kernel_copy)
+    assert copy('copy')[0] == 'copy'
+
+
+@pytest.mark.skipif(not hasattr(os, 'copy_file_range') and
+                    not hasattr(os, 'sendfile'),
+                    reason='No in-kernel copy')
+def test_kernel_copy_of_shrinking_file(tmpdir, monkeypatch):
+    src = tmpdir.join('src')
+    src.write('x' * 1000)
+
+    # The file is smaller than when the copy started
+    class Stat(object):
+        st_size = 2000
+    monkeypatch.setattr(os, 'fstat', lambda fd: Stat())
+
+    with open(str(src), 'rb') as s:
+        with open(str(tmpdir.join('dest')), 'wb') as d:
+            assert not llnl.util.filesystem._kernel_copy(
+                s.fileno(), d.fileno())
+
+
+def test_fetch_local_file_without_copy(mock_archive):
+    """Archives in file:// mirrors are linked into the stage."""
+    fetcher = fs.URLFetchStrategy(mock_archive.url)
+    with Stage(fetcher) as stage:
+        stage.fetch()
+        assert os.stat(stage.archive_file).st_ino == \
+            os.stat(mock_archive.archive_file).st_ino
+
+
+def test_fetch_from_cache_without_copy(mock_archive):
+    """Cached archives are linked into the stage."""
+    fetcher = fs.CacheURLFetchStrategy(mock_archive.url)
+    with Stage(fetcher) as stage:
+        stage.fetch()
+        assert not os.path.islink(stage.archive_file)
+        assert os.stat(stage.archive_file).st_ino == \
+            os.stat(mock_archive.archive_file).st_ino
@@ -24,8 +24,13 @@
 ##############################################################################
 """Tests for web.py."""
 import os
+import shutil
+import time
+
+import pytest
 
 import spack
+import spack.util.web
 from spack.util.web import spider, find_versions_of_archive
 from spack.version import *
 
@@ -160,3 +165,68 @@ def test_find_exotic_versions_of_archive_3():
     assert ver('2.0.0b2') in versions
     assert ver('3.0a1') in versions
     assert ver('4.5-rc5') in versions
+
+
+@pytest.fixture()
+def web_server(mock_http_server, misc_cache):
+    """Serves the test pages over HTTP, with a temporary page cache."""
+    for name in os.listdir(web_data_path):
+        shutil.copy(os.path.join(web_data_path, name), mock_http_server.root)
+    return mock_http_server
+
+
+def test_spider_http(web_server):
+    url = web_server.url + '/index.html'
+    pages, links = spider(url, depth=3)
+
+    assert sorted(pages) == sorted(
+        web_server.url + '/' + name for name in os.listdir(web_data_path))
+    assert "This is page 4." in pages[web_server.url + '/4.html']
+
+    versions = find_versions_of_archive(
+        web_server.url + '/foo-0.0.0.tar.gz', url, list_depth=3)
+    assert ver('4.5-rc5') in versions
+
+
+def test_spider_cache(web_server):
+    url = web_server.url + '/index.html'
+    pages, links = spider(url, depth=3)
+    assert ('HEAD', '/index.html', 200) in web_server.responses
+
+    # Pages that didn't change are not downloaded again
+    del web_server.responses[:]
+    assert spider(url, depth=3) == (pages, links)
+    assert sorted(web_server.responses) == sorted(
+        ('GET', '/' + name, 304) for name in os.listdir(web_data_path))
+
+    # Pages that changed are
+    with open(os.path.join(web_server.root, '4.html'), 'w') as f:
+        f.write('<a href="foo-5.0.tar.gz">foo-5.0.tar.gz</a>')
+    del web_server.responses[:]
+    pages, links = spider(url, depth=3)
+    assert ('GET', '/4.html', 200) in web_server.responses
+    assert web_server.url + '/foo-5.0.tar.gz' in links
+
+    # And the cache can be bypassed
+    del web_server.responses[:]
+    spider(url, depth=3, cache=False)
+    assert all(status == 200 for _, _, status in web_server.responses)
+
+
+def test_spider_max_per_host(web_server, monkeypatch):
+    monkeypatch.setattr(spack.util.web, 'max_per_host', 1)
+    read_page = spack.util.web._read_page
+    active = []
+    peak = []
+
+    def counting_read_page(url, cached=None):
+        active.append(url)
+        peak.append(len(active))
+        time.sleep(0.05)
+        active.remove(url)
+        return read_page(url, cached)
+
+    monkeypatch.setattr(spack.util.web, '_read_page', counting_read_page)
+    pages, links = spider(web_server.url + '/index.html', depth=3)
+    assert len(pages) == 5
+    assert max(peak) == 1
@@ -0,0 +1,124 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Cache of expanded and patched source trees.
+
+Packages built several times from the same archive, e.g. with different
+compilers or variants, are expanded and patched only once.  Each tree is
+stored under a key made from the checksum of the archive and the ordered
+checksums of the patches applied to it, and later stages are populated
+with a copy of it instead of expanding the archive again.
+
+Trees are copied with reflinks or in-kernel copies where the filesystem
+supports them, never with hard links: builds may modify their sources
+in place.
+"""
+import hashlib
+import os
+import shutil
+
+import llnl.util.tty as tty
+from llnl.util.filesystem import clone_tree, join_path, mkdirp
+
+
+def tree_key(archive_digest, patch_checksums):
+    """Returns the key of a source tree in the cache.
+
+    Args:
+        archive_digest (str): checksum of the archive the tree was
+            expanded from
+        patch_checksums (list): checksums and levels of the patches
+            applied to the tree, in the order they were applied
+    """
+    sha = hashlib.sha256(archive_digest.encode('utf-8'))
+    for checksum, level in patch_checksums:
+        sha.update((' %s:%d' % (checksum, level)).encode('utf-8'))
+    return sha.hexdigest()
+
+
+class SourceTreeCache(object):
+    """Directory of source trees, each in a subdirectory named after its
+    key, that contains the top-level directory of the tree.
+    """
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+
+    def _tree(self, key):
+        """Path of the tree stored under ``key``, or None."""
+        path = join_path(self.root, key)
+        try:
+            names = os.listdir(path)
+        except OSError:
+            return None
+        return join_path(path, names[0]) if len(names) == 1 else None
+
+    def __contains__(self, key):
+        return self._tree(key) is not None
+
+    def restore(self, key, stage_path):
+        """Copies the tree stored under ``key`` in ``stage_path``.
+
+        Returns:
+            bool: True if the tree was copied, False if it isn't in the
+                cache or couldn't be copied.
+        """
+        tree = self._tree(key)
+        if tree is None:
+            return False
+
+        dest = join_path(stage_path, os.path.basename(tree))
+        try:
+            clone_tree(tree, dest)
+        except (IOError, OSError) as e:
+            tty.debug(e)
+            shutil.rmtree(dest, ignore_errors=True)
+            return False
+        return True
+
+    def store(self, key, source_path):
+        """Stores a copy of the tree at ``source_path`` under ``key``,
+        unless a tree is already stored there.
+        """
+        if key in self:
+            return
+
+        # Copy aside, then rename, so that no other process sees a tree
+        # that is only partly copied.
+        mkdirp(self.root)
+        tmp = join_path(self.root, '.tmp-%d-%s' % (os.getpid(), key))
+        try:
+            mkdirp(tmp)
+            clone_tree(source_path, join_path(
+                tmp, os.path.basename(source_path)))
+            os.rename(tmp, join_path(self.root, key))
+        except (IOError, OSError) as e:
+            # Another process stored the same tree first, or the tree
+            # couldn't be copied: building doesn't need the cache.
+            tty.debug(e)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def destroy(self):
+        shutil.rmtree(self.root, ignore_errors=True)
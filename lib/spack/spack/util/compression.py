@@ -22,9 +22,18 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
-import re
+import copy
 import os
+import re
+import shutil
+import stat
+import subprocess
+import tarfile
+import time
+import zipfile
 from itertools import product
+
+import spack.error
 from spack.util.executable import which
 
 # Supported archive extensions.
@@ -79,3 +88,307 @@ def extension(path):
         if re.search(suffix, path):
             return t
     return None
+
+
+#: Magic numbers of the compression formats Spack recognizes
+_magic_numbers = [
+    (b'\x1f\x8b', 'gz'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zst'),
+    (b'\x1f\x9d', 'Z'),
+    (b'PK\x03\x04', 'zip'),
+]
+
+#: Programs that decompress each format to stdout, fastest first.  Those
+#: that are multi-threaded come first.
+_decompressors = {
+    'gz': [['pigz', '-dc'], ['gzip', '-dc']],
+    'bz2': [['lbzip2', '-dc'], ['pbzip2', '-dc'], ['bzip2', '-dc']],
+    'xz': [['xz', '-dc', '-T0']],
+    'zst': [['zstd', '-dc', '-T0']],
+    'Z': [['gzip', '-dc']],
+}
+
+#: Formats Python can decompress by itself, as tarfile stream modes
+_tarfile_modes = {None: 'r|', 'gz': 'r|gz', 'bz2': 'r|bz2'}
+try:
+    import lzma  # noqa: F401  # nopyqver
+    _tarfile_modes['xz'] = 'r|xz'
+except ImportError:
+    pass
+
+
+def compression_format(path):
+    """Returns the compression format of a file, from its first bytes
+    (e.g. ``gz``, ``xz`` or ``zip``), or None if it isn't compressed.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(8)
+    for magic, fmt in _magic_numbers:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+def _decompressor(fmt):
+    """Returns the command of the fastest program that can decompress
+    ``fmt`` to stdout, or None.
+    """
+    for command in _decompressors.get(fmt, []):
+        exe = which(command[0])
+        if exe:
+            return [exe.path] + command[1:]
+    return None
+
+
+class _Layout(object):
+    """Decides where the members of an archive go while it is read.
+
+    Members are extracted straight into ``dest`` as long as they are all
+    under a single top-level directory (hidden files, like the HFS
+    metadata that tar on Mac OS X adds, don't count) that doesn't exist
+    in ``dest`` yet.  As soon as a member breaks this, what was already
+    extracted is moved into ``dest/container``, with all the members
+    that follow, so that exploding archives don't clobber ``dest``.
+    """
+
+    def __init__(self, dest, container):
+        self.dest = dest
+        self.container = container
+        self.existing = set(os.listdir(dest))
+        self.created = set()
+        self.top = None
+        self.contained = False
+
+    @property
+    def root(self):
+        """Directory where members are extracted."""
+        if self.contained:
+            return os.path.join(self.dest, self.container)
+        return self.dest
+
+    def place(self, name, is_dir):
+        """Returns the directory the member ``name`` must be extracted
+        in, relative to which its name is.
+        """
+        if not self.contained:
+            parts = name.split('/')
+            first = parts[0]
+            if first in self.existing:
+                self._contain()
+            elif not first.startswith('.'):
+                if self.top is None and (len(parts) > 1 or is_dir):
+                    self.top = first
+                elif first != self.top:
+                    self._contain()
+            if not self.contained:
+                self.created.add(first)
+        return self.root
+
+    def _contain(self):
+        container = os.path.join(self.dest, self.container)
+        os.mkdir(container)
+        for name in self.created:
+            os.rename(os.path.join(self.dest, name),
+                      os.path.join(container, name))
+        self.contained = True
+
+
+def _member_name(name):
+    """Normalizes the name of an archive member, and refuses names that
+    would be extracted outside of the destination.  Returns None for the
+    destination itself.
+    """
+    name = os.path.normpath(name)
+    if os.path.isabs(name) or name == '..' or name.startswith('../'):
+        raise ExtractError("Archive member is outside of the archive: " +
+                           name)
+    return None if name == '.' else name
+
+
+def _check_inside(root, path, name):
+    """Refuses the member ``name`` if ``path`` is outside of ``root``
+    once the symbolic links extracted before it are resolved.
+    """
+    real_root = os.path.realpath(root)
+    real_path = os.path.realpath(path)
+    if real_path != real_root and not real_path.startswith(real_root + os.sep):
+        raise ExtractError("Archive member is extracted through a link: " +
+                           name)
+
+
+def _check_target(root, name):
+    """Makes sure that extracting the member ``name`` in ``root`` writes
+    nothing outside of it: links in its path are checked, and a link it
+    replaces is removed rather than written through.
+    """
+    target = os.path.join(root, name)
+    _check_inside(root, os.path.dirname(target), name)
+    if os.path.islink(target):
+        os.remove(target)
+
+
+def _extract_tar(tar, layout):
+    """Extracts the members of a tarfile opened in stream mode, in order.
+    Directories are made writable until everything was extracted, as
+    TarFile.extractall() does.
+    """
+    directories = []
+    for member in tar:
+        name = _member_name(member.name)
+        if name is None:
+            continue
+        member.name = name
+        root = layout.place(name, member.isdir())
+        if member.islnk():
+            member.linkname = _member_name(member.linkname)
+            _check_inside(root, os.path.join(root, member.linkname), name)
+        _check_target(root, name)
+        if member.isdir():
+            directories.append(member)
+            member = copy.copy(member)
+            member.mode = 0o700
+        tar.extract(member, root)
+
+    for member in sorted(directories, key=lambda m: m.name, reverse=True):
+        path = os.path.join(layout.root, member.name)
+        tar.utime(member, path)
+        tar.chmod(member, path)
+
+
+def _extract_zip(path, layout):
+    """Extracts a zip archive, keeping the modes, times and symbolic
+    links of its members like unzip does.
+    """
+    directories = []
+    zf = zipfile.ZipFile(path)
+    try:
+        for info in zf.infolist():
+            name = _member_name(info.filename)
+            if name is None:
+                continue
+            is_dir = info.filename.endswith('/')
+            root = layout.place(name, is_dir)
+            target = os.path.join(root, name)
+            mode = info.external_attr >> 16
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+
+            if is_dir:
+                _check_target(root, name)
+                if not os.path.isdir(target):
+                    os.makedirs(target)
+                directories.append((name, mode, mtime))
+                continue
+
+            _check_target(root, name)
+            parent = os.path.dirname(target)
+            if not os.path.isdir(parent):
+                os.makedirs(parent)
+            if stat.S_ISLNK(mode):
+                os.symlink(zf.read(info).decode('utf-8'), target)
+                continue
+            src = zf.open(info)
+            try:
+                with open(target, 'wb') as dest:
+                    shutil.copyfileobj(src, dest, 2 ** 20)
+            finally:
+                src.close()
+            if stat.S_IMODE(mode):
+                os.chmod(target, stat.S_IMODE(mode))
+            os.utime(target, (mtime, mtime))
+    finally:
+        zf.close()
+
+    for name, mode, mtime in sorted(directories, reverse=True):
+        target = os.path.join(layout.root, name)
+        if stat.S_IMODE(mode):
+            os.chmod(target, stat.S_IMODE(mode))
+        os.utime(target, (mtime, mtime))
+
+
+def extract(path, dest, container, extension=None):
+    """Expands an archive into the directory ``dest``, reading it once.
+
+    If all of the archive is under a single top-level directory, that
+    directory is created directly in ``dest``.  Otherwise the archive is
+    expanded in ``dest/container``.
+
+    Tarballs are decompressed by a multi-threaded program (pigz, lbzip2,
+    xz or zstd) when one is installed, and by Python otherwise, while
+    Python reads the tar stream and writes its members.  Zip archives
+    are expanded by Python.
+
+    Returns:
+        bool: False if the archive can't be expanded this way, e.g. if it
+            is a single compressed file, or a tarball compressed with a
+            format for which no decompressor is available.  Nothing is
+            written in ``dest`` then.
+
+    Raises:
+        ExtractError: if the archive is corrupt or unsafe
+    """
+    fmt = compression_format(path)
+    is_zip = path.endswith('.zip') or (
+        extension and re.match(r'\.?zip$', extension))
+    if is_zip or fmt == 'zip':
+        try:
+            _extract_zip(path, _Layout(dest, container))
+        except (zipfile.BadZipfile, RuntimeError) as e:
+            raise ExtractError("Couldn't expand %s" % path, str(e))
+        return True
+
+    # Single compressed files are left to gunzip
+    if extension and re.match(r'gz', extension):
+        return False
+
+    command = _decompressor(fmt) if fmt else None
+    if command is None and fmt not in _tarfile_modes:
+        return False
+
+    with open(path, 'rb') as f:
+        process = None
+        if command:
+            process = subprocess.Popen(command, stdin=f,
+                                       stdout=subprocess.PIPE)
+            stream, mode = process.stdout, 'r|'
+        else:
+            stream, mode = f, _tarfile_modes[fmt]
+
+        layout = _Layout(dest, container)
+        try:
+            tar = tarfile.open(fileobj=stream, mode=mode, bufsize=2 ** 20)
+            try:
+                _extract_tar(tar, layout)
+            finally:
+                tar.close()
+        except tarfile.ReadError as e:
+            if process:
+                process.kill()
+                process.wait()
+            if not layout.created and not layout.contained:
+                # Not a tarball: let tar try its luck
+                return False
+            raise ExtractError("Couldn't expand %s" % path, str(e))
+        except tarfile.TarError as e:
+            if process:
+                process.kill()
+                process.wait()
+            raise ExtractError("Couldn't expand %s" % path, str(e))
+
+        if process:
+            # Read the padding after the end of the archive, so that the
+            # decompressor finishes normally.
+            while process.stdout.read(2 ** 20):
+                pass
+            process.stdout.close()
+            if process.wait():
+                raise ExtractError(
+                    "Couldn't expand %s" % path,
+                    "%s exited with status %d" % (
+                        command[0], process.returncode))
+    return True
+
+
+class ExtractError(spack.error.SpackError):
+    """Raised when an archive can't be expanded."""
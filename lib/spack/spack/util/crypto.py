@@ -102,6 +102,20 @@ class Checker(object):
             self.hash_fun, filename, block_size=self.block_size)
         return self.sum == self.hexdigest
 
+    def new_hasher(self):
+        """Returns an empty hash object of the algorithm this Checker
+           uses, to hash data as it is produced, e.g. while downloading.
+        """
+        return self.hash_fun()
+
+    def check_hasher(self, hasher):
+        """Check the digest of all the data fed to a hasher returned
+           by new_hasher() against self.hexdigest, without reading any
+           file.  Actual checksum is stored in self.sum.
+        """
+        self.sum = hasher.hexdigest()
+        return self.sum == self.hexdigest
+
 
 def prefix_bits(byte_array, bits):
     """Return the first <bits> bits of a byte array as an integer."""
@@ -0,0 +1,270 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Downloads files over HTTP(S) within the Spack process.
+
+This is the ``urllib`` fetch method of
+:class:`~spack.fetch_strategy.URLFetchStrategy`, an alternative to
+running ``curl`` once per archive.  Connections are kept open between
+downloads and reused for the next request to the same host, partial
+downloads are resumed with HTTP range requests, and the data can be
+hashed while it is written, so that checking an archive doesn't read
+it again.
+"""
+import os
+import socket
+import ssl
+
+from six.moves import http_client
+from six.moves.urllib.parse import urljoin, urlparse
+from six.moves.urllib.request import url2pathname
+
+import spack.error
+
+__all__ = ['download', 'supports', 'DownloadError', 'HTTPError']
+
+#: Seconds to wait for a server before giving up
+timeout = 30
+
+#: Maximum number of redirects followed for one download
+max_redirects = 10
+
+#: Size of the blocks read from the network and from files
+block_size = 2 ** 20
+
+#: URL schemes that :func:`download` supports
+schemes = ('http', 'https', 'file')
+
+_redirect_codes = (301, 302, 303, 307, 308)
+
+
+def supports(url):
+    """True if :func:`download` can fetch ``url``."""
+    return urlparse(url).scheme in schemes
+
+
+class ConnectionPool(object):
+    """Keeps the connections that are not in use, one list per host.
+
+    A connection is put back in the pool once the response it got has
+    been read completely, unless the server asked to close it.
+    """
+
+    def __init__(self):
+        self._idle = {}
+
+    def get(self, scheme, netloc, insecure=False):
+        """Returns a connection to a host, and whether it was reused."""
+        idle = self._idle.get((scheme, netloc, insecure))
+        if idle:
+            return idle.pop(), True
+        return _connect(scheme, netloc, insecure), False
+
+    def put(self, scheme, netloc, insecure, connection):
+        self._idle.setdefault((scheme, netloc, insecure), []).append(
+            connection)
+
+    def clear(self):
+        for idle in self._idle.values():
+            for connection in idle:
+                connection.close()
+        self._idle = {}
+
+
+#: Connections of this process
+connections = ConnectionPool()
+
+
+def _connect(scheme, netloc, insecure):
+    if scheme == 'http':
+        return http_client.HTTPConnection(netloc, timeout=timeout)
+
+    # Python < 2.7.9 can't verify certificates
+    kwargs = {}
+    if hasattr(ssl, 'create_default_context'):
+        if insecure:
+            kwargs['context'] = ssl._create_unverified_context()
+        else:
+            kwargs['context'] = ssl.create_default_context()
+    return http_client.HTTPSConnection(netloc, timeout=timeout, **kwargs)
+
+
+def _request(url, headers, insecure):
+    """Sends a GET request for url, following redirects.
+
+    Returns:
+        tuple: (response, release) where release() must be called once
+            the body of the response has been read, or with
+            ``reuse=False`` if the connection can't be used anymore.
+    """
+    for _ in range(max_redirects + 1):
+        parsed = urlparse(url)
+        path = parsed.path or '/'
+        if parsed.query:
+            path += '?' + parsed.query
+        key = (parsed.scheme, parsed.netloc, insecure)
+
+        connection, reused = connections.get(*key)
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+        except (http_client.HTTPException, socket.error):
+            # The server may have closed an idle connection
+            connection.close()
+            if not reused:
+                raise
+            connection = _connect(*key)
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+
+        def release(reuse=True, connection=connection, response=response,
+                    key=key):
+            if reuse and not response.will_close:
+                connections.put(key[0], key[1], key[2], connection)
+            else:
+                connection.close()
+
+        if response.status not in _redirect_codes:
+            return response, release
+
+        location = response.getheader('location')
+        response.read()
+        release()
+        if not location:
+            raise HTTPError(url, response.status, 'redirect without location')
+        url = urljoin(url, location)
+
+    raise DownloadError('Too many redirects for %s' % url)
+
+
+def download(url, path, hasher=None, insecure=False):
+    """Downloads url to path, resuming the download if path exists.
+
+    Args:
+        url (str): URL to download, see :func:`supports`
+        path (str): file where the data is written
+        hasher: hash object (from :mod:`hashlib`) that is updated with
+            all the contents of the file, including the part that was
+            already downloaded
+        insecure (bool): don't verify SSL certificates
+
+    Returns:
+        str: the content type sent by the server, or an empty string
+
+    Raises:
+        HTTPError: if the server answered with an error
+        DownloadError: for any other failure.  The data downloaded so far
+            is left in path, so that the download can be resumed.
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == 'file':
+        _copy(url2pathname(parsed.path), path, hasher)
+        return ''
+
+    offset = os.path.getsize(path) if os.path.exists(path) else 0
+    headers = {'Accept-Encoding': 'identity'}
+    if offset:
+        headers['Range'] = 'bytes=%d-' % offset
+
+    try:
+        response, release = _request(url, headers, insecure)
+        if response.status == 416 and offset:
+            # What we have is not a prefix of the file: start over
+            response.read()
+            release()
+            os.remove(path)
+            return download(url, path, hasher, insecure)
+
+        if response.status == 206:
+            mode = 'ab'
+            if hasher:
+                _hash_file(path, hasher)
+        elif response.status == 200:
+            mode = 'wb'
+            offset = 0
+        else:
+            response.read()
+            release()
+            raise HTTPError(url, response.status, response.reason)
+
+        expected = response.getheader('content-length')
+        received = 0
+        with open(path, mode) as f:
+            while True:
+                data = response.read(block_size)
+                if not data:
+                    break
+                f.write(data)
+                received += len(data)
+                if hasher:
+                    hasher.update(data)
+
+        if expected is not None and received != int(expected):
+            release(reuse=False)
+            raise DownloadError(
+                'Incomplete download of %s' % url,
+                'Got %d bytes out of %s' % (received, expected))
+        release()
+
+    except (http_client.HTTPException, socket.error) as e:
+        raise DownloadError('Failed to download %s' % url, str(e))
+
+    return response.getheader('content-type', '')
+
+
+def _hash_file(path, hasher):
+    with open(path, 'rb') as f:
+        while True:
+            data = f.read(block_size)
+            if not data:
+                break
+            hasher.update(data)
+
+
+def _copy(source, path, hasher):
+    if not os.path.isfile(source):
+        raise HTTPError('file://' + source, 404, 'No such file')
+
+    with open(source, 'rb') as src:
+        with open(path, 'wb') as dst:
+            while True:
+                data = src.read(block_size)
+                if not data:
+                    break
+                dst.write(data)
+                if hasher:
+                    hasher.update(data)
+
+
+class DownloadError(spack.error.SpackError):
+    """Raised when a download fails."""
+
+
+class HTTPError(DownloadError):
+    """Raised when a server answers with an error status."""
+
+    def __init__(self, url, code, reason):
+        super(HTTPError, self).__init__(
+            'Failed to download %s' % url, '%d %s' % (code, reason))
+        self.code = code
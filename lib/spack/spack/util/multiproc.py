@@ -44,8 +44,13 @@ def parmap(f, X):
     proc = [Process(target=spawn(f), args=(c, x))
             for x, (p, c) in zip(X, pipe)]
     [p.start() for p in proc]
+
+    # Receive before joining: children block until large results are
+    # read from the pipe.
+    [c.close() for (p, c) in pipe]
+    results = [p.recv() for (p, c) in pipe]
     [p.join() for p in proc]
-    return [p.recv() for (p, c) in pipe]
+    return results
 
 
 class Barrier:
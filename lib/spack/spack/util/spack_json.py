@@ -23,20 +23,27 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
 """Simple wrapper around JSON to guarantee consistent use of load/dump. """
+import os
 import sys
 import json
 from six import string_types
 from six import iteritems
 
+import llnl.util.tty as tty
+
 import spack.error
 
-__all__ = ['load', 'dump', 'SpackJSONError']
+__all__ = ['load', 'dump', 'load_file', 'dump_file', 'SpackJSONError']
 
 _json_dump_args = {
     'indent': True,
     'separators': (',', ': ')
 }
 
+_json_compact_dump_args = {
+    'separators': (',', ':')
+}
+
 
 def load(stream):
     """Spack JSON needs to be ordered to support specs."""
@@ -48,12 +55,50 @@ def load(stream):
     return _strify(load(stream, object_hook=_strify), ignore_dicts=True)
 
 
-def dump(data, stream=None):
-    """Dump JSON with a reasonable amount of indentation and separation."""
+def dump(data, stream=None, compact=False):
+    """Dump JSON with a reasonable amount of indentation and separation.
+
+    If ``compact`` is True, the output has no whitespace, and fits on a
+    single line.
+    """
+    args = _json_compact_dump_args if compact else _json_dump_args
     if stream is None:
-        return json.dumps(data, **_json_dump_args)
+        return json.dumps(data, **args)
     else:
-        return json.dump(data, stream, **_json_dump_args)
+        return json.dump(data, stream, **args)
+
+
+def load_file(path):
+    """Returns the JSON object in the file at ``path``, or an empty dict
+    if there is no such file.  Files that can't be read, or don't hold a
+    JSON object, are ignored with a warning.
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as f:
+            data = load(f)
+        if not isinstance(data, dict):
+            raise ValueError('not a JSON object')
+        return data
+    except (IOError, OSError, ValueError) as e:
+        tty.warn("Ignoring the invalid file %s" % path, str(e))
+        return {}
+
+
+def dump_file(data, path):
+    """Writes ``data`` to the file at ``path``.  It is written to a
+    temporary file first, then renamed, so that readers never see a file
+    that is only partly written.
+    """
+    tmp = '%s.tmp-%d' % (path, os.getpid())
+    try:
+        with open(tmp, 'w') as f:
+            dump(data, f)
+        os.rename(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
 
 
 def _strify(data, ignore_dicts=False):
@@ -30,17 +30,23 @@
 - ``Our load methods use ``OrderedDict`` class instead of YAML's
   default unorderd dict.
 
+- ``dump_flow()`` writes the one-line flow style YAML used to hash specs
+  without going through the PyYAML emitter.
+
 """
+import ctypes
+
 import yaml
 from yaml import Loader, Dumper
 from yaml.nodes import *
 from yaml.constructor import ConstructorError
+from yaml.resolver import Resolver
 from ordereddict_backport import OrderedDict
 
 import spack.error
 
 # Only export load and dump
-__all__ = ['load', 'dump', 'SpackYAMLError']
+__all__ = ['load', 'dump', 'dump_flow', 'SpackYAMLError']
 
 # Make new classes so we can add custom attributes.
 # Also, use OrderedDict instead of just dict.
@@ -218,6 +224,124 @@ def dump(*args, **kwargs):
     return yaml.dump(*args, **kwargs)
 
 
+"""Max integer helps avoid passing too large a value to cyaml."""
+maxint = 2 ** (ctypes.sizeof(ctypes.c_int) * 8 - 1) - 1
+
+#: Resolves plain scalars to the tags they would be read with
+_resolver = Resolver()
+
+#: Characters that can't start a plain scalar in flow style
+_flow_leading_indicators = '#,[]{}&*!|>\'"%@`?:'
+
+#: Characters that can't appear in a plain scalar in flow style
+_flow_indicators = ',?[]{}:'
+
+
+class _NotFlowDumpable(Exception):
+    """Raised by _flow_dump() on data it doesn't know how to write."""
+
+
+def _flow_scalar(value):
+    """Write a string the way the PyYAML emitter does in flow context.
+
+    Only printable ASCII strings are handled.  They are written plain,
+    unless they contain flow indicators, have leading or trailing
+    spaces, or would be read back as another type (e.g. ``'1.0'``), in
+    which case they are single-quoted.
+    """
+    if len(value) >= 128:
+        # Too long to be a simple key
+        raise _NotFlowDumpable()
+
+    for c in value:
+        if not ' ' <= c <= '~':
+            raise _NotFlowDumpable()
+
+    if not value:
+        return "''"
+
+    plain = not (
+        value[0] in _flow_leading_indicators or
+        value[0] == ' ' or value[-1] == ' ' or
+        value == '-' or value.startswith('- ') or
+        value.startswith('---') or value.startswith('...') or
+        ' #' in value or
+        any(c in _flow_indicators for c in value[1:]))
+
+    if plain and _resolver.resolve(
+            ScalarNode, value, (True, False)) == Resolver.DEFAULT_SCALAR_TAG:
+        return value
+
+    return "'%s'" % value.replace("'", "''")
+
+
+#: Types written as strings; unicode is left to PyYAML in Python 2
+_flow_str_types = (str, syaml_str)
+
+
+def _flow_dump(data, out):
+    """Append the flow style YAML for data to the list out."""
+    data_type = type(data)
+    if data_type is syaml_dict or data_type is dict:
+        items = data.items()
+        if data_type is dict:
+            items = sorted(items)
+        out.append('{')
+        for i, (key, value) in enumerate(items):
+            if i:
+                out.append(', ')
+            # Empty keys aren't simple keys
+            if type(key) not in _flow_str_types or not key:
+                raise _NotFlowDumpable()
+            out.append(_flow_scalar(key))
+            out.append(': ')
+            _flow_dump(value, out)
+        out.append('}')
+
+    elif data_type is syaml_list or data_type is list:
+        out.append('[')
+        for i, value in enumerate(data):
+            if i:
+                out.append(', ')
+            _flow_dump(value, out)
+        out.append(']')
+
+    elif data_type in _flow_str_types:
+        out.append(_flow_scalar(data))
+
+    elif data_type is bool:
+        out.append('true' if data else 'false')
+
+    elif data is None:
+        out.append('null')
+
+    elif data_type is int:
+        out.append(str(data))
+
+    else:
+        raise _NotFlowDumpable()
+
+
+def dump_flow(data):
+    """Dump data on a single line of flow style YAML.
+
+    This returns the same text as ``dump(data, default_flow_style=True,
+    width=maxint)``.  Dicts, lists and the scalars specs are made of are
+    written directly, which is much faster than going through the PyYAML
+    emitter; anything else is left to ``dump()``.
+    """
+    if type(data) in (syaml_dict, dict, syaml_list, list):
+        out = []
+        try:
+            _flow_dump(data, out)
+            out.append('\n')
+            return ''.join(out)
+        except _NotFlowDumpable:
+            pass
+
+    return dump(data, default_flow_style=True, width=maxint)
+
+
 class SpackYAMLError(spack.error.SpackError):
     """Raised when there are issues with YAML parsing."""
     def __init__(self, msg, yaml_error):
@@ -22,6 +22,9 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import re
+
+_size_units = ['', 'K', 'M', 'G', 'T', 'P']
 
 
 def comma_list(sequence, article=''):
@@ -49,3 +52,32 @@ def comma_or(sequence):
 
 def comma_and(sequence):
     return comma_list(sequence, 'and')
+
+
+def parse_size(size):
+    """Parses a size in bytes, e.g. ``10G`` or ``512M``.
+
+    Suffixes are powers of 1024, and may be followed by ``B``.  Integers
+    are returned as they are.
+    """
+    if isinstance(size, int):
+        return size
+    match = re.match(r'^\s*(\d+(?:\.\d+)?)\s*([KMGTP]?)B?\s*$',
+                     str(size), re.IGNORECASE)
+    if not match:
+        raise ValueError("Invalid size: '%s'" % size)
+    number, unit = match.groups()
+    return int(float(number) * 1024 ** _size_units.index(unit.upper()))
+
+
+def format_size(size):
+    """Formats a size in bytes for humans, e.g. ``1.5G``."""
+    for unit in _size_units[:-1]:
+        if abs(size) < 1024:
+            break
+        size /= 1024.0
+    else:
+        unit = _size_units[-1]
+    if not unit:
+        return '%dB' % size
+    return '%.1f%s' % (size, unit)
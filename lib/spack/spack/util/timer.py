@@ -0,0 +1,118 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Timers for the steps of an installation.
+
+A :class:`Timer` records how long each named step of a build takes, in
+the order the steps ran.  Spack writes the timings of every install to
+a JSON file in the install's metadata directory, where they can be
+aggregated later with ``spack install-times``.
+"""
+import contextlib
+import time
+
+import spack.util.spack_json as sjson
+
+__all__ = ['Timer']
+
+
+class Timer(object):
+    """Measures named steps and the total wall time since creation.
+
+    Steps can be measured more than once: :meth:`seconds` then returns
+    the sum of all the measurements with that name.
+
+    Timers read from a file are not running: their total is the one
+    stored in the file, plus the steps added to them since.
+    """
+
+    def __init__(self):
+        #: List of (name, seconds) tuples, in the order they were measured
+        self.phases = []
+        # Start of a running timer, or None for a timer read from a file
+        self._start = time.time()
+        self._stored_total = 0.0
+
+    @contextlib.contextmanager
+    def measure(self, name):
+        """Context manager that records the time spent in its body.
+
+        The time is recorded even if the body raises.
+        """
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add(name, time.time() - start)
+
+    def add(self, name, seconds, before_start=False):
+        """Records that the step ``name`` took ``seconds``.
+
+        If ``before_start`` is True, the step ran before a running timer
+        was created, e.g. in another process, and its time is added to
+        the total.
+        """
+        self.phases.append((name, seconds))
+        if self._start is None:
+            self._stored_total += seconds
+        elif before_start:
+            self._start -= seconds
+
+    def seconds(self, name):
+        """Total time spent in the steps called ``name``."""
+        return sum(s for n, s in self.phases if n == name)
+
+    @property
+    def total(self):
+        """Wall time since the timer was created, in seconds.
+
+        For a timer read from a file, this is the total stored in the
+        file plus the steps added since it was read.
+        """
+        if self._start is None:
+            return self._stored_total
+        return time.time() - self._start
+
+    def to_dict(self):
+        return {
+            'phases': [{'name': n, 'seconds': s} for n, s in self.phases],
+            'total': self.total
+        }
+
+    @staticmethod
+    def from_dict(data):
+        timer = Timer()
+        timer.phases = [(p['name'], p['seconds']) for p in data['phases']]
+        timer._start = None
+        timer._stored_total = data['total']
+        return timer
+
+    def write_json(self, path):
+        with open(path, 'w') as f:
+            sjson.dump(self.to_dict(), f)
+
+    @staticmethod
+    def read_json(path):
+        with open(path) as f:
+            return Timer.from_dict(sjson.load(f))
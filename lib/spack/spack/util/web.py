@@ -22,15 +22,17 @@
 # License along with this program; if not, write to the Free Software
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
 ##############################################################################
+import hashlib
 import re
 import os
 import sys
+import threading
 import traceback
+from multiprocessing.pool import ThreadPool
 
 from six.moves.urllib.request import urlopen, Request
-from six.moves.urllib.error import URLError
-from six.moves.urllib.parse import urljoin
-import multiprocessing.pool
+from six.moves.urllib.error import HTTPError, URLError
+from six.moves.urllib.parse import urljoin, urlparse
 
 try:
     # Python 2 had these in the HTMLParser package.
@@ -47,6 +49,7 @@ import llnl.util.tty as tty
 
 import spack
 import spack.error
+import spack.util.spack_json as sjson
 from spack.util.compression import ALLOWED_ARCHIVE_TYPES
 
 # Timeout in seconds for web requests
@@ -68,156 +71,249 @@ class LinkParser(HTMLParser):
                     self.links.append(val)
 
 
-class NonDaemonProcess(multiprocessing.Process):
-    """Process tha allows sub-processes, so pools can have sub-pools."""
-    def _get_daemon(self):
-        return False
+#: Maximum number of pages fetched at the same time by the spider
+max_workers = 16
 
-    def _set_daemon(self, value):
-        pass
-
-    daemon = property(_get_daemon, _set_daemon)
+#: Maximum number of pages fetched at the same time from a single host
+max_per_host = 4
 
+#: Prefix of the keys of the page cache in the misc cache
+_cache_prefix = 'web'
 
-class NonDaemonPool(multiprocessing.pool.Pool):
-    """Pool that uses non-daemon processes"""
-    Process = NonDaemonProcess
 
+def _cache_key(url):
+    """Key of the cached copy of a page, or None if it's not cached."""
+    if urlparse(url).scheme not in ('http', 'https'):
+        return None
+    return '%s/%s.json' % (
+        _cache_prefix, hashlib.sha1(url.encode('utf-8')).hexdigest())
 
-def _spider(url, visited, root, depth, max_depth, raise_on_error):
-    """Fetches URL and any pages it links to up to max_depth.
-
-       depth should initially be zero, and max_depth is the max depth of
-       links to follow from the root.
 
-       Prints out a warning only if the root can't be fetched; it ignores
-       errors with pages that the root links to.
+def _read_cached_page(url):
+    """Returns the cached copy of a page, or None.
 
-       Returns a tuple of:
-       - pages: dict of pages visited (URL) mapped to their full text.
-       - links: set of links encountered while visiting the pages.
+    Cached copies are dicts with the ``url`` the page was read from, its
+    ``etag`` and ``last_modified`` validators, and its ``text``.
     """
-    pages = {}     # dict from page URL -> text content.
-    links = set()  # set of all links seen on visited pages.
+    key = _cache_key(url)
+    try:
+        if key is None or not spack.misc_cache.init_entry(key):
+            return None
+        with spack.misc_cache.read_transaction(key) as f:
+            entry = sjson.load(f)
+    except Exception as e:
+        tty.debug('Cannot read the cached copy of %s: %s' % (url, e))
+        return None
+
+    if isinstance(entry['text'], bytes):
+        entry['text'] = entry['text'].decode('utf-8')
+    return entry
 
-    # root may end with index.html -- chop that off.
-    if root.endswith('/index.html'):
-        root = re.sub('/index.html$', '', root)
 
+def _write_cached_page(url, entry):
+    key = _cache_key(url)
+    if key is None:
+        return
     try:
+        spack.misc_cache.init_entry(key)
+        with spack.misc_cache.write_transaction(key) as (old, new):
+            sjson.dump(entry, new)
+    except Exception as e:
+        # The cache only saves requests; never fail because of it
+        tty.debug('Cannot cache %s: %s' % (url, e))
+
+
+def _read_page(url, cached=None):
+    """Reads the HTML page at a URL.
+
+    If a ``cached`` copy of the page is given, the page is requested
+    only if it changed since, using its ETag and Last-Modified date.
+
+    Returns a tuple of:
+    - the cache entry of the page (see ``_read_cached_page``), or None
+      if the URL is not an HTML page.
+    - True if the page was read from the server, False if the cached
+      copy is still current.
+    """
+    req = Request(url)
+    if cached:
+        # Only HTML pages are cached, so the HEAD request isn't needed
+        if cached.get('etag'):
+            req.add_header('If-None-Match', cached['etag'])
+        if cached.get('last_modified'):
+            req.add_header('If-Modified-Since', cached['last_modified'])
+    else:
         # Make a HEAD request first to check the content type.  This lets
         # us ignore tarballs and gigantic files.
         # It would be nice to do this with the HTTP Accept header to avoid
         # one round-trip.  However, most servers seem to ignore the header
         # if you ask for a tarball with Accept: text/html.
-        req = Request(url)
         req.get_method = lambda: "HEAD"
         resp = urlopen(req, timeout=TIMEOUT)
 
         if "Content-type" not in resp.headers:
             tty.debug("ignoring page " + url)
-            return pages, links
+            return None, True
 
         if not resp.headers["Content-type"].startswith('text/html'):
             tty.debug("ignoring page " + url + " with content type " +
                       resp.headers["Content-type"])
-            return pages, links
+            return None, True
 
-        # Do the real GET request when we know it's just HTML.
-        req.get_method = lambda: "GET"
+    # Do the real GET request when we know it's just HTML.
+    req.get_method = lambda: "GET"
+    try:
         response = urlopen(req, timeout=TIMEOUT)
-        response_url = response.geturl()
-
-        # Read the page and and stick it in the map we'll return
-        page = response.read().decode('utf-8')
-        pages[response_url] = page
-
-        # Parse out the links in the page
-        link_parser = LinkParser()
-        subcalls = []
-        link_parser.feed(page)
-
-        while link_parser.links:
-            raw_link = link_parser.links.pop()
-            abs_link = urljoin(response_url, raw_link.strip())
-
-            links.add(abs_link)
-
-            # Skip stuff that looks like an archive
-            if any(raw_link.endswith(suf) for suf in ALLOWED_ARCHIVE_TYPES):
-                continue
-
-            # Skip things outside the root directory
-            if not abs_link.startswith(root):
-                continue
-
-            # Skip already-visited links
-            if abs_link in visited:
-                continue
+    except HTTPError as e:
+        if cached and e.code == 304:
+            return cached, False
+        raise
 
-            # If we're not at max depth, follow links.
-            if depth < max_depth:
-                subcalls.append((abs_link, visited, root,
-                                 depth + 1, max_depth, raise_on_error))
-                visited.add(abs_link)
+    return {
+        'url': response.geturl(),
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'text': response.read().decode('utf-8')
+    }, True
 
-        if subcalls:
-            pool = NonDaemonPool(processes=len(subcalls))
-            try:
-                results = pool.map(_spider_wrapper, subcalls)
 
-                for sub_pages, sub_links in results:
-                    pages.update(sub_pages)
-                    links.update(sub_links)
+def _spider_page(args):
+    """Reads a page in a worker thread of the spider.
 
-            finally:
-                pool.terminate()
-                pool.join()
+    Returns what ``_read_page`` returns, or (None, False) if the page
+    couldn't be read.
+    """
+    url, cached, slots, raise_on_error = args
+    try:
+        with slots:
+            return _read_page(url, cached)
 
     except URLError as e:
         tty.debug(e)
         if raise_on_error:
             raise spack.error.NoNetworkConnectionError(str(e), url)
 
-    except HTMLParseError as e:
-        # This error indicates that Python's HTML parser sucks.
-        msg = "Got an error parsing HTML."
-
-        # Pre-2.7.3 Pythons in particular have rather prickly HTML parsing.
-        if sys.version_info[:3] < (2, 7, 3):
-            msg += " Use Python 2.7.3 or newer for better HTML parsing."
-
-        tty.warn(msg, url, "HTMLParseError: " + str(e))
-
     except Exception as e:
         # Other types of errors are completely ignored, except in debug mode.
         tty.debug("Error in _spider: %s:%s" % (type(e), e),
                   traceback.format_exc())
 
-    return pages, links
+    return None, False
 
 
-def _spider_wrapper(args):
-    """Wrapper for using spider with multiprocessing."""
-    return _spider(*args)
+def _spider(url, max_depth, raise_on_error, cache=True):
+    """Fetches URL and any pages it links to up to max_depth.
 
+       max_depth is the max depth of links to follow from the root.
 
-def spider(root_url, depth=0):
+       Pages are read by a single pool of ``max_workers`` threads, one
+       depth level at a time, with at most ``max_per_host`` requests
+       to a host at the same time.  If ``cache`` is True, pages that
+       were read before are only read again if they changed.
 
+       Returns a tuple of:
+       - pages: dict of pages visited (URL) mapped to their full text.
+       - links: set of links encountered while visiting the pages.
+    """
+    pages = {}     # dict from page URL -> text content.
+    links = set()  # set of all links seen on visited pages.
+
+    # root may end with index.html -- chop that off.
+    root = url
+    if root.endswith('/index.html'):
+        root = re.sub('/index.html$', '', root)
+
+    visited = set([url])
+    level = [url]
+    slots = {}
+    pool = ThreadPool(max_workers)
+    try:
+        for depth in range(max_depth + 1):
+            if not level:
+                break
+
+            args = []
+            level_urls, level = level, []
+            for page_url in level_urls:
+                host = urlparse(page_url).netloc
+                if host not in slots:
+                    slots[host] = threading.BoundedSemaphore(max_per_host)
+                cached = _read_cached_page(page_url) if cache else None
+                args.append((page_url, cached, slots[host], raise_on_error))
+
+            for page_url, (entry, modified) in zip(
+                    level_urls, pool.imap(_spider_page, args)):
+                if entry is None:
+                    continue
+                if cache and modified:
+                    _write_cached_page(page_url, entry)
+
+                response_url = entry['url']
+                page = entry['text']
+                pages[response_url] = page
+
+                # Parse out the links in the page
+                link_parser = LinkParser()
+                try:
+                    link_parser.feed(page)
+                except HTMLParseError as e:
+                    # This error indicates that Python's HTML parser sucks.
+                    msg = "Got an error parsing HTML."
+
+                    # Pre-2.7.3 Pythons in particular have rather prickly
+                    # HTML parsing.
+                    if sys.version_info[:3] < (2, 7, 3):
+                        msg += " Use Python 2.7.3 or newer for better HTML" \
+                               " parsing."
+
+                    tty.warn(msg, response_url, "HTMLParseError: " + str(e))
+
+                for raw_link in link_parser.links:
+                    abs_link = urljoin(response_url, raw_link.strip())
+
+                    links.add(abs_link)
+
+                    # Skip stuff that looks like an archive
+                    if any(raw_link.endswith(suf)
+                           for suf in ALLOWED_ARCHIVE_TYPES):
+                        continue
+
+                    # Skip things outside the root directory
+                    if not abs_link.startswith(root):
+                        continue
+
+                    # Skip already-visited links
+                    if abs_link in visited:
+                        continue
+
+                    # If we're not at max depth, follow links.
+                    if depth < max_depth:
+                        level.append(abs_link)
+                        visited.add(abs_link)
+    finally:
+        pool.terminate()
+        pool.join()
+
+    return pages, links
+
+
+def spider(root_url, depth=0, cache=True):
     """Gets web pages from a root URL.
 
        If depth is specified (e.g., depth=2), then this will also follow
        up to <depth> levels of links from the root.
 
-       This will spawn processes to fetch the children, for much improved
-       performance over a sequential fetch.
-
+       The pages of each level are fetched concurrently by a bounded
+       pool of threads.  Unless ``cache`` is False, the pages are kept
+       in the misc cache, and are downloaded again only if the server
+       says they changed.
     """
-    pages, links = _spider(root_url, set(), root_url, 0, depth, False)
+    pages, links = _spider(root_url, depth, False, cache)
     return pages, links
 
 
-def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
+def find_versions_of_archive(archive_urls, list_url=None, list_depth=0,
+                             cache=True):
     """Scrape web pages for new versions of a tarball.
 
     Arguments:
@@ -235,6 +331,10 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
       list_depth:
           Max depth to follow links on list_url pages. Default 0.
 
+      cache:
+          Whether to use the cached copies of pages that didn't change
+          (see ``spider``).  Default True.
+
     """
     if not isinstance(archive_urls, (list, tuple)):
         archive_urls = [archive_urls]
@@ -251,7 +351,7 @@ def find_versions_of_archive(archive_urls, list_url=None, list_depth=0):
     pages = {}
     links = set()
     for lurl in list_urls:
-        p, l = spider(lurl, depth=list_depth)
+        p, l = spider(lurl, depth=list_depth, cache=cache)
         pages.update(p)
         links.update(l)
 
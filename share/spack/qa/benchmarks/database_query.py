@@ -0,0 +1,176 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Measures the latency of install database queries.
+
+Synthetic databases with 1k, 10k and 100k records are written to a
+temporary directory, then each query is timed with the query index and
+with a linear scan of all the records.
+
+Usage::
+
+    spack python share/spack/qa/benchmarks/database_query.py [sizes ...]
+"""
+from __future__ import print_function
+
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import spack.util.spack_json as sjson
+from spack.database import Database, _db_version
+from spack.spec import Spec
+
+#: Number of records of the synthetic databases
+sizes = [1000, 10000, 100000]
+
+#: Queries to time
+queries = [
+    'hdf5', 'hdf5@1.10.1', 'zlib%gcc@4.9.3', 'hdf5+mpi', 'mpi',
+    '%intel', '+shared', '^openmpi', 'hdf5 ^openmpi'
+]
+
+#: Packages of the synthetic records; all of them can fetch any version
+names = [
+    'autoconf', 'automake', 'boost', 'bzip2', 'cairo', 'cmake', 'curl',
+    'fftw', 'gettext', 'glib', 'gmp', 'hdf5', 'hypre', 'jpeg', 'libdwarf',
+    'libelf', 'libpng', 'libtool', 'libxml2', 'm4', 'metis', 'mpfr',
+    'mpich', 'ncurses', 'netcdf', 'openmpi', 'openssl', 'parmetis', 'perl',
+    'petsc', 'pkg-config', 'python', 'readline', 'superlu-dist', 'szip',
+    'tcl', 'trilinos', 'xz', 'zlib'
+]
+
+compilers = [('gcc', '4.9.3'), ('gcc', '6.3.0'), ('intel', '17.0.1')]
+versions = ['1.0', '1.2.3', '1.10.1', '2.0']
+hash_chars = 'abcdefghijklmnopqrstuvwxyz234567'
+
+
+def synthetic_installs(size):
+    """Makes ``size`` install records.
+
+    A fifth of the records have no dependencies; each of the others
+    depends on up to three of them, so that the DAGs stay consistent.
+    """
+    installs = {}
+    leaves = {}
+    for i in range(size):
+        key = ''.join(random.choice(hash_chars) for _ in range(32))
+        compiler, compiler_version = random.choice(compilers)
+        node = {
+            'version': random.choice(versions),
+            'arch': {
+                'platform': 'linux',
+                'platform_os': 'rhel7',
+                'target': 'x86_64'
+            },
+            'compiler': {'name': compiler, 'version': compiler_version},
+            'namespace': 'builtin',
+            'parameters': {
+                'mpi': random.choice([True, False]),
+                'shared': random.choice([True, False]),
+                'cflags': [], 'cppflags': [], 'cxxflags': [],
+                'fflags': [], 'ldflags': [], 'ldlibs': []
+            }
+        }
+
+        if i % 5 and leaves:
+            deps = {}
+            for d in random.sample(list(leaves), min(len(leaves), 3)):
+                deps.setdefault(leaves[d], {'hash': d, 'type': ['link']})
+            node['dependencies'] = deps
+
+        # A package can't depend on itself
+        name = random.choice(names)
+        while name in node.get('dependencies', {}):
+            name = random.choice(names)
+
+        installs[key] = {
+            'spec': {name: node},
+            'path': '/synthetic/%s-%s' % (name, key),
+            'installed': True,
+            'ref_count': 0,
+            'explicit': True
+        }
+        if not i % 5:
+            leaves[key] = name
+
+    return installs
+
+
+def write_database(root, installs):
+    db = Database(root)
+    with open(db._index_path, 'w') as f:
+        sjson.dump({'database': {'installs': installs,
+                                 'version': str(_db_version)}}, f)
+    return db
+
+
+def best_of(n, function):
+    times = []
+    for _ in range(n):
+        start = time.time()
+        function()
+        times.append(time.time() - start)
+    return min(times)
+
+
+def linear_scan(db, query_spec):
+    """What Database.query() does without the query index."""
+    return sorted(rec.spec for rec in db._data.values()
+                  if rec.spec.satisfies(query_spec))
+
+
+def benchmark(size):
+    root = tempfile.mkdtemp()
+    try:
+        db = write_database(root, synthetic_installs(size))
+
+        read_time = best_of(1, lambda: db.query(Spec('zlib')))
+        print('%d records: read in %.3fs' % (size, read_time))
+        print('  %-20s %12s %12s %10s' % (
+            'query', 'indexed (s)', 'linear (s)', 'results'))
+
+        # Queries in one read transaction don't read the file again
+        with db.read_transaction():
+            for query in queries:
+                query_spec = Spec(query)
+                results = db.query(query_spec)
+                indexed = best_of(3, lambda: db.query(query_spec))
+                linear = best_of(1, lambda: linear_scan(db, query_spec))
+                print('  %-20s %12.5f %12.5f %10d' % (
+                    query, indexed, linear, len(results)))
+    finally:
+        shutil.rmtree(root)
+
+
+def main(argv):
+    random.seed(0)
+    for size in [int(a) for a in argv] or sizes:
+        benchmark(size)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
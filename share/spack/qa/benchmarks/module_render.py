@@ -0,0 +1,158 @@
+##############################################################################
+# Copyright (c) 2013-2016, Lawrence Livermore National Security, LLC.
+# Produced at the Lawrence Livermore National Laboratory.
+#
+# This file is part of Spack.
+# Created by Todd Gamblin, tgamblin@llnl.gov, All rights reserved.
+# LLNL-CODE-647188
+#
+# For details, see https://github.com/llnl/spack
+# Please also see the LICENSE file for our notice and the LGPL.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU Lesser General Public License (as
+# published by the Free Software Foundation) version 2.1, February 1999.
+#
+# This program is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the IMPLIED WARRANTY OF
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the terms and
+# conditions of the GNU Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307 USA
+##############################################################################
+"""Measures the time it takes to render module files.
+
+Synthetic module files are rendered from the templates in
+``template_dirs`` to a temporary directory: first with a new template
+environment for each file, then with the environment shared by the
+process.  The time a new process takes to get its templates is measured
+with and without compiled templates in the misc cache.
+
+Usage::
+
+    spack python share/spack/qa/benchmarks/module_render.py [sizes ...]
+"""
+from __future__ import print_function
+
+import collections
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import jinja2
+
+import spack
+import spack.tengine as tengine
+from spack.file_cache import FileCache
+
+#: Number of module files rendered
+sizes = [10000]
+
+#: Templates rendered, one after the other
+templates = [
+    'modules/modulefile.tcl', 'modules/modulefile.lua',
+    'modules/modulefile.dk'
+]
+
+Spec = collections.namedtuple('Spec', ['name', 'version', 'short_spec'])
+Command = collections.namedtuple('Command', ['name', 'value', 'separator'])
+
+
+def synthetic_context(i):
+    """Context of the i-th module file, similar to what module writers
+    pass to the templates.
+    """
+    name, version = 'package-%d' % i, '1.%d' % (i % 10)
+    prefix = '/synthetic/%s-%s' % (name, version)
+    return {
+        'spec': Spec(name, version, '%s@%s%%gcc@6.3.0' % (name, version)),
+        'timestamp': time.ctime(),
+        'short_description': 'Synthetic package %d' % i,
+        'long_description': 'A synthetic package. ' * 20,
+        'configure_options': '--prefix=%s --enable-shared' % prefix,
+        'autoload': ['dependency-%d/1.0' % j for j in range(i % 4)],
+        'prerequisites': [],
+        'conflicts': [name],
+        'environment_modifications': [
+            ('PrependPath', Command(var, os.path.join(prefix, d), ':'))
+            for var, d in [('PATH', 'bin'), ('MANPATH', 'share/man'),
+                           ('LD_LIBRARY_PATH', 'lib'),
+                           ('PKG_CONFIG_PATH', 'lib/pkgconfig'),
+                           ('CMAKE_PREFIX_PATH', '')]
+        ] + [('SetEnv', Command(name.upper() + '_ROOT', prefix, ':'))],
+        'verbose': False,
+        'name_part': name,
+        'version_part': version,
+        'provides': [],
+        'missing': [],
+        'unlocked_paths': [],
+        'conditionally_unlocked_paths': [],
+        'has_modulepath_modifications': False,
+        'has_conditional_modifications': False,
+    }
+
+
+def unshared_environment():
+    """What tengine.make_environment() did for each module file before
+    template environments were shared.
+    """
+    env = jinja2.Environment(
+        loader=jinja2.FileSystemLoader(spack.template_dirs), trim_blocks=True
+    )
+    tengine._set_filters(env)
+    return env
+
+
+def render(root, size, make_environment):
+    start = time.time()
+    for i in range(size):
+        env = make_environment()
+        template = env.get_template(templates[i % len(templates)])
+        text = template.render(synthetic_context(i))
+        with open(os.path.join(root, 'module-%d' % i), 'w') as f:
+            f.write(text)
+    return time.time() - start
+
+
+def startup():
+    """Time a new process takes to get all the templates."""
+    tengine._environments.clear()
+    start = time.time()
+    env = tengine.make_environment()
+    for name in templates:
+        env.get_template(name)
+    return time.time() - start
+
+
+def benchmark(size):
+    root = tempfile.mkdtemp()
+    try:
+        spack.misc_cache = FileCache(os.path.join(root, 'cache'))
+        modules = os.path.join(root, 'modules')
+        os.mkdir(modules)
+
+        print('%d module files:' % size)
+        unshared = render(modules, size, unshared_environment)
+        print('  %-36s %8.3fs' % ('new environment for each file', unshared))
+        shared = render(modules, size, tengine.make_environment)
+        print('  %-36s %8.3fs' % ('shared environment', shared))
+
+        shutil.rmtree(spack.misc_cache.root)
+        spack.misc_cache = FileCache(os.path.join(root, 'cache'))
+        print('  %-36s %8.3fs' % ('startup, templates compiled', startup()))
+        print('  %-36s %8.3fs' % ('startup, templates cached', startup()))
+    finally:
+        shutil.rmtree(root)
+
+
+def main(argv):
+    for size in [int(a) for a in argv] or sizes:
+        benchmark(size)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
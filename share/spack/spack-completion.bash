@@ -165,7 +165,7 @@ function _spack_cd {
 function _spack_checksum {
     if $list_options
     then
-        compgen -W "-h --help --keep-stage" -- "$cur"
+        compgen -W "-h --help --keep-stage -j --jobs" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
@@ -174,7 +174,7 @@ function _spack_checksum {
 function _spack_clean {
     if $list_options
     then
-        compgen -W "-h --help" -- "$cur"
+        compgen -W "-h --help -c --source-cache --max-size" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
@@ -351,7 +351,7 @@ function _spack_fetch {
     if $list_options
     then
         compgen -W "-h --help -n --no-checksum -m --missing
-                    -D --dependencies" -- "$cur"
+                    -D --dependencies -j --jobs" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
@@ -408,14 +408,25 @@ function _spack_info {
 function _spack_install {
     if $list_options
     then
-        compgen -W "-h --help --only -j --jobs --keep-prefix --keep-stage
+        compgen -W "-h --help --only -j --jobs -p --concurrent-builds
+                    --coordinate --fetch-jobs --keep-prefix --keep-stage
                     -n --no-checksum -v --verbose --fake --clean --dirty
-                    --run-tests --log-format --log-file" -- "$cur"
+                    --run-tests
+                    --log-format --log-file" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
 }
 
+function _spack_install_times {
+    if $list_options
+    then
+        compgen -W "-h --help -p --packages -n --number --json" -- "$cur"
+    else
+        compgen -W "$(_installed_packages)" -- "$cur"
+    fi
+}
+
 function _spack_list {
     if $list_options
     then
@@ -472,7 +483,8 @@ function _spack_mirror_create {
     if $list_options
     then
         compgen -W "-h --help -d --directory -f --file
-                    -D --dependencies -o --one-version-per-spec" -- "$cur"
+                    -D --dependencies -o --one-version-per-spec
+                    -j --jobs" -- "$cur"
     else
         compgen -W "$(_all_packages)" -- "$cur"
     fi
@@ -523,7 +535,7 @@ function _spack_module_loads {
 function _spack_module_refresh {
     if $list_options
     then
-        compgen -W "-h --help --delete-tree -m --module-type
+        compgen -W "-h --help --delete-tree -j --jobs -m --module-type
                     -y --yes-to-all" -- "$cur"
     else
         compgen -W "$(_installed_packages)" -- "$cur"
@@ -775,7 +787,7 @@ function _spack_view {
     if $list_options
     then
         compgen -W "-h --help -v --verbose -e --exclude
-                    -d --dependencies" -- "$cur"
+                    -d --dependencies -j --jobs" -- "$cur"
     else
         compgen -W "add check hard hardlink remove rm soft
                     statlink status symlink" -- "$cur"
@@ -615,6 +615,18 @@ class Python(AutotoolsPackage):
         exts[ext_pkg.name] = ext_pkg.spec
         self.write_easy_install_pth(exts)
 
+    def activate_extensions(self, extensions):
+        extensions = [
+            (ext_pkg, dict(args, ignore=self.python_ignore(ext_pkg, args)))
+            for ext_pkg, args in extensions]
+
+        super(Python, self).activate_extensions(extensions)
+
+        # Merge easy-install.pth once for all the extensions
+        exts = spack.store.layout.extension_map(self.spec)
+        exts.update((ext_pkg.name, ext_pkg.spec) for ext_pkg, _ in extensions)
+        self.write_easy_install_pth(exts)
+
     def deactivate(self, ext_pkg, **args):
         args.update(ignore=self.python_ignore(ext_pkg, args))
         super(Python, self).deactivate(ext_pkg, **args)